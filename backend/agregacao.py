@@ -0,0 +1,131 @@
+# agregados financeiros que podem ser atualizados bloco a bloco
+import numpy as np
+import pandas as pd
+
+from dinheiro import centavos_de_reais
+
+
+class AgregadosFinanceiros:
+    """somatórios por mês/tipo, por tipo e por categoria de despesa.
+
+    guarda apenas os totais, então a memória não depende da quantidade de linhas;
+    cada bloco de transações (mesmo formato de obter_dataframe) é somado aos anteriores
+    com um único groupby por (mês, tipo, categoria), do qual saem todos os resumos.
+    os totais são somas inteiras em centavos (exatas, sem acúmulo de erro de float) e só
+    viram reais nos resumos; os resumos derivados ficam memorizados até o próximo bloco.
+    """
+
+    def __init__(self):
+        self.total_linhas = 0
+        self._mensal = None      #centavos (int64) com índice (Mês, Tipo)
+        self._tipos = None       #centavos (int64) com índice Tipo
+        self._categorias = None  #centavos (int64) com índice Categoria, só despesas
+        self._memo = {}          #resumos já calculados a partir dos totais
+
+    @classmethod
+    def de_dataframe(cls, df):
+        agregados = cls()
+        agregados.atualizar(df)
+        return agregados
+
+    @classmethod
+    def de_dict(cls, dados):
+        #reconstrói os agregados salvos por para_dict
+        agregados = cls()
+        agregados.total_linhas = dados['total_linhas']
+        if dados['mensal']:
+            meses, tipos, valores = zip(*dados['mensal'])
+            agregados._mensal = pd.Series(np.asarray(valores, dtype=np.int64), index=pd.MultiIndex.from_arrays([meses, tipos], names=['Mês', 'Tipo']))
+        if dados['tipos']:
+            agregados._tipos = pd.Series(np.asarray(list(dados['tipos'].values()), dtype=np.int64), index=pd.Index(list(dados['tipos']), name='Tipo'))
+        if dados['categorias']:
+            agregados._categorias = pd.Series(np.asarray(list(dados['categorias'].values()), dtype=np.int64), index=pd.Index(list(dados['categorias']), name='Categoria'))
+        return agregados
+
+    def para_dict(self):
+        #formato serializável em json, usado para persistir os agregados (valores em centavos)
+        return {
+            'total_linhas': self.total_linhas,
+            'mensal': [] if self._mensal is None else [[mes, tipo, int(v)] for (mes, tipo), v in self._mensal.items()],
+            'tipos': {} if self._tipos is None else {k: int(v) for k, v in self._tipos.items()},
+            'categorias': {} if self._categorias is None else {k: int(v) for k, v in self._categorias.items()},
+        }
+
+    def combinar(self, outro):
+        #soma os totais de outro conjunto de agregados (ex.: extratos de um lote)
+        if outro.total_linhas == 0:
+            return
+        self.total_linhas += outro.total_linhas
+        self._memo = {}
+        for atributo in ('_mensal', '_tipos', '_categorias'):
+            if getattr(outro, atributo) is not None:
+                setattr(self, atributo, _somar(getattr(self, atributo), getattr(outro, atributo)))
+
+    def atualizar(self, df):
+        if df.empty:
+            return
+        self.total_linhas += len(df)
+        self._memo = {}
+        #uma passada sobre as linhas; o mês entra como inteiro aaaamm e só vira texto no resultado
+        mes = (df['Data'].dt.year * 100 + df['Data'].dt.month).rename('Mês')
+        centavos = df['Centavos'] if 'Centavos' in df.columns else pd.Series(centavos_de_reais(df['Valor']), index=df.index)
+        parcial = centavos.astype(np.int64).groupby([mes, df['Tipo'], df['Categoria']], observed=True).sum()
+        parcial.index = pd.MultiIndex.from_arrays(
+            [parcial.index.get_level_values(0), parcial.index.get_level_values(1).astype(object), parcial.index.get_level_values(2).astype(object)],
+            names=['Mês', 'Tipo', 'Categoria'])
+
+        mensal = parcial.groupby(level=['Mês', 'Tipo']).sum()
+        mensal.index = mensal.index.set_levels([f"{m // 100:04d}-{m % 100:02d}" for m in mensal.index.levels[0]], level='Mês')
+        self._mensal = _somar(self._mensal, mensal)
+        self._tipos = _somar(self._tipos, parcial.groupby(level='Tipo').sum())
+        if 'Despesa' in parcial.index.levels[1]:
+            self._categorias = _somar(self._categorias, parcial.xs('Despesa', level='Tipo').groupby(level='Categoria').sum())
+
+    def resumo_mensal(self):
+        if 'mensal' in self._memo:
+            return self._memo['mensal']
+        if self._mensal is None:
+            resumo = pd.DataFrame(index=pd.Index([], name='Mês'))
+        else:
+            resumo = self._mensal.rename_axis(['Mês', 'Tipo']).unstack(fill_value=0) / 100
+        if 'Receita' not in resumo: resumo['Receita'] = 0.0
+        if 'Despesa' not in resumo: resumo['Despesa'] = 0.0
+        self._memo['mensal'] = resumo
+        return resumo
+
+    def totais_por_tipo(self):
+        if self._tipos is None:
+            return pd.Series(dtype='float64', index=pd.Index([], name='Tipo'))
+        return self._tipos.rename_axis('Tipo').abs() / 100
+
+    def despesas_por_categoria(self):
+        #valores absolutos em ordem crescente, como o gráfico de categorias usa
+        if self._categorias is None:
+            return pd.Series(dtype='float64', index=pd.Index([], name='Categoria'))
+        if 'categorias' not in self._memo:
+            self._memo['categorias'] = self._categorias.rename_axis('Categoria').abs().sort_values() / 100
+        return self._memo['categorias']
+
+    def resumo_categorias(self):
+        if self._categorias is None:
+            return {}
+        return self.despesas_por_categoria().sort_values(ascending=False).to_dict()
+
+    def kpis(self):
+        if self.total_linhas == 0:
+            return {'receita_total': 0, 'despesa_total': 0, 'saldo_final': 0, 'taxa_poupanca': 0}
+        receita_total = int(self._tipos.get('Receita', 0))
+        despesa_total = int(self._tipos.get('Despesa', 0))
+        saldo_final = receita_total + despesa_total #soma exata em centavos; só a exibição vira float
+        taxa_poupanca = (saldo_final / receita_total) * 100 if receita_total > 0 else 0
+        return {
+            'receita_total': receita_total / 100,
+            'despesa_total': despesa_total / 100,
+            'saldo_final': saldo_final / 100,
+            'taxa_poupanca': taxa_poupanca
+        }
+
+
+def _somar(atual, novo):
+    #soma dois parciais alinhando pelo índice; chaves ausentes contam como zero
+    return novo if atual is None else atual.add(novo, fill_value=0).astype(np.int64)
@@ -1,17 +1,35 @@
-#bibliotecas para manipulação de dados e visualização
+#bibliotecas para manipulação de dados; matplotlib e fpdf só são importados ao gerar um gráfico ou pdf
 import pandas as pd
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import seaborn as sns
-# modulos para lidar com datas, arquivos e PDF
+# modulos para lidar com datas e arquivos
 from datetime import datetime
 import os
-from fpdf import FPDF
 # componentes do flask para a api
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, g, request, jsonify, send_from_directory, send_file, Response, stream_with_context
 from werkzeug.utils import secure_filename
-import re
+import warnings
+import cProfile
+import hashlib
+import json
+import io
+import uuid
+import numpy as np
+from categorizacao import MotorCategorizacao
+from cache_resultados import CacheResultados, chave_conteudo
+from armazenamento import GerenciadorArmazenamento
+from metricas import RegistroMetricas, cronometrar
+from agregacao import AgregadosFinanceiros
+from dinheiro import centavos_de_reais, centavos_de_serie, centavos_de_texto
+from consulta_transacoes import ARQUIVO_TRANSACOES, CacheIndices, gravar_transacoes
+from padroes import detectar_padroes
+from deteccao_csv import detectar_formato, normalizar_nome_coluna
+from fila_jobs import FilaJobs, CONCLUIDO, ERRO
+from livro_razao import LivroRazao
+import multiprocessing
+import threading
+import time
+import zipfile
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
 
 app = Flask(__name__)
 
@@ -19,202 +37,620 @@ app = Flask(__name__)
 basedir = os.path.abspath(os.path.dirname(__file__))
 UPLOAD_FOLDER = os.path.join(basedir, 'uploads')
 OUTPUT_FOLDER = os.path.join(basedir, 'relatorios_gerados')
+CONTAS_FOLDER = os.path.join(basedir, 'contas')
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
+#acima deste tamanho o /analisar usa a importação em streaming
+LIMITE_STREAMING_BYTES = int(float(os.environ.get('LIMITE_STREAMING_MB', 200)) * 1024 * 1024)
+
+#versão do formato da resposta do /analisar, parte da chave do cache de resultados: mudar sempre que
+#a resposta ou os arquivos da pasta do relatório mudarem, para o cache não servir resultados antigos
+VERSAO_RESULTADO = '1'
+
+#colunas e tipos do dataframe de transações; Centavos (int64) é o valor exato e Valor (reais) serve para exibir
+COLUNAS_DATAFRAME = ['Data', 'Descrição', 'Valor', 'Tipo', 'Categoria', 'Centavos']
+
+#regras de categorização carregadas e compiladas uma única vez
+ARQUIVO_REGRAS = os.environ.get('ARQUIVO_REGRAS_CATEGORIAS', os.path.join(basedir, 'regras_categorias.json'))
+MOTOR_CATEGORIAS = MotorCategorizacao.de_arquivo(ARQUIVO_REGRAS)
+
+#cache de resultados por conteúdo do arquivo, com limites de tamanho e idade para relatorios_gerados
+CACHE_RESULTADOS = CacheResultados(
+    OUTPUT_FOLDER,
+    tamanho_max_bytes=int(float(os.environ.get('CACHE_MAX_MB', 500)) * 1024 * 1024),
+    idade_max_segundos=float(os.environ.get('CACHE_MAX_IDADE_HORAS', 24 * 7)) * 3600,
+)
+
+#índices das transações dos relatórios para /relatorios/<id>/consulta, mantidos em memória
+INDICES_CONSULTA = CacheIndices(OUTPUT_FOLDER, maximo=int(os.environ.get('CONSULTA_MAX_INDICES', 8)))
+
+#tempos por etapa, contadores e latência das rotas, expostos em /metrics
+METRICAS = RegistroMetricas()
+METRICAS.descrever('requisicao_segundos', 'histogram', 'Latência das requisições por rota (até o início da resposta)')
+METRICAS.descrever('requisicoes_total', 'counter', 'Requisições atendidas por rota, método e status')
+METRICAS.descrever('etapa_segundos', 'histogram', 'Duração de cada etapa da análise')
+METRICAS.descrever('grafico_segundos', 'histogram', 'Tempo para desenhar e gravar cada gráfico')
+METRICAS.descrever('linhas_lidas_total', 'counter', 'Linhas de dados lidas dos CSVs')
+METRICAS.descrever('linhas_rejeitadas_total', 'counter', 'Linhas descartadas por data ou valor inválidos')
+METRICAS.descrever('analises_total', 'counter', 'Análises executadas (sem contar respostas do cache) por resultado')
+METRICAS.descrever('cache_acertos', 'counter', 'Respostas servidas pelo cache de resultados')
+METRICAS.descrever('cache_falhas', 'counter', 'Consultas ao cache de resultados sem resposta guardada')
+METRICAS.descrever('cache_remocoes', 'counter', 'Pastas de relatório removidas pelos limites do cache')
+METRICAS.descrever('cache_entradas', 'gauge', 'Resultados guardados no cache')
+METRICAS.descrever('jobs_ativos', 'gauge', 'Jobs do modo assíncrono na fila ou em execução')
+METRICAS.descrever('uploads_bytes', 'gauge', 'Bytes em uploads na última compactação')
+METRICAS.descrever('relatorios_bytes', 'gauge', 'Bytes em relatorios_gerados na última compactação')
+
+#com PERFIL_LENTO_MS definido, cada requisição roda sob o cProfile e as mais lentas que o limite
+#têm o perfil gravado em PASTA_PERFIS (abrir com python -m pstats ou snakeviz)
+PERFIL_LENTO_MS = float(os.environ['PERFIL_LENTO_MS']) if os.environ.get('PERFIL_LENTO_MS') else None
+PASTA_PERFIS = os.environ.get('PASTA_PERFIS', os.path.join(basedir, 'perfis'))
+#só um cProfile pode estar ativo por processo (no python 3.12+ o segundo enable() levanta ValueError),
+#então com requisições simultâneas só a que pegar a trava é perfilada e as outras seguem sem perfil
+TRAVA_PERFIL = threading.Lock()
+
+#uploads guardados pelo hash do conteúdo e compactação periódica de uploads e relatorios_gerados
+ARMAZENAMENTO = GerenciadorArmazenamento(
+    UPLOAD_FOLDER, CACHE_RESULTADOS,
+    tamanho_max_uploads=int(float(os.environ.get('UPLOADS_MAX_MB', 1024)) * 1024 * 1024),
+    idade_max_uploads=float(os.environ.get('UPLOADS_MAX_IDADE_HORAS', 24)) * 3600,
+    intervalo_segundos=float(os.environ.get('COMPACTACAO_INTERVALO_MIN', 5)) * 60,
+    carencia_segundos=float(os.environ.get('ARMAZENAMENTO_CARENCIA_MIN', 10)) * 60,
+)
+
+#pool de processos para o modo assíncrono do /analisar
+FILA_JOBS = FilaJobs(max_workers=int(os.environ.get('WORKERS_RELATORIOS', 2)))
+
+#pool de processos para desenhar os gráficos em paralelo; GRAFICOS_PARALELOS=0 desenha em sequência
+GRAFICOS_PARALELOS = os.environ.get('GRAFICOS_PARALELOS', '1') != '0'
+_executor_graficos_pool = None
+_executor_graficos_lock = threading.Lock()
+
+class _ExecutorSequencial: #mesma interface do pool, mas executa na hora no próprio processo
+    def submit(self, funcao, *args):
+        futuro = Future()
+        try:
+            futuro.set_result(funcao(*args))
+        except Exception as e:
+            futuro.set_exception(e)
+        return futuro
+
+def _executor_graficos():
+    global _executor_graficos_pool
+    #dentro de um processo da fila de jobs os gráficos são desenhados ali mesmo, sem abrir outro pool
+    if not GRAFICOS_PARALELOS or multiprocessing.parent_process() is not None:
+        return _ExecutorSequencial()
+    with _executor_graficos_lock:
+        if _executor_graficos_pool is None:
+            import graficos
+            #processos spawn não herdam o preaquecer() do mestre: cada um se aquece ao subir
+            _executor_graficos_pool = ProcessPoolExecutor(max_workers=3, mp_context=multiprocessing.get_context('spawn'),
+                                                          initializer=graficos.aquecer)
+        return _executor_graficos_pool
+
+#pool de processos do /analisar/lote, um processo por núcleo (WORKERS_LOTE para mudar)
+WORKERS_LOTE = int(os.environ.get('WORKERS_LOTE', os.cpu_count() or 1))
+_executor_lote_pool = None
+_executor_lote_lock = threading.Lock()
+
+def _executor_lote():
+    global _executor_lote_pool
+    with _executor_lote_lock:
+        if _executor_lote_pool is None:
+            _executor_lote_pool = ProcessPoolExecutor(max_workers=WORKERS_LOTE, mp_context=multiprocessing.get_context('spawn'))
+        return _executor_lote_pool
+
+#importa gráficos e pdf e desenha uma figura mínima antes do primeiro pedido (PREAQUECER=1, ex.: gunicorn --preload)
+def preaquecer():
+    import graficos
+    import pdf_rapido  # noqa: F401
+    graficos.aquecer()
+
+#livros-razão abertos, um por conta, reaproveitados entre requisições
+_livros = {}
+_livros_lock = threading.Lock()
+
+def obter_livro(conta):
+    with _livros_lock:
+        if conta not in _livros:
+            _livros[conta] = LivroRazao(os.path.join(CONTAS_FOLDER, conta))
+        return _livros[conta]
+
+#nome temporário único ao lado do arquivo final: cada escrita vai para o seu e termina com os.replace,
+#então quem lê nunca vê um arquivo pela metade nem duas escritas se misturam (a extensão é mantida)
+def caminho_parcial(caminho):
+    base, extensao = os.path.splitext(caminho)
+    return f"{base}.{uuid.uuid4().hex[:8]}.parcial{extensao}"
+
+#depois do os.replace o parcial já não existe; só sobra quando a escrita falhou no meio
+def _descartar_parcial(parcial):
+    try:
+        os.remove(parcial)
+    except FileNotFoundError:
+        pass
+
+#entrega o caminho parcial para a escrita e o troca pelo final ao terminar; se a escrita falhar, apaga o parcial
+@contextmanager
+def escrita_atomica(caminho):
+    parcial = caminho_parcial(caminho)
+    try:
+        yield parcial
+        os.replace(parcial, caminho)
+    finally:
+        _descartar_parcial(parcial)
+
+#id de relatório único mesmo para envios no mesmo segundo; o prefixo de tempo mantém a ordem de criação
+def novo_id_relatorio():
+    return f"{int(datetime.now().timestamp())}-{uuid.uuid4().hex[:12]}"
+
 class Transacao: # classe base que representa qualquer transação financeira
-    def __init__(self, data, descricao, valor, categoria='N/A'):
+    __slots__ = ('data', 'descricao', 'centavos', 'categoria') #sem __dict__ por objeto, em toda a hierarquia
+
+    def __init__(self, data, descricao, valor, categoria='N/A', centavos=None):
         self.data = pd.to_datetime(data, errors='coerce')
         self.descricao = descricao #descreve a transação
-        self.valor = float(valor) #valor da transação, pode ser + ou -
+        self.centavos = centavos if centavos is not None else centavos_de_texto(valor, decimal='.') #valor exato em centavos, pode ser + ou -
         self.categoria = categoria #classifca as transações
 
+    @property
+    def valor(self): #valor da transação em reais
+        return self.centavos / 100
+
     def tipo(self): #determina se a transação é receita ou despesa
         return "Receita" if self.valor > 0 else "Despesa"
 
 # classes receita e despesas herdam de transação
 class Receita(Transacao):
-    pass
+    __slots__ = ()
 
 class Despesa(Transacao):
-    pass
+    __slots__ = ()
 
-class CarteiraFinanceira: #gerencia e organiza as transações
+# transação lida direto do armazenamento colunar, com a mesma interface de Transacao
+class TransacaoVisao(Transacao):
+    __slots__ = ('_colunas', '_indice')
+
+    def __init__(self, colunas, indice):
+        self._colunas = colunas
+        self._indice = indice
+
+    data = property(lambda self: pd.Timestamp(self._colunas['data'][self._indice]))
+    descricao = property(lambda self: self._colunas['descricao'][self._indice])
+    centavos = property(lambda self: int(self._colunas['centavos'][self._indice]))
+    valor = property(lambda self: self._colunas['centavos'][self._indice] / 100)
+    categoria = property(lambda self: self._colunas['nomes_categorias'][self._colunas['categoria'][self._indice]])
+
+class TransacoesColunares: #guarda as transações como colunas (um array por campo) em vez de um objeto por transação
     def __init__(self):
-        self.transacoes = [] #cria uma lista das transações
+        self._blocos = [] #blocos de arrays ainda não concatenados
+        self._pendentes = [] #transações adicionadas uma a uma com append
+        self._colunas = None #arrays consolidados: data (int64 ns), centavos (int64), descricao, tipo, categoria (códigos)
+        self.nomes_categorias = [] #código da categoria -> nome
+        self._codigo_categoria = {}
+        self._tamanho = 0
 
-    def _categorizar_transacao(self, descricao: str) -> str:  # função que categoriza uma transação com base na descrição
-        descricao = descricao.lower()
-        regras = {
-            'Alimentação': ['ifood', 'restaurante', 'mercado', 'lanche', 'padaria', 'super'],
-            'Transporte': ['uber', '99', 'posto', 'gasolina', 'passagem', 'estacionamento'],
-            'Moradia': ['aluguel', 'condominio', 'luz', 'internet', 'agua', 'conta de luz'],
-            'Lazer': ['cinema', 'show', 'bar', 'spotify', 'netflix', 'disney+', 'ingresso'],
-            'Saúde': ['farmacia', 'drogaria', 'medico', 'plano de saude', 'exame']
+    def _codificar_categorias(self, categorias):
+        for categoria in pd.unique(categorias):
+            if categoria not in self._codigo_categoria:
+                self._codigo_categoria[categoria] = len(self.nomes_categorias)
+                self.nomes_categorias.append(categoria)
+        return pd.Series(categorias).map(self._codigo_categoria).to_numpy(dtype=np.int16)
+
+    def adicionar_bloco(self, df): #acrescenta um dataframe no formato de obter_dataframe
+        self._converter_pendentes() #mantém a ordem de inserção
+        bloco = {
+            'data': df['Data'].to_numpy(dtype='datetime64[ns]').view(np.int64),
+            'centavos': df['Centavos'].to_numpy(dtype=np.int64) if 'Centavos' in df.columns else centavos_de_reais(df['Valor']),
+            'descricao': df['Descrição'].to_numpy(dtype=object),
+            'tipo': df['Tipo'].to_numpy(dtype=object),
+            'categoria': self._codificar_categorias(df['Categoria'].to_numpy(dtype=object)),
         }
-        for categoria, palavras_chave in regras.items():
-            if any(palavra in descricao for palavra in palavras_chave):
-                return categoria
-        return 'Outros' #categoria se nenhuma condição for satisfeita
+        if 'Identificador' in df.columns:
+            bloco['identificador'] = df['Identificador'].to_numpy(dtype=object)
+        self._blocos.append(bloco)
+        self._tamanho += len(df)
+
+    def append(self, transacao): #compatível com a lista de objetos usada antes; vira bloco na próxima leitura
+        self._pendentes.append((transacao.data, transacao.descricao, transacao.valor, transacao.tipo(), transacao.categoria, transacao.centavos))
+        self._tamanho += 1
+
+    def _converter_pendentes(self):
+        if self._pendentes:
+            pendentes, self._pendentes = self._pendentes, []
+            self._tamanho -= len(pendentes)
+            self.adicionar_bloco(pd.DataFrame(pendentes, columns=COLUNAS_DATAFRAME).astype({'Data': 'datetime64[ns]'}))
+
+    def _consolidar(self):
+        self._converter_pendentes()
+        if self._blocos:
+            if self._colunas is not None:
+                self._blocos.insert(0, {k: v for k, v in self._colunas.items() if k != 'nomes_categorias'})
+            nomes = set().union(*self._blocos)
+            self._colunas = {
+                nome: np.concatenate([b[nome] if nome in b else np.full(len(b['centavos']), None, dtype=object) for b in self._blocos])
+                for nome in nomes
+            }
+            self._blocos = []
+        if self._colunas is None:
+            self._colunas = {'data': np.empty(0, np.int64), 'centavos': np.empty(0, np.int64), 'descricao': np.empty(0, object),
+                             'tipo': np.empty(0, object), 'categoria': np.empty(0, np.int16)}
+        self._colunas['nomes_categorias'] = self.nomes_categorias
+        return self._colunas
+
+    def __len__(self):
+        return self._tamanho
+
+    def __getitem__(self, indice):
+        colunas = self._consolidar()
+        if indice < 0: indice += self._tamanho
+        if not 0 <= indice < self._tamanho: raise IndexError(indice)
+        return TransacaoVisao(colunas, indice)
+
+    def __iter__(self):
+        colunas = self._consolidar()
+        return (TransacaoVisao(colunas, i) for i in range(self._tamanho))
+
+    def dataframe(self): #monta o dataframe sobre os próprios arrays; só Valor (reais) é calculado a partir dos centavos
+        colunas = self._consolidar()
+        dados = {
+            'Data': colunas['data'].view('datetime64[ns]'),
+            'Descrição': colunas['descricao'],
+            'Valor': colunas['centavos'] / 100,
+            'Tipo': colunas['tipo'],
+            'Categoria': pd.Categorical.from_codes(colunas['categoria'], categories=self.nomes_categorias) if self.nomes_categorias else colunas['descricao'][:0],
+            'Centavos': colunas['centavos'],
+        }
+        if 'identificador' in colunas:
+            dados['Identificador'] = colunas['identificador']
+        return pd.DataFrame(dados, copy=False)
+
+class CarteiraFinanceira: #gerencia e organiza as transações
+    def __init__(self, motor_categorias: MotorCategorizacao = None):
+        self.transacoes = TransacoesColunares() #transações guardadas em colunas compactas
+        self.motor_categorias = motor_categorias or MOTOR_CATEGORIAS #regras de categorização compiladas
+        self.formato_detectado = None #separador, codificação, cabeçalho, decimal e coluna de valores do último csv lido
+        self.linhas_lidas = 0 #linhas de dados do último csv lido, válidas ou não
+        self.linhas_rejeitadas = 0 #linhas sem data ou valor válidos, descartadas na importação
+        self.tempos_etapas = {} #etapa (deteccao, leitura, validacao, categorizacao, agregacao) -> segundos
+
+    def _categorizar_transacao(self, descricao: str) -> str:  # função que categoriza uma transação com base na descrição
+        return self.motor_categorias.categorizar(descricao)
 
     def obter_dataframe(self):
-        dados = [{'Data': t.data, 'Descrição': t.descricao, 'Valor': t.valor, 'Tipo': t.tipo(), 'Categoria': t.categoria} for t in self.transacoes]
-        return pd.DataFrame(dados)
-    # importa as transações a partir de um arquivo csv
-    def importar_csv(self, caminho_do_arquivo):
+        return self.transacoes.dataframe()
+    # detecta o formato pelo início do arquivo e faz uma única leitura completa
+    # só se o utf-8 falhar depois da amostra o arquivo é relido como latin1
+    def _ler_csv(self, caminho_do_arquivo, **kwargs):
+        with cronometrar(self.tempos_etapas, 'deteccao'):
+            self.formato_detectado = detectar_formato(caminho_do_arquivo)
         try:
+            with cronometrar(self.tempos_etapas, 'leitura'):
+                df = pd.read_csv(caminho_do_arquivo, **self._opcoes_leitura(), **kwargs)
+        except UnicodeDecodeError:
+            self.formato_detectado['codificacao'] = 'latin1'
+            with cronometrar(self.tempos_etapas, 'leitura'):
+                df = pd.read_csv(caminho_do_arquivo, **self._opcoes_leitura(), **kwargs)
+        except pd.errors.EmptyDataError:
             df = None
-            for sep in [',', ';']:
-                for encoding in ['utf-8', 'latin1', 'iso-8859-1']:
-                    try:
-                        df = pd.read_csv(caminho_do_arquivo, sep=sep, encoding=encoding, skipinitialspace=True)
-                        if 'data' in df.columns or 'Data' in df.columns:
-                            break
-                    except Exception:
-                        continue
-                if df is not None and not df.empty:
-                    break
-            
-            if df is None or df.empty:
-                raise ValueError("Não foi possível ler o arquivo CSV ou ele está vazio.")
-            
-            def normalize_col_name(col_name):
-                s = str(col_name).lower().strip()
-                s = re.sub(r'[áàãâä]', 'a', s); s = re.sub(r'[éèêë]', 'e', s); s = re.sub(r'[íìîï]', 'i', s); s = re.sub(r'[óòõôö]', 'o', s); s = re.sub(r'[úùûü]', 'u', s); s = re.sub(r'[ç]', 'c', s)
-                s = re.sub(r'[^a-z0-9_ ]', '', s).replace(' ', '_')
-                return s
-            
-            normalized_to_original_cols = {normalize_col_name(col): col for col in df.columns}
-            def find_col(expected_list):
-                for name in expected_list:
-                    if name in normalized_to_original_cols: return normalized_to_original_cols[name]
-                return None
-
-            found_data_col = find_col(['data', 'date'])
-            found_descricao_col = find_col(['descricao', 'historico'])
-            found_valor_col = find_col(['valor', 'value', 'montante'])
-
-            if not all([found_data_col, found_descricao_col, found_valor_col]):
-                raise ValueError(f"Não foi possível encontrar as colunas essenciais. Colunas detectadas: {list(df.columns)}")
-
-            df = df.rename(columns={found_data_col: 'data', found_descricao_col: 'descricao', found_valor_col: 'valor'})
-
-            valid_transactions_count = 0
-            for index, row in df.iterrows():
-                try:
-                    valor_str = str(row['valor']).strip().replace('.', '').replace(',', '.')
-                    valor = float(valor_str)
-                    
-                    data = pd.to_datetime(row['data'], dayfirst=True, errors='coerce')
-                    if pd.isna(data): continue
-
-                    descricao = str(row.get('descricao', 'Sem Descrição')).strip()
-                    categoria = self._categorizar_transacao(descricao)
-                    transacao = Receita(data, descricao, valor, categoria) if valor > 0 else Despesa(data, descricao, valor, categoria)
-                    
-                    self.transacoes.append(transacao)
-                    valid_transactions_count += 1
-                except (ValueError, TypeError):
-                    continue
+        
+        if df is None or df.empty:
+            raise ValueError("Não foi possível ler o arquivo CSV ou ele está vazio.")
+        return df
+
+    #a coluna de valores é lida como texto: o pandas usaria '.' como decimal e leria 1.500 (mil e
+    #quinhentos em um arquivo de vírgula decimal) como 1,5; quem interpreta é centavos_de_serie
+    def _opcoes_leitura(self):
+        formato = self.formato_detectado
+        opcoes = {'sep': formato['separador'], 'encoding': formato['codificacao'],
+                  'skiprows': formato['linha_cabecalho'], 'skipinitialspace': True}
+        if formato.get('coluna_valor'):
+            opcoes['dtype'] = {formato['coluna_valor']: str}
+        return opcoes
+
+    # encontra as colunas de data, descrição e valor e devolve o mapeamento para os nomes internos
+    def _mapear_colunas(self, colunas):
+        normalized_to_original_cols = {normalizar_nome_coluna(col): col for col in colunas}
+        def find_col(expected_list):
+            for name in expected_list:
+                if name in normalized_to_original_cols: return normalized_to_original_cols[name]
+            return None
+
+        found_data_col = find_col(['data', 'date'])
+        found_descricao_col = find_col(['descricao', 'historico'])
+        found_valor_col = find_col(['valor', 'value', 'montante'])
+        found_identificador_col = find_col(['identificador'])
+
+        if not all([found_data_col, found_descricao_col, found_valor_col]):
+            raise ValueError(f"Não foi possível encontrar as colunas essenciais. Colunas detectadas: {list(colunas)}")
+
+        mapeamento = {found_data_col: 'data', found_descricao_col: 'descricao', found_valor_col: 'valor'}
+        if found_identificador_col:
+            mapeamento[found_identificador_col] = 'identificador' #opcional, usado para deduplicar no livro-razão
+        return mapeamento
+
+    # importa as transações a partir de um arquivo csv
+    # modo 'colunar' processa as colunas inteiras de uma vez, modo 'linhas' cria um objeto por linha
+    def importar_csv(self, caminho_do_arquivo, modo='colunar'):
+        try:
+            df = self._ler_csv(caminho_do_arquivo)
+            df = df.rename(columns=self._mapear_colunas(df.columns))
+            self.linhas_lidas = len(df)
+            self.linhas_rejeitadas = 0
+
+            if modo == 'colunar':
+                valid_transactions_count = self._importar_colunar(df)
+            elif modo == 'linhas':
+                valid_transactions_count = self._importar_linhas(df)
+            else:
+                raise ValueError(f"Modo de importação desconhecido: {modo}")
 
             if valid_transactions_count == 0:
                 raise ValueError("Nenhuma transação válida foi processada a partir do CSV.")
 
         except Exception as e:
             raise ValueError(f"Erro ao processar o CSV: {e}")
+
+    # lê o arquivo em blocos de tamanho fixo e só guarda os agregados, sem manter as transações
+    # a memória fica limitada pelo tamanho do bloco, qualquer que seja o tamanho do arquivo
+    def importar_csv_streaming(self, caminho_do_arquivo, linhas_por_bloco=100_000):
+        try:
+            with cronometrar(self.tempos_etapas, 'deteccao'):
+                self.formato_detectado = detectar_formato(caminho_do_arquivo)
+            try:
+                agregados = self._agregar_blocos(caminho_do_arquivo, linhas_por_bloco)
+            except UnicodeDecodeError:
+                self.formato_detectado['codificacao'] = 'latin1'
+                agregados = self._agregar_blocos(caminho_do_arquivo, linhas_por_bloco)
+
+            if agregados.total_linhas == 0:
+                raise ValueError("Nenhuma transação válida foi processada a partir do CSV.")
+            return agregados
+
+        except Exception as e:
+            raise ValueError(f"Erro ao processar o CSV: {e}")
+
+    def _agregar_blocos(self, caminho_do_arquivo, linhas_por_bloco):
+        agregados = AgregadosFinanceiros()
+        renomear = None
+        self.linhas_lidas = 0
+        self.linhas_rejeitadas = 0
+        with pd.read_csv(caminho_do_arquivo, chunksize=linhas_por_bloco, **self._opcoes_leitura()) as leitor:
+            leitura = iter(leitor)
+            while True:
+                with cronometrar(self.tempos_etapas, 'leitura'):
+                    bloco = next(leitura, None)
+                if bloco is None:
+                    break
+                self.linhas_lidas += len(bloco)
+                if renomear is None:
+                    renomear = self._mapear_colunas(bloco.columns)
+                novo = self._preparar_bloco(bloco.rename(columns=renomear))
+                with cronometrar(self.tempos_etapas, 'agregacao'):
+                    agregados.atualizar(novo)
+        return agregados
+
+    # caminho original: um objeto Receita/Despesa por linha
+    def _importar_linhas(self, df):
+        valid_transactions_count = 0
+        for index, row in df.iterrows():
+            try:
+                centavos = centavos_de_texto(row['valor'], self.formato_detectado['decimal'])
+                valor = centavos / 100
+                
+                data = pd.to_datetime(row['data'], dayfirst=True, errors='coerce')
+                if pd.isna(data): continue
+
+                descricao = str(row.get('descricao', 'Sem Descrição')).strip()
+                categoria = self._categorizar_transacao(descricao)
+                classe = Receita if centavos > 0 else Despesa
+                transacao = classe(data, descricao, valor, categoria, centavos=centavos)
+                
+                self.transacoes.append(transacao)
+                valid_transactions_count += 1
+            except (ValueError, TypeError):
+                continue
+        return valid_transactions_count
+
+    # caminho colunar: valores, datas e tipos convertidos de uma vez sobre as colunas inteiras
+    def _importar_colunar(self, df):
+        novo = self._preparar_bloco(df)
+        if novo.empty:
+            return 0
+        self.transacoes.adicionar_bloco(novo)
+        return len(novo)
+
+    # converte um bloco já renomeado (data, descricao, valor) no dataframe tipado de transações
+    def _preparar_bloco(self, df):
+        with cronometrar(self.tempos_etapas, 'validacao'):
+            #o separador decimal é o detectado para o arquivo: 1.234,56 ou 1234.56 (extrato do nubank)
+            centavos, validas = centavos_de_serie(df['valor'], self.formato_detectado['decimal'])
+            data = _converter_datas(df['data'])
+
+            validas &= data.notna().to_numpy()
+            self.linhas_rejeitadas += int(len(validas) - validas.sum())
+            descricao = _como_texto(df['descricao'][validas]).str.strip()
+            centavos = centavos[validas]
+        with cronometrar(self.tempos_etapas, 'categorizacao'):
+            categorias = self.motor_categorias.categorizar_serie(descricao).to_numpy(dtype=object)
+
+        novo = pd.DataFrame({
+            'Data': data[validas].to_numpy(),
+            'Descrição': descricao.to_numpy(dtype=object),
+            'Valor': centavos / 100,
+            'Tipo': np.where(centavos > 0, 'Receita', 'Despesa').astype(object),
+            'Categoria': categorias,
+            'Centavos': centavos,
+        }, columns=COLUNAS_DATAFRAME)
+        if 'identificador' in df.columns:
+            novo['Identificador'] = df['identificador'][validas].to_numpy(dtype=object)
+        return novo
+
+# converte uma coluna lida do csv em texto, como str() faria em cada célula
+def _como_texto(serie):
+    return serie.astype(object).where(serie.notna(), 'nan').astype(str)
+
+# interpreta as datas (dia primeiro) usando o formato inferido e, se falhar, valor a valor
+def _converter_datas(serie):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)
+        datas = pd.to_datetime(serie, dayfirst=True, errors='coerce')
+        pendentes = datas.isna() & serie.notna()
+        if pendentes.any():
+            datas[pendentes] = pd.to_datetime(serie[pendentes], dayfirst=True, errors='coerce', format='mixed')
+    return datas
+
 #classe que gera relatórios financeiros com base nas transações
 class RelatorioFinanceiro:
-    def __init__(self, carteira: CarteiraFinanceira, id_relatorio: str):
-        self.df = carteira.obter_dataframe()
+    # todos os resumos (json, gráficos e pdf) saem de self.agregados, calculado uma única vez;
+    # com agregados prontos (importação em streaming, livro-razão) não há self.df
+    ARTEFATOS = ('balanco_mensal.png', 'distribuicao_tipos.png', 'categorias_despesas.png', 'relatorio_completo.pdf')
+    ARQUIVO_AGREGADOS = 'agregados.json'
+    ARQUIVO_PADROES = 'padroes.json'
+
+    def __init__(self, carteira: CarteiraFinanceira, id_relatorio: str, agregados: AgregadosFinanceiros = None, padroes=None):
+        self.df = carteira.obter_dataframe() if agregados is None else None
+        self.agregados = agregados if agregados is not None else AgregadosFinanceiros.de_dataframe(self.df)
+        self.padroes = padroes #recorrências e gastos atípicos (padroes.detectar_padroes); só existem com self.df
         self.id_relatorio = id_relatorio
         self.pasta_saida = os.path.join(OUTPUT_FOLDER, id_relatorio)
         os.makedirs(self.pasta_saida, exist_ok=True)
+        self._graficos_pendentes = {} #nome do gráfico -> (future do desenho em andamento, arquivo temporário)
+        self.tempos_graficos = {} #nome do gráfico -> segundos gastos para desenhar e salvar
+        self.tempo_pdf = None #segundos gastos na última exportação do pdf completo
+
+    #reabre um relatório já analisado a partir dos agregados gravados na pasta dele (None se não existir)
+    @classmethod
+    def de_pasta(cls, id_relatorio):
+        try:
+            with open(os.path.join(OUTPUT_FOLDER, id_relatorio, cls.ARQUIVO_AGREGADOS), encoding='utf-8') as f:
+                agregados = AgregadosFinanceiros.de_dict(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return None
+        try:
+            with open(os.path.join(OUTPUT_FOLDER, id_relatorio, cls.ARQUIVO_PADROES), encoding='utf-8') as f:
+                padroes = json.load(f)
+        except (OSError, ValueError):
+            padroes = None
+        return cls(None, id_relatorio, agregados=agregados, padroes=padroes)
+
+    #grava só os agregados; gráficos e pdf são gerados a partir deles quando pedidos
+    def salvar_agregados(self):
+        with escrita_atomica(os.path.join(self.pasta_saida, self.ARQUIVO_AGREGADOS)) as parcial:
+            with open(parcial, 'w', encoding='utf-8') as f:
+                json.dump(self.agregados.para_dict(), f, ensure_ascii=False)
+
+    #grava data, valor e categoria de cada transação para as consultas filtradas; sem self.df
+    #(importação em streaming) só existem os agregados e o relatório não aceita consultas
+    def salvar_transacoes(self):
+        if self.df is None:
+            return False
+        with escrita_atomica(os.path.join(self.pasta_saida, ARQUIVO_TRANSACOES)) as parcial:
+            with open(parcial, 'wb') as f:
+                gravar_transacoes(f, self.df)
+        return True
+
+    #detecta recorrências e gastos atípicos nas transações; sem self.df (streaming, livro-razão) fica None
+    def gerar_padroes(self):
+        if self.padroes is None and self.df is not None:
+            self.padroes = detectar_padroes(self.df)
+        return self.padroes
+
+    #grava os padrões detectados para o pdf gerado depois, a partir da pasta do relatório
+    def salvar_padroes(self):
+        if self.padroes is None:
+            return
+        with escrita_atomica(os.path.join(self.pasta_saida, self.ARQUIVO_PADROES)) as parcial:
+            with open(parcial, 'w', encoding='utf-8') as f:
+                json.dump(self.padroes, f, ensure_ascii=False)
+
+    #gera um dos ARTEFATOS se ainda não existir e devolve o caminho do arquivo
+    def gerar_artefato(self, nome):
+        if nome not in self.ARTEFATOS:
+            raise ValueError(f"Artefato desconhecido: {nome}")
+        caminho = os.path.join(self.pasta_saida, nome)
+        if not os.path.exists(caminho):
+            if nome == 'relatorio_completo.pdf':
+                self.exportar_pdf()
+            else:
+                self.iniciar_graficos([nome.removesuffix('.png')])
+                self.aguardar_graficos()
+        return caminho
      # gera um resumo mensal com somatório de receitas e despesas
     def _get_resumo_mensal_df(self):
-        df_copy = self.df.copy()
-        df_copy['Mês'] = df_copy['Data'].dt.to_period('M').astype(str)
-        resumo = df_copy.groupby(['Mês', 'Tipo'])['Valor'].sum().unstack().fillna(0)
-        if 'Receita' not in resumo: resumo['Receita'] = 0
-        if 'Despesa' not in resumo: resumo['Despesa'] = 0
-        return resumo
+        return self.agregados.resumo_mensal()
     #retorna df com valores mensais
     def gerar_relatorio_mensal(self):
         return self._get_resumo_mensal_df()
     #gera resumo com total por categoria de despesa
     def gerar_resumo_categorias(self):
-        despesas_df = self.df[self.df['Tipo'] == 'Despesa']
-        if despesas_df.empty:
-            return {}
-        resumo = despesas_df.groupby('Categoria')['Valor'].sum().abs().sort_values(ascending=False)
-        return resumo.to_dict()
+        return self.agregados.resumo_categorias()
      #calcula indicadores principais do período
     def gerar_kpis(self):
-        if self.df.empty:
-            return {'receita_total': 0, 'despesa_total': 0, 'saldo_final': 0, 'taxa_poupanca': 0}
-        
-        receita_total = self.df[self.df['Tipo'] == 'Receita']['Valor'].sum()
-        despesa_total = self.df[self.df['Tipo'] == 'Despesa']['Valor'].sum()
-        saldo_final = receita_total + despesa_total
-        
-        taxa_poupanca = (saldo_final / receita_total) * 100 if receita_total > 0 else 0
-
-        return {
-            'receita_total': receita_total,
-            'despesa_total': despesa_total,
-            'saldo_final': saldo_final,
-            'taxa_poupanca': taxa_poupanca
-        }
-     #gera gráficos de barras, pizza e categorias e salva como imagem
-    def gerar_graficos(self):
+        return self.agregados.kpis()
+    #dispara os gráficos pedidos (todos por padrão); cada um é gravado com outro nome e renomeado ao terminar
+    def iniciar_graficos(self, nomes=None):
+        import graficos
         resumo = self._get_resumo_mensal_df()
-        plt.style.use('seaborn-v0_8-whitegrid')
-        
-        
-        fig, ax = plt.subplots(figsize=(10, 6))
-        resumo.plot(kind='bar', stacked=False, ax=ax, color={'Despesa': '#d9534f', 'Receita': '#5cb85c'})
-        ax.set_title('Receitas vs Despesas por Mês', fontsize=16)
-        ax.set_ylabel('Valor (R$)', fontsize=12)
-        ax.set_xlabel('Mês', fontsize=12)
-        plt.xticks(rotation=45, ha="right")
-        fig.tight_layout()
-        caminho_grafico_barras = os.path.join(self.pasta_saida, 'balanco_mensal.png')
-        fig.savefig(caminho_grafico_barras)
-        plt.close(fig)
+        tipos = self.agregados.totais_por_tipo()
+        categorias_df = self.agregados.despesas_por_categoria()
 
-        
-        fig, ax = plt.subplots(figsize=(8, 8))
-        tipos = self.df.groupby('Tipo')['Valor'].sum().abs()
-        ax.pie(tipos, labels=tipos.index, autopct='%1.1f%%', colors=['#d9534f', '#5cb85c'], startangle=90)
-        ax.set_title('Distribuição de Receitas e Despesas', fontsize=16)
-        caminho_grafico_pizza = os.path.join(self.pasta_saida, 'distribuicao_tipos.png')
-        fig.savefig(caminho_grafico_pizza)
-        plt.close(fig)
-        
-        
-        fig, ax = plt.subplots(figsize=(10, 7)) 
-        categorias_df = self.df[self.df['Tipo'] == 'Despesa'].groupby('Categoria')['Valor'].sum().abs().sort_values()
-        
-        cores = plt.get_cmap('Paired')(range(len(categorias_df)))
-        
-        wedges, texts, autotexts = ax.pie(
-            categorias_df, autopct='%1.1f%%', startangle=90, colors=cores,
-            wedgeprops={'edgecolor': 'white', 'linewidth': 1}
-        )
-        ax.legend(wedges, categorias_df.index, title="Categorias", loc="center left", bbox_to_anchor=(1, 0, 0.5, 1))
-        plt.setp(autotexts, size=10, weight="bold", color="white")
-        ax.set_title('Despesas por Categoria', fontsize=16)
-        
-        caminho_grafico_categorias = os.path.join(self.pasta_saida, 'categorias_despesas.png')
-        fig.savefig(caminho_grafico_categorias, bbox_inches='tight')
-        plt.close(fig)
+        tarefas = {
+            'balanco_mensal': (graficos.desenhar_balanco_mensal, list(resumo.index), list(resumo.columns), [resumo[c].tolist() for c in resumo.columns]),
+            'distribuicao_tipos': (graficos.desenhar_distribuicao_tipos, list(tipos.index), tipos.tolist()),
+            'categorias_despesas': (graficos.desenhar_categorias, list(categorias_df.index), categorias_df.tolist()),
+        }
+        executor = _executor_graficos()
+        for nome, (funcao, *args) in tarefas.items():
+            if nomes is None or nome in nomes:
+                parcial = caminho_parcial(os.path.join(self.pasta_saida, f'{nome}.png'))
+                self._graficos_pendentes[nome] = (executor.submit(funcao, *args, parcial), parcial)
 
         return (
             f"/relatorios/{self.id_relatorio}/balanco_mensal.png",
             f"/relatorios/{self.id_relatorio}/distribuicao_tipos.png",
             f"/relatorios/{self.id_relatorio}/categorias_despesas.png"
         )
+    #devolve (nome, url, segundos) de cada gráfico disparado à medida que ele termina de ser salvo
+    def graficos_concluidos(self):
+        pendentes = {futuro: nome for nome, (futuro, _) in self._graficos_pendentes.items()}
+        try:
+            for futuro in as_completed(pendentes):
+                nome = pendentes[futuro]
+                _, parcial = self._graficos_pendentes.pop(nome)
+                try: #se o desenho falhou, o png pela metade não fica na pasta
+                    self.tempos_graficos[nome] = futuro.result()
+                    os.replace(parcial, os.path.join(self.pasta_saida, f'{nome}.png'))
+                finally:
+                    _descartar_parcial(parcial)
+                app.logger.info("gráfico %s do relatório %s: %.3fs", nome, self.id_relatorio, self.tempos_graficos[nome])
+                yield nome, f"/relatorios/{self.id_relatorio}/{nome}.png", self.tempos_graficos[nome]
+        finally:
+            #saída antes do fim (outro desenho falhou, cliente desistiu): os que ainda estão sendo desenhados
+            #apagam o parcial ao terminar e são redesenhados se pedidos de novo
+            for nome in pendentes.values():
+                if nome in self._graficos_pendentes:
+                    futuro, parcial = self._graficos_pendentes.pop(nome)
+                    futuro.add_done_callback(lambda _futuro, parcial=parcial: _descartar_parcial(parcial))
+    #espera os gráficos disparados e registra quanto tempo cada um levou
+    def aguardar_graficos(self):
+        for _ in self.graficos_concluidos():
+            pass
+        return self.tempos_graficos
+     #gera gráficos de barras, pizza e categorias e salva como imagem
+    def gerar_graficos(self):
+        urls = self.iniciar_graficos()
+        self.aguardar_graficos()
+        return urls
 
     def exportar_pdf(self):
+        return self.concluir_pdf(self.iniciar_pdf())
+
+    #monta as seções de texto do pdf completo; os gráficos só são esperados em concluir_pdf, então
+    #quem já disparou iniciar_graficos monta o texto enquanto eles são desenhados
+    def iniciar_pdf(self):
+        inicio = time.perf_counter()
+        from fpdf import FPDF
         pdf = FPDF()
         pdf.add_page()
         pdf.set_font("Arial", size=16, style='B')
@@ -251,6 +687,20 @@ class RelatorioFinanceiro:
             pdf.cell(0, 8, txt=f"{categoria}: R$ {valor:,.2f}", ln=True, border=1)
         pdf.ln(10)
 
+        if self.padroes:
+            from pdf_rapido import secao_padroes
+            secao_padroes(pdf, self.padroes)
+            pdf.ln(10)
+        return pdf, inicio
+
+    #espera os gráficos (desenhando só os que faltam), embute as imagens e grava o pdf
+    def concluir_pdf(self, pdf_iniciado):
+        pdf, inicio = pdf_iniciado
+        faltando = [nome for nome in ('balanco_mensal', 'distribuicao_tipos', 'categorias_despesas')
+                    if nome not in self._graficos_pendentes and not os.path.exists(os.path.join(self.pasta_saida, f'{nome}.png'))]
+        if faltando:
+            self.iniciar_graficos(faltando)
+        self.aguardar_graficos()
         pdf.set_font("Arial", size=12, style='B')
         pdf.cell(0, 10, txt="Gráficos de Análise", ln=True, align='L')
         for imagem in ["balanco_mensal.png", "distribuicao_tipos.png", "categorias_despesas.png"]:
@@ -259,57 +709,477 @@ class RelatorioFinanceiro:
                 pdf.image(caminho_imagem, w=180)
                 pdf.ln(5)
 
-        caminho_pdf = os.path.join(self.pasta_saida, 'relatorio_completo.pdf')
-        pdf.output(caminho_pdf)
+        with escrita_atomica(os.path.join(self.pasta_saida, 'relatorio_completo.pdf')) as parcial:
+            pdf.output(parcial)
+        self.tempo_pdf = time.perf_counter() - inicio
         return f"/relatorios/{self.id_relatorio}/relatorio_completo.pdf"
 
+    #versão leve do pdf, com gráficos vetoriais e sem pngs; devolve os bytes em vez de gravar
+    def exportar_pdf_rapido(self):
+        from pdf_rapido import gerar_pdf_rapido
+        return gerar_pdf_rapido(self.agregados, padroes=self.padroes)
+
+def usa_streaming(streaming, tamanho_bytes):
+    return streaming or tamanho_bytes > LIMITE_STREAMING_BYTES
+
+# chave do cache de resultados para um upload analisado no modo que a análise vai usar de fato
+def chave_analise(hash_conteudo, streaming, tamanho_bytes):
+    modo = 'streaming' if usa_streaming(streaming, tamanho_bytes) else 'completo'
+    return chave_conteudo(hash_conteudo, MOTOR_CATEGORIAS.versao, modo, VERSAO_RESULTADO)
+
+# pipeline completo de uma análise, etapa por etapa; cada etapa concluída produz um evento
+# (importacao, agregados, padroes, grafico, pdf) e o último, 'concluido', traz a resposta completa.
+# por padrão só os agregados são gravados e gráficos/pdf ficam para o primeiro acesso em
+# /relatorios; com gerar_artefatos=True eles são gerados aqui mesmo, como antes
+def eventos_analise(caminho_salvo, id_unico, streaming=False, gerar_artefatos=False):
+    carteira = CarteiraFinanceira()
+    #arquivos grandes (ou ?modo=streaming) são lidos em blocos, guardando só os agregados
+    if usa_streaming(streaming, os.path.getsize(caminho_salvo)):
+        agregados = carteira.importar_csv_streaming(caminho_salvo)
+    else:
+        carteira.importar_csv(caminho_salvo)
+        agregados = None
+    yield {
+        "etapa": "importacao",
+        "linhas_lidas": carteira.linhas_lidas,
+        "linhas_rejeitadas": carteira.linhas_rejeitadas,
+        "transacoes": agregados.total_linhas if agregados is not None else len(carteira.transacoes),
+        "formato_detectado": carteira.formato_detectado
+    }
+
+    with cronometrar(carteira.tempos_etapas, 'agregacao'):
+        relatorio = RelatorioFinanceiro(carteira, id_unico, agregados=agregados)
+        resumo_mensal = relatorio.gerar_relatorio_mensal().to_dict(orient='index')
+        despesas_por_categoria = relatorio.gerar_resumo_categorias()
+        kpis = relatorio.gerar_kpis()
+    relatorio.salvar_agregados()
+    consultavel = relatorio.salvar_transacoes()
+    yield {"etapa": "agregados", "resumo_mensal": resumo_mensal, "despesas_por_categoria": despesas_por_categoria, "kpis": kpis}
+
+    #recorrências e gastos atípicos precisam das transações; na importação em streaming ficam de fora
+    if relatorio.df is not None:
+        with cronometrar(carteira.tempos_etapas, 'padroes'):
+            relatorio.gerar_padroes()
+        relatorio.salvar_padroes()
+        yield {"etapa": "padroes", "padroes": relatorio.padroes}
+
+    url_grafico_barras, url_grafico_pizza, url_grafico_categorias, url_pdf = (
+        f"/relatorios/{id_unico}/{nome}" for nome in RelatorioFinanceiro.ARTEFATOS)
+    if gerar_artefatos:
+        relatorio.iniciar_graficos()
+        #o texto do pdf é montado enquanto os gráficos são desenhados; cada gráfico vira um evento ao terminar
+        pdf_iniciado = relatorio.iniciar_pdf()
+        for nome, url, tempo in relatorio.graficos_concluidos():
+            yield {"etapa": "grafico", "nome": nome, "url": url, "tempo": tempo}
+        relatorio.concluir_pdf(pdf_iniciado)
+        carteira.tempos_etapas['pdf'] = relatorio.tempo_pdf
+        yield {"etapa": "pdf", "url": url_pdf}
+
+    yield {"etapa": "concluido", "resultado": {
+        "sucesso": True,
+        "resumo_mensal": resumo_mensal,
+        "despesas_por_categoria": despesas_por_categoria,
+        "kpis": kpis,
+        "padroes": relatorio.padroes,
+        "formato_detectado": carteira.formato_detectado,
+        "tempos_graficos": relatorio.tempos_graficos,
+        "tempos_etapas": carteira.tempos_etapas,
+        "linhas_lidas": carteira.linhas_lidas,
+        "linhas_rejeitadas": carteira.linhas_rejeitadas,
+        "agregados": relatorio.agregados.para_dict(), #permite consolidar vários relatórios (ex.: /analisar/lote)
+        "urls": {
+            "grafico_barras": url_grafico_barras,
+            "grafico_pizza": url_grafico_pizza,
+            "grafico_categorias": url_grafico_categorias, # NOVO: Envia a URL do novo gráfico
+            "pdf_completo": url_pdf,
+            "pdf_rapido": f"/relatorios/{id_unico}/relatorio_rapido.pdf"
+        },
+        #fora de "urls", que só lista artefatos para baixar; ausente quando não há transações gravadas
+        **({"consulta": f"/relatorios/{id_unico}/consulta"} if consultavel else {})
+    }}
+
+# pipeline completo de uma análise; é uma função de módulo para poder rodar nos processos da fila
+def executar_analise(caminho_salvo, id_unico, streaming=False, gerar_artefatos=False):
+    *_, concluido = eventos_analise(caminho_salvo, id_unico, streaming, gerar_artefatos)
+    return concluido['resultado']
+
+# registra nas métricas os tempos e contagens de uma análise nova (não as vindas do cache);
+# vale também para análises feitas em outros processos, que devolvem os tempos na resposta
+def registrar_analise(resposta):
+    for etapa, segundos in resposta.get('tempos_etapas', {}).items():
+        METRICAS.observar('etapa_segundos', segundos, etapa=etapa)
+    for nome, segundos in resposta.get('tempos_graficos', {}).items():
+        METRICAS.observar('grafico_segundos', segundos, grafico=nome)
+    METRICAS.incrementar('linhas_lidas_total', resposta.get('linhas_lidas', 0))
+    METRICAS.incrementar('linhas_rejeitadas_total', resposta.get('linhas_rejeitadas', 0))
+    METRICAS.incrementar('analises_total', resultado='sucesso')
+
+def _linhas_ndjson(eventos):
+    for evento in eventos:
+        yield app.json.dumps(evento) + '\n'
+
+# respostas em streaming leem os uploads e escrevem nas pastas de relatório depois que a view
+# retorna; a reserva dura até o último evento
+def _com_reservas(caminhos, eventos):
+    with ARMAZENAMENTO.em_uso(*caminhos):
+        yield from eventos
+
+# eventos da análise guardando o resultado no cache ao concluir; com a resposta já iniciada,
+# um erro vira um último evento 'erro' em vez de um status http
+def _eventos_com_cache(caminho_salvo, id_unico, streaming, gerar_artefatos, chave):
+    try:
+        for evento in eventos_analise(caminho_salvo, id_unico, streaming, gerar_artefatos):
+            if evento['etapa'] == 'concluido':
+                CACHE_RESULTADOS.guardar(chave, id_unico, evento['resultado'])
+                registrar_analise(evento['resultado'])
+            yield evento
+    except Exception as e:
+        METRICAS.incrementar('analises_total', resultado='erro')
+        if not isinstance(e, ValueError):
+            import traceback
+            traceback.print_exc()
+        yield {"etapa": "erro", "erro": str(e), "codigo_erro": 400 if isinstance(e, ValueError) else 500}
+
+#grava o upload em blocos calculando o hash, sem carregar o arquivo inteiro na memória
+def salvar_upload(stream):
+    inicio = time.perf_counter()
+    caminho_temporario = os.path.join(UPLOAD_FOLDER, f".{uuid.uuid4().hex}.parcial")
+    hash_conteudo = hashlib.sha256()
+    with open(caminho_temporario, 'wb') as f:
+        for bloco in iter(lambda: stream.read(1024 * 1024), b''):
+            hash_conteudo.update(bloco)
+            f.write(bloco)
+    METRICAS.observar('etapa_segundos', time.perf_counter() - inicio, etapa='upload')
+    return caminho_temporario, hash_conteudo.hexdigest()
+
+def _resposta_job(id_job):
+    return jsonify({
+        "job_id": id_job,
+        "status_url": f"/jobs/{id_job}",
+        "resultado_url": f"/jobs/{id_job}/resultado"
+    }), 202
+
 @app.route('/analisar', methods=['POST'])
 def analisar_planilha():
     if 'planilha' not in request.files: return jsonify({"erro": "Nenhum arquivo enviado."}), 400
     file = request.files['planilha']
     if file.filename == '': return jsonify({"erro": "Nenhum arquivo selecionado."}), 400
 
-    filename = secure_filename(file.filename)
-    id_unico = str(int(datetime.now().timestamp()))
-    caminho_salvo = os.path.join(UPLOAD_FOLDER, f"{id_unico}_{filename}")
-    file.save(caminho_salvo)
+    caminho_temporario, hash_conteudo = salvar_upload(file.stream)
+    streaming = request.args.get('modo') == 'streaming'
+    chave = chave_analise(hash_conteudo, streaming, os.path.getsize(caminho_temporario))
+    resposta_cache = CACHE_RESULTADOS.obter(chave)
+    if resposta_cache is not None:
+        os.remove(caminho_temporario)
+        if request.args.get('eventos') in ('1', 'true'):
+            return Response(_linhas_ndjson([{"etapa": "concluido", "resultado": resposta_cache}]), mimetype='application/x-ndjson')
+        if request.args.get('assincrono') in ('1', 'true'):
+            return _resposta_job(FILA_JOBS.registrar_concluido(resposta_cache))
+        return jsonify(resposta_cache)
+
+    id_unico = novo_id_relatorio()
+    caminho_salvo = ARMAZENAMENTO.armazenar_upload(caminho_temporario, hash_conteudo)
+    #upload e pasta do relatório ficam reservados contra a compactação até o resultado ir para o cache
+    reservas = [caminho_salvo, os.path.join(OUTPUT_FOLDER, id_unico)]
+    #?artefatos=1 gera gráficos e pdf durante a análise em vez de no primeiro acesso
+    gerar_artefatos = request.args.get('artefatos') in ('1', 'true')
+
+    #modo eventos: resposta em ndjson com uma linha por etapa concluída, para o cliente mostrar o progresso
+    if request.args.get('eventos') in ('1', 'true'):
+        eventos = _eventos_com_cache(caminho_salvo, id_unico, streaming, gerar_artefatos, chave)
+        return Response(stream_with_context(_linhas_ndjson(_com_reservas(reservas, eventos))),
+                        mimetype='application/x-ndjson')
+
+    #modo assíncrono: devolve o id do job na hora e o cliente consulta /jobs/<id>
+    if request.args.get('assincrono') in ('1', 'true'):
+        for caminho in reservas: #o job pode esperar na fila além da carência
+            ARMAZENAMENTO.reservar(caminho)
+        id_job = FILA_JOBS.submeter(
+            executar_analise, caminho_salvo, id_unico, streaming, gerar_artefatos,
+            ao_concluir=lambda resposta: (CACHE_RESULTADOS.guardar(chave, id_unico, resposta), registrar_analise(resposta)),
+            ao_finalizar=lambda: [ARMAZENAMENTO.liberar(caminho) for caminho in reservas]
+        )
+        return _resposta_job(id_job)
 
     try:
-        carteira = CarteiraFinanceira()
-        carteira.importar_csv(caminho_salvo)
-        relatorio = RelatorioFinanceiro(carteira, id_unico)
-        
-        resumo_mensal = relatorio.gerar_relatorio_mensal()
-        despesas_por_categoria = relatorio.gerar_resumo_categorias()
-        kpis = relatorio.gerar_kpis()
-        
-        # MODIFICADO: Recebe os 3 caminhos de URL
-        url_grafico_barras, url_grafico_pizza, url_grafico_categorias = relatorio.gerar_graficos()
-        url_pdf = relatorio.exportar_pdf()
-        
-        return jsonify({
-            "sucesso": True,
-            "resumo_mensal": resumo_mensal.to_dict(orient='index'),
-            "despesas_por_categoria": despesas_por_categoria,
-            "kpis": kpis,
-            "urls": {
-                "grafico_barras": url_grafico_barras,
-                "grafico_pizza": url_grafico_pizza,
-                "grafico_categorias": url_grafico_categorias, # NOVO: Envia a URL do novo gráfico
-                "pdf_completo": url_pdf
-            }
-        })
+        with ARMAZENAMENTO.em_uso(*reservas):
+            resposta = executar_analise(caminho_salvo, id_unico, streaming, gerar_artefatos)
+            CACHE_RESULTADOS.guardar(chave, id_unico, resposta)
+        registrar_analise(resposta)
+        return jsonify(resposta)
     except ValueError as e:
+        METRICAS.incrementar('analises_total', resultado='erro')
         return jsonify({"erro": str(e)}), 400
     except Exception as e:
+        METRICAS.incrementar('analises_total', resultado='erro')
         import traceback
         traceback.print_exc()
         return jsonify({"erro": f"Ocorreu um erro interno inesperado: {e}"}), 500
 
+# analisa vários extratos no pool de processos e produz um resultado por arquivo, na ordem em que
+# terminam, seguido de um resumo consolidado. `arquivos` é uma lista de dicts com nome, caminho, id
+# e chave (chave=None desliga o cache para aquele arquivo).
+def analisar_lote(arquivos, executor, cache=None):
+    consolidado = AgregadosFinanceiros()
+    concluidos, erros = 0, 0
+    futuros = {}
+    for arquivo in arquivos:
+        resposta = cache.obter(arquivo['chave']) if cache is not None and arquivo['chave'] else None
+        if resposta is not None:
+            consolidado.combinar(AgregadosFinanceiros.de_dict(resposta['agregados']))
+            concluidos += 1
+            yield {"arquivo": arquivo['nome'], "resultado": resposta}
+        else:
+            futuros[executor.submit(executar_analise, arquivo['caminho'], arquivo['id'])] = arquivo
+
+    for futuro in as_completed(futuros):
+        arquivo = futuros[futuro]
+        try:
+            resposta = futuro.result()
+        except Exception as e:
+            erros += 1
+            METRICAS.incrementar('analises_total', resultado='erro')
+            yield {"arquivo": arquivo['nome'], "erro": str(e), "codigo_erro": 400 if isinstance(e, ValueError) else 500}
+            continue
+        if cache is not None and arquivo['chave']:
+            cache.guardar(arquivo['chave'], arquivo['id'], resposta)
+        registrar_analise(resposta)
+        consolidado.combinar(AgregadosFinanceiros.de_dict(resposta['agregados']))
+        concluidos += 1
+        yield {"arquivo": arquivo['nome'], "resultado": resposta}
+
+    yield {"consolidado": {
+        "arquivos": concluidos + erros,
+        "concluidos": concluidos,
+        "erros": erros,
+        "total_transacoes": consolidado.total_linhas,
+        "resumo_mensal": consolidado.resumo_mensal().to_dict(orient='index'),
+        "despesas_por_categoria": consolidado.resumo_categorias(),
+        "kpis": consolidado.kpis()
+    }}
+
+# arquivos enviados ao lote: vários campos 'planilhas' e/ou arquivos .zip com csvs dentro
+def _extrair_uploads_lote(arquivos_enviados):
+    for file in arquivos_enviados:
+        if file.filename.lower().endswith('.zip'):
+            try:
+                with zipfile.ZipFile(file.stream) as pacote:
+                    for membro in pacote.infolist():
+                        if membro.is_dir() or not membro.filename.lower().endswith('.csv'): continue
+                        with pacote.open(membro) as conteudo:
+                            yield os.path.basename(membro.filename), *salvar_upload(conteudo)
+            except zipfile.BadZipFile:
+                raise ValueError(f"O arquivo '{file.filename}' não é um zip válido.")
+        elif file.filename:
+            yield file.filename, *salvar_upload(file.stream)
+
+@app.route('/analisar/lote', methods=['POST'])
+def analisar_planilhas_lote():
+    arquivos_enviados = request.files.getlist('planilhas')
+    if not arquivos_enviados: return jsonify({"erro": "Nenhum arquivo enviado."}), 400
+
+    arquivos = []
+    try:
+        for nome, caminho_temporario, hash_conteudo in _extrair_uploads_lote(arquivos_enviados):
+            id_unico = novo_id_relatorio()
+            chave = chave_analise(hash_conteudo, False, os.path.getsize(caminho_temporario))
+            caminho_salvo = ARMAZENAMENTO.armazenar_upload(caminho_temporario, hash_conteudo)
+            arquivos.append({"nome": nome, "caminho": caminho_salvo, "id": id_unico, "chave": chave})
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+    if not arquivos: return jsonify({"erro": "Nenhum arquivo .csv encontrado."}), 400
+
+    #uma linha json por evento (application/x-ndjson), enviada assim que cada arquivo termina
+    eventos = analisar_lote(arquivos, _executor_lote(), CACHE_RESULTADOS)
+    reservas = [caminho for arquivo in arquivos for caminho in (arquivo['caminho'], os.path.join(OUTPUT_FOLDER, arquivo['id']))]
+    eventos = _com_reservas(reservas, eventos)
+    return Response(stream_with_context(_linhas_ndjson(eventos)), mimetype='application/x-ndjson')
+
+@app.route('/jobs/<id_job>')
+def status_job(id_job):
+    status = FILA_JOBS.status(id_job)
+    if status is None: return jsonify({"erro": "Job não encontrado."}), 404
+    return jsonify(status)
+
+@app.route('/jobs/<id_job>/resultado')
+def resultado_job(id_job):
+    job = FILA_JOBS.resultado(id_job)
+    if job is None: return jsonify({"erro": "Job não encontrado."}), 404
+    if job['estado'] == ERRO: return jsonify({"erro": job['erro']}), job['codigo_erro']
+    if job['estado'] != CONCLUIDO: return jsonify(FILA_JOBS.status(id_job)), 202
+    return jsonify(job['resultado'])
+
+# visão consolidada de uma conta a partir dos agregados do livro-razão
+def resumo_livro(conta, livro):
+    livro.recarregar() #outros workers podem ter acrescentado extratos à conta
+    agregados = livro.agregados
+    return {
+        "conta": conta,
+        "total_transacoes": livro.total_linhas,
+        "resumo_mensal": agregados.resumo_mensal().to_dict(orient='index'),
+        "despesas_por_categoria": agregados.resumo_categorias(),
+        "kpis": agregados.kpis()
+    }
+
+@app.route('/contas/<conta>/extratos', methods=['POST'])
+def adicionar_extrato(conta):
+    if 'planilha' not in request.files: return jsonify({"erro": "Nenhum arquivo enviado."}), 400
+    file = request.files['planilha']
+    if file.filename == '': return jsonify({"erro": "Nenhum arquivo selecionado."}), 400
+    conta = secure_filename(conta)
+    if not conta: return jsonify({"erro": "Conta inválida."}), 400
+
+    caminho_salvo = ARMAZENAMENTO.armazenar_upload(*salvar_upload(file.stream))
+    try:
+        carteira = CarteiraFinanceira()
+        with ARMAZENAMENTO.em_uso(caminho_salvo):
+            carteira.importar_csv(caminho_salvo)
+        livro = obter_livro(conta)
+        contagem = livro.adicionar(carteira.obter_dataframe())
+        return jsonify({"sucesso": True, **contagem, **resumo_livro(conta, livro)})
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+@app.route('/contas/<conta>')
+def consultar_conta(conta):
+    conta = secure_filename(conta)
+    if not conta or not os.path.isdir(os.path.join(CONTAS_FOLDER, conta)):
+        return jsonify({"erro": "Conta não encontrada."}), 404
+    return jsonify({"sucesso": True, **resumo_livro(conta, obter_livro(conta))})
+
+@app.route('/metricas/cache')
+def metricas_cache():
+    return jsonify(CACHE_RESULTADOS.metricas())
+
+@app.route('/metrics')
+def metricas_prometheus():
+    cache = CACHE_RESULTADOS.metricas()
+    uso = ARMAZENAMENTO.metricas()
+    medidores = {
+        'cache_acertos': cache['acertos'], 'cache_falhas': cache['falhas'],
+        'cache_remocoes': cache['remocoes'], 'cache_entradas': cache['entradas'],
+        'jobs_ativos': FILA_JOBS.ativos(),
+    }
+    if 'uploads' in uso:
+        medidores['uploads_bytes'] = uso['uploads']['bytes']
+        medidores['relatorios_bytes'] = uso['relatorios']['bytes']
+    return Response(METRICAS.exportar(medidores), mimetype='text/plain; version=0.0.4')
+
+@app.route('/metricas/armazenamento')
+def metricas_armazenamento():
+    return jsonify(ARMAZENAMENTO.metricas())
+
+#pdf leve montado na hora a partir dos agregados guardados do relatório, sem arquivo temporário
+@app.route('/relatorios/<id_relatorio>/relatorio_rapido.pdf')
+def servir_pdf_rapido(id_relatorio):
+    relatorio = RelatorioFinanceiro.de_pasta(secure_filename(id_relatorio))
+    if relatorio is None: return jsonify({"erro": "Relatório não encontrado."}), 404
+    conteudo = relatorio.exportar_pdf_rapido()
+    return send_file(io.BytesIO(conteudo), mimetype='application/pdf', download_name='relatorio_rapido.pdf')
+
+#kpis, resumo mensal e despesas por categoria de um recorte do relatório, sem reimportar o csv:
+#?inicio=&fim= (AAAA-MM-DD, AAAA-MM ou AAAA, inclusivos), ?categoria= (repetível), ?tipo=receita|despesa
+#e ?valor_min=/?valor_max= (valor absoluto)
+def _numero_consulta(nome):
+    texto = request.args.get(nome)
+    if not texto:
+        return None
+    try:
+        return float(texto.replace(',', '.'))
+    except ValueError:
+        raise ValueError(f"Valor inválido em {nome}: {texto}")
+
+@app.route('/relatorios/<id_relatorio>/consulta')
+def consultar_relatorio(id_relatorio):
+    if secure_filename(id_relatorio) != id_relatorio or not os.path.isdir(os.path.join(OUTPUT_FOLDER, id_relatorio)):
+        return jsonify({"erro": "Relatório não encontrado."}), 404
+    inicio = time.perf_counter()
+    indice = INDICES_CONSULTA.obter(id_relatorio)
+    if indice is None:
+        return jsonify({"erro": "Relatório sem transações gravadas para consulta (analisado em streaming ou antes das consultas)."}), 404
+    try:
+        filtros = {
+            "inicio": request.args.get('inicio'),
+            "fim": request.args.get('fim'),
+            "categorias": request.args.getlist('categoria'),
+            "tipo": request.args.get('tipo'),
+            "valor_min": _numero_consulta('valor_min'),
+            "valor_max": _numero_consulta('valor_max'),
+        }
+        resultado = indice.consultar(**filtros)
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+    return jsonify({"sucesso": True, "filtros": filtros, **resultado, "tempo_ms": (time.perf_counter() - inicio) * 1000})
+
+#gráficos e pdf são desenhados no primeiro acesso a partir dos agregados gravados e ficam na pasta
+#do relatório para os próximos; a trava por relatório evita desenhar o mesmo arquivo duas vezes
+_travas_relatorios = [threading.Lock() for _ in range(16)]
+
 @app.route('/relatorios/<path:path>')
 def servir_relatorio(path):
+    id_relatorio, _, nome = path.partition('/')
+    if (nome in RelatorioFinanceiro.ARTEFATOS and secure_filename(id_relatorio) == id_relatorio
+            and not os.path.exists(os.path.join(OUTPUT_FOLDER, id_relatorio, nome))):
+        with _travas_relatorios[hash(id_relatorio) % len(_travas_relatorios)], \
+                ARMAZENAMENTO.em_uso(os.path.join(OUTPUT_FOLDER, id_relatorio)):
+            relatorio = RelatorioFinanceiro.de_pasta(id_relatorio)
+            if relatorio is None: return jsonify({"erro": "Relatório não encontrado."}), 404
+            relatorio.gerar_artefato(nome)
+            for grafico, segundos in relatorio.tempos_graficos.items():
+                METRICAS.observar('grafico_segundos', segundos, grafico=grafico)
+            if relatorio.tempo_pdf is not None:
+                METRICAS.observar('etapa_segundos', relatorio.tempo_pdf, etapa='pdf')
+    if nome in RelatorioFinanceiro.ARTEFATOS:
+        ARMAZENAMENTO.registrar_acesso(os.path.join(OUTPUT_FOLDER, id_relatorio))
     return send_from_directory(OUTPUT_FOLDER, path)
 
+#a compactação roda em uma thread do processo que atende as requisições (recriada após um fork)
+@app.before_request
+def _iniciar_compactacao():
+    ARMAZENAMENTO.iniciar()
+
+@app.before_request
+def _iniciar_medicao():
+    g.inicio_requisicao = time.perf_counter()
+    if PERFIL_LENTO_MS is not None and TRAVA_PERFIL.acquire(blocking=False):
+        g.perfil = cProfile.Profile()
+        try:
+            g.perfil.enable()
+        except ValueError: #outro profiler ativo fora destas requisições
+            g.pop('perfil')
+            TRAVA_PERFIL.release()
+
+#em respostas em streaming (ndjson) a medição vai até o início da resposta, não até o fim do corpo
+@app.after_request
+def _registrar_requisicao(resposta):
+    inicio = g.pop('inicio_requisicao', None)
+    if inicio is None:
+        return resposta
+    duracao = time.perf_counter() - inicio
+    rota = request.url_rule.rule if request.url_rule is not None else 'desconhecida'
+    METRICAS.observar('requisicao_segundos', duracao, rota=rota)
+    METRICAS.incrementar('requisicoes_total', rota=rota, metodo=request.method, status=resposta.status_code)
+    perfil = g.get('perfil')
+    if perfil is not None:
+        perfil.disable()
+        if duracao * 1000 >= PERFIL_LENTO_MS:
+            os.makedirs(PASTA_PERFIS, exist_ok=True)
+            nome = secure_filename(f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}-{rota}") + '.prof'
+            perfil.dump_stats(os.path.join(PASTA_PERFIS, nome))
+            app.logger.warning("requisição lenta %s %s: %.0f ms, perfil em %s", request.method, request.path, duracao * 1000, nome)
+    return resposta
+
+#o after_request não roda quando a requisição termina em exceção não tratada; aqui o perfil é sempre solto
+@app.teardown_request
+def _soltar_perfil(_erro):
+    perfil = g.pop('perfil', None)
+    if perfil is not None:
+        perfil.disable()
+        TRAVA_PERFIL.release()
+
+if os.environ.get('PREAQUECER') == '1':
+    preaquecer()
+
 if __name__ == '__main__':
     app.run(debug=False, port=5000)
 
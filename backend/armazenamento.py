@@ -0,0 +1,208 @@
+# gerência do disco usado por uploads e relatórios: uploads endereçados pelo conteúdo,
+# limites de idade/tamanho e uma thread que compacta as pastas periodicamente
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+EXTENSAO_UPLOAD = '.csv'
+SUFIXO_PARCIAL = '.parcial' #arquivos ainda sendo escritos (uploads e artefatos dos relatórios)
+
+logger = logging.getLogger(__name__)
+
+
+def _remover_arquivo(caminho):
+    try:
+        os.remove(caminho)
+    except FileNotFoundError:
+        pass
+
+
+class GerenciadorArmazenamento:
+    """guarda cada upload uma única vez em uploads/<sha256>.csv e mantém o disco dentro dos limites.
+
+    uploads repetidos apontam para o mesmo arquivo. a compactação (na thread de fundo ou chamada
+    direto) apaga uploads vencidos ou além do limite, os menos usados primeiro, restos de escritas
+    interrompidas e, pelo cache de resultados, as pastas de relatório além dos limites dele.
+    uploads e pastas de relatório reservados por uma análise em andamento (em_uso/reservar) ou
+    mais novos que `carencia_segundos` nunca são apagados, mesmo acima dos limites.
+    """
+
+    def __init__(self, pasta_uploads: str, cache_relatorios, tamanho_max_uploads: int = 1024 * 1024 * 1024,
+                 idade_max_uploads: float = 24 * 3600, intervalo_segundos: float = 300, idade_parciais: float = 3600,
+                 carencia_segundos: float = 600):
+        self.pasta_uploads = pasta_uploads
+        self.cache_relatorios = cache_relatorios
+        self.tamanho_max_uploads = tamanho_max_uploads
+        self.idade_max_uploads = idade_max_uploads
+        self.intervalo_segundos = intervalo_segundos
+        self.idade_parciais = idade_parciais
+        self.carencia_segundos = carencia_segundos
+        self.uploads_deduplicados = 0
+        self.uploads_removidos = 0
+        self.parciais_removidos = 0
+        self._uso = {}
+        self._reservas = {} #caminho do upload ou da pasta de relatório -> análises em andamento que o usam
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid_thread = None
+        self._parar = threading.Event()
+
+    def caminho_upload(self, hash_conteudo: str) -> str:
+        return os.path.join(self.pasta_uploads, hash_conteudo + EXTENSAO_UPLOAD)
+
+    def armazenar_upload(self, caminho_temporario: str, hash_conteudo: str) -> str:
+        #move o upload recém-gravado para o endereço do conteúdo; se já existia, descarta a cópia
+        destino = self.caminho_upload(hash_conteudo)
+        if os.path.exists(destino):
+            try:
+                os.utime(destino) #conta como uso recente para a remoção
+                os.remove(caminho_temporario)
+                with self._lock:
+                    self.uploads_deduplicados += 1
+                return destino
+            except FileNotFoundError: #removido pela compactação entre a checagem e o utime
+                pass
+        os.replace(caminho_temporario, destino)
+        return destino
+
+    def reservar(self, caminho: str):
+        #protege o upload ou a pasta de relatório da compactação até o liberar correspondente (ex.: jobs na fila)
+        with self._lock:
+            self._reservas[caminho] = self._reservas.get(caminho, 0) + 1
+
+    def liberar(self, caminho: str):
+        with self._lock:
+            if self._reservas.get(caminho, 0) > 1:
+                self._reservas[caminho] -= 1
+            else:
+                self._reservas.pop(caminho, None)
+
+    @contextmanager
+    def em_uso(self, *caminhos: str):
+        for caminho in caminhos:
+            self.reservar(caminho)
+        try:
+            yield
+        finally:
+            for caminho in caminhos:
+                self.liberar(caminho)
+
+    def _remover_livre(self, caminho: str, remover) -> bool:
+        #remove o caminho se ninguém o reservou; a checagem e a remoção ficam sob a trava para uma
+        #reserva feita no meio não chegar tarde demais
+        with self._lock:
+            if caminho in self._reservas:
+                return False
+            remover(caminho)
+            return True
+
+    def registrar_acesso(self, pasta_relatorio: str):
+        #a remoção das pastas de relatório segue o mtime; um artefato servido conta como uso
+        try:
+            os.utime(pasta_relatorio)
+        except FileNotFoundError:
+            pass
+
+    def iniciar(self):
+        #sobe a thread de compactação; pode ser chamada sempre, e recria a thread depois de um fork
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid_thread == os.getpid():
+                return
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._executar, name='compactacao-armazenamento', daemon=True)
+            self._pid_thread = os.getpid()
+            self._thread.start()
+
+    def encerrar(self):
+        self._parar.set()
+
+    def _executar(self):
+        while not self._parar.is_set():
+            try:
+                self.compactar()
+            except Exception: #a thread não pode morrer por um arquivo com problema
+                logger.exception("erro na compactação do armazenamento")
+            self._parar.wait(self.intervalo_segundos)
+
+    def compactar(self):
+        inicio = time.perf_counter()
+        uso_uploads = self._compactar_uploads()
+        uso_relatorios = self.cache_relatorios.remover_excedentes(self.carencia_segundos, self._remover_livre)
+        uso_relatorios['parciais_removidos'] = self._remover_parciais(self.cache_relatorios.pasta_saida)
+        with self._lock:
+            self._uso = {
+                'uploads': uso_uploads,
+                'relatorios': uso_relatorios,
+                'ultima_compactacao': time.time(),
+                'duracao_compactacao_s': time.perf_counter() - inicio,
+            }
+        return self._uso
+
+    def _compactar_uploads(self):
+        agora = time.time()
+        arquivos = []
+        parciais = 0
+        with os.scandir(self.pasta_uploads) as entradas:
+            for entrada in entradas:
+                if not entrada.is_file():
+                    continue
+                info = entrada.stat()
+                if entrada.name.endswith(SUFIXO_PARCIAL):
+                    if agora - info.st_mtime > self.idade_parciais:
+                        os.remove(entrada.path)
+                        parciais += 1
+                    continue
+                arquivos.append((info.st_mtime, info.st_size, entrada.path))
+        arquivos.sort()
+
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        removidos = 0
+        for modificado, tamanho, caminho in arquivos:
+            if agora - modificado <= self.idade_max_uploads and total <= self.tamanho_max_uploads:
+                break
+            if agora - modificado <= self.carencia_segundos:
+                break #os seguintes são ainda mais novos
+            if not self._remover_livre(caminho, _remover_arquivo):
+                continue
+            total -= tamanho
+            removidos += 1
+        with self._lock:
+            self.uploads_removidos += removidos
+            self.parciais_removidos += parciais
+        if removidos:
+            logger.info("compactação removeu %d upload(s); %d bytes restantes", removidos, total)
+        return {'arquivos': len(arquivos) - removidos, 'bytes': total, 'removidos': removidos, 'parciais_removidos': parciais}
+
+    def _remover_parciais(self, pasta_relatorios):
+        #artefatos '.parcial' esquecidos por uma geração interrompida dentro das pastas de relatório
+        agora = time.time()
+        removidos = 0
+        with os.scandir(pasta_relatorios) as pastas:
+            for pasta in pastas:
+                if not pasta.is_dir():
+                    continue
+                try: #a pasta ou o parcial podem sumir no meio (remoção pelo cache, os.replace de uma escrita)
+                    with os.scandir(pasta.path) as arquivos:
+                        for arquivo in arquivos:
+                            if SUFIXO_PARCIAL in arquivo.name and agora - arquivo.stat().st_mtime > self.idade_parciais:
+                                os.remove(arquivo.path)
+                                removidos += 1
+                except FileNotFoundError:
+                    pass
+        with self._lock:
+            self.parciais_removidos += removidos
+        return removidos
+
+    def metricas(self):
+        #uso de disco medido na última compactação e contadores desde o início do processo
+        with self._lock:
+            return {
+                **self._uso,
+                'uploads_deduplicados': self.uploads_deduplicados,
+                'uploads_removidos': self.uploads_removidos,
+                'parciais_removidos': self.parciais_removidos,
+                'reservas_ativas': len(self._reservas),
+                'compactacao_ativa': self._thread is not None and self._thread.is_alive(),
+            }
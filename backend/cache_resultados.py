@@ -0,0 +1,130 @@
+# cache dos resultados do /analisar, indexado pelo hash do arquivo enviado
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+ARQUIVO_RESULTADO = 'resultado.json' #json da resposta guardado junto dos gráficos e do pdf
+
+
+def chave_conteudo(hash_arquivo: str, versao_regras: str, modo: str, versao_resultado: str) -> str:
+    #a chave muda se o arquivo (sha-256 do conteúdo), as regras de categorização, o modo de importação
+    #(o streaming não tem padrões nem consultas) ou o formato da resposta mudarem
+    return '-'.join((hash_arquivo, versao_regras, modo, versao_resultado))
+
+
+def _apagar_pasta(caminho):
+    shutil.rmtree(caminho, ignore_errors=True)
+
+
+def _tamanho_pasta(caminho):
+    #arquivos '.parcial' podem ser renomeados ou apagados durante a soma
+    tamanho = 0
+    for raiz, _, arquivos in os.walk(caminho):
+        for arquivo in arquivos:
+            try:
+                tamanho += os.path.getsize(os.path.join(raiz, arquivo))
+            except FileNotFoundError:
+                pass
+    return tamanho
+
+
+def _remover_sempre(caminho, apagar):
+    apagar(caminho)
+    return True
+
+
+class CacheResultados:
+    """mapeia chave de conteúdo -> pasta de relatório já gerada em relatorios_gerados.
+
+    cada pasta guarda o resultado.json com a chave e a resposta; o índice em memória é
+    reconstruído a partir deles ao iniciar. a remoção considera idade e tamanho total,
+    sempre começando pelas pastas usadas há mais tempo.
+    """
+
+    def __init__(self, pasta_saida: str, tamanho_max_bytes: int = 500 * 1024 * 1024, idade_max_segundos: float = 7 * 24 * 3600):
+        self.pasta_saida = pasta_saida
+        self.tamanho_max_bytes = tamanho_max_bytes
+        self.idade_max_segundos = idade_max_segundos
+        self.acertos = 0
+        self.falhas = 0
+        self.remocoes = 0
+        self._indice = {}
+        self._lock = threading.Lock()
+        self._carregar_indice()
+
+    def _carregar_indice(self):
+        for nome in os.listdir(self.pasta_saida):
+            caminho = os.path.join(self.pasta_saida, nome, ARQUIVO_RESULTADO)
+            try:
+                with open(caminho, encoding='utf-8') as f:
+                    chave = json.load(f).get('chave')
+            except (OSError, ValueError):
+                continue
+            if chave:
+                self._indice[chave] = nome
+
+    def obter(self, chave: str):
+        #devolve a resposta guardada ou None, contando acerto/falha
+        with self._lock:
+            id_relatorio = self._indice.get(chave)
+            pasta = os.path.join(self.pasta_saida, id_relatorio) if id_relatorio else None
+            try:
+                if pasta is None:
+                    raise FileNotFoundError
+                with open(os.path.join(pasta, ARQUIVO_RESULTADO), encoding='utf-8') as f:
+                    resposta = json.load(f)['resposta']
+                os.utime(pasta) #marca o uso para a remoção por menos recente
+            except (OSError, ValueError, KeyError):
+                self._indice.pop(chave, None)
+                self.falhas += 1
+                return None
+            self.acertos += 1
+            return resposta
+
+    def guardar(self, chave: str, id_relatorio: str, resposta: dict):
+        caminho = os.path.join(self.pasta_saida, id_relatorio, ARQUIVO_RESULTADO)
+        parcial = f"{caminho}.{uuid.uuid4().hex[:8]}.parcial"
+        with open(parcial, 'w', encoding='utf-8') as f:
+            json.dump({'chave': chave, 'resposta': resposta}, f, ensure_ascii=False)
+        os.replace(parcial, caminho)
+        with self._lock:
+            self._indice[chave] = id_relatorio
+
+    def remover_excedentes(self, carencia_segundos: float = 0, remover=_remover_sempre):
+        #apaga pastas vencidas e, se ainda passar do limite, as menos usadas recentemente; devolve o uso
+        #de disco que sobrou. chamada pela compactação do armazenamento, que passa a carência e um
+        #remover(caminho, apagar) que devolve False para as pastas reservadas por análises em andamento
+        agora = time.time()
+        pastas = []
+        for nome in os.listdir(self.pasta_saida):
+            caminho = os.path.join(self.pasta_saida, nome)
+            if not os.path.isdir(caminho):
+                continue
+            tamanho = _tamanho_pasta(caminho)
+            pastas.append((os.path.getmtime(caminho), tamanho, nome))
+        pastas.sort()
+
+        total = sum(tamanho for _, tamanho, _ in pastas)
+        removidas = 0
+        for modificado, tamanho, nome in pastas:
+            if agora - modificado <= self.idade_max_segundos and total <= self.tamanho_max_bytes:
+                break
+            if agora - modificado <= carencia_segundos:
+                break #as seguintes são ainda mais novas
+            caminho = os.path.join(self.pasta_saida, nome)
+            if not remover(caminho, _apagar_pasta):
+                continue
+            total -= tamanho
+            removidas += 1
+            with self._lock:
+                for chave in [c for c, i in self._indice.items() if i == nome]:
+                    del self._indice[chave]
+                self.remocoes += 1
+        return {'pastas': len(pastas) - removidas, 'bytes': total, 'removidos': removidas}
+
+    def metricas(self):
+        with self._lock:
+            return {'acertos': self.acertos, 'falhas': self.falhas, 'remocoes': self.remocoes, 'entradas': len(self._indice)}
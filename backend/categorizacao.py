@@ -0,0 +1,114 @@
+# motor de categorização: compila as regras de palavras-chave uma única vez
+import hashlib
+import json
+import os
+from collections import deque
+
+import pandas as pd
+
+CATEGORIA_PADRAO = 'Outros' #categoria se nenhuma palavra-chave for encontrada
+ARQUIVO_REGRAS_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'regras_categorias.json')
+
+
+class _AhoCorasick:
+    """autômato de Aho-Corasick sobre as palavras-chave: uma passada pelo texto encontra todas
+    as palavras contidas nele, com custo que depende do tamanho do texto e não de quantas
+    palavras existem. cada nó guarda a menor prioridade entre as palavras que terminam nele
+    (inclusive as alcançadas pelos links de falha).
+    """
+
+    def __init__(self, prioridade_por_palavra: dict):
+        self._filhos = [{}]
+        self._melhor = [None]
+        for palavra, prioridade in prioridade_por_palavra.items():
+            no = 0
+            for caractere in palavra:
+                proximo = self._filhos[no].get(caractere)
+                if proximo is None:
+                    proximo = self._filhos[no][caractere] = len(self._filhos)
+                    self._filhos.append({})
+                    self._melhor.append(None)
+                no = proximo
+            if self._melhor[no] is None or prioridade < self._melhor[no]:
+                self._melhor[no] = prioridade
+
+        #links de falha em largura: o maior sufixo do caminho até o nó que também é prefixo de alguma palavra
+        self._falha = [0] * len(self._filhos)
+        fila = deque(self._filhos[0].values())
+        while fila:
+            no = fila.popleft()
+            herdada = self._melhor[self._falha[no]]
+            if herdada is not None and (self._melhor[no] is None or herdada < self._melhor[no]):
+                self._melhor[no] = herdada
+            for caractere, filho in self._filhos[no].items():
+                falha = self._falha[no]
+                while falha and caractere not in self._filhos[falha]:
+                    falha = self._falha[falha]
+                self._falha[filho] = self._filhos[falha].get(caractere, 0)
+                fila.append(filho)
+
+    def menor_prioridade(self, texto: str):
+        #menor prioridade entre as palavras contidas no texto (None se nenhuma)
+        filhos, falha, melhor = self._filhos, self._falha, self._melhor
+        menor = melhor[0]
+        no = 0
+        for caractere in texto:
+            while no and caractere not in filhos[no]:
+                no = falha[no]
+            no = filhos[no].get(caractere, 0)
+            prioridade = melhor[no]
+            if prioridade is not None and (menor is None or prioridade < menor):
+                menor = prioridade
+                if menor == 0:
+                    break
+        return menor
+
+
+class MotorCategorizacao:
+    """categoriza descrições por palavras-chave com um autômato de Aho-Corasick e cache por descrição normalizada.
+
+    a categoria é a de maior prioridade (ordem do arquivo de regras) entre as palavras contidas
+    na descrição, a mesma que a busca linear categoria por categoria daria.
+    """
+
+    def __init__(self, regras: dict, tamanho_cache: int = 100_000):
+        self.regras = {categoria: list(palavras) for categoria, palavras in regras.items()}
+        self.tamanho_cache = tamanho_cache
+        self._cache = {}
+
+        prioridade_por_palavra = {}
+        for prioridade, palavras in enumerate(self.regras.values()):
+            for palavra in palavras:
+                prioridade_por_palavra.setdefault(palavra.lower(), prioridade)
+        self._categorias = list(self.regras.keys())
+        self._automato = _AhoCorasick(prioridade_por_palavra)
+
+        conteudo = json.dumps(self.regras, ensure_ascii=False, sort_keys=False)
+        self.versao = hashlib.sha256(conteudo.encode('utf-8')).hexdigest()[:16]
+
+    @classmethod
+    def de_arquivo(cls, caminho=ARQUIVO_REGRAS_PADRAO, **kwargs):
+        #carrega as regras de um json {categoria: [palavras-chave]} mantendo a ordem do arquivo
+        with open(caminho, encoding='utf-8') as f:
+            return cls(json.load(f), **kwargs)
+
+    def _categorizar_normalizada(self, descricao: str) -> str:
+        melhor = self._automato.menor_prioridade(descricao)
+        return CATEGORIA_PADRAO if melhor is None else self._categorias[melhor]
+
+    def categorizar(self, descricao: str) -> str:
+        chave = descricao.lower()
+        categoria = self._cache.get(chave)
+        if categoria is None:
+            categoria = self._categorizar_normalizada(chave)
+            if len(self._cache) >= self.tamanho_cache:
+                self._cache.clear()
+            self._cache[chave] = categoria
+        return categoria
+
+    def categorizar_serie(self, descricoes: pd.Series) -> pd.Series:
+        #categoriza uma coluna inteira, avaliando cada descrição distinta uma única vez
+        normalizadas = descricoes.str.lower()
+        unicas = normalizadas.unique()
+        mapa = {d: self.categorizar(d) for d in unicas}
+        return normalizadas.map(mapa)
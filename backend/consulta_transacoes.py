@@ -0,0 +1,261 @@
+# consultas por período, categoria, tipo e valor sobre as transações de um relatório já analisado
+import os
+import threading
+from collections import OrderedDict
+from decimal import ROUND_CEILING, ROUND_FLOOR, Decimal, InvalidOperation
+
+import numpy as np
+import pandas as pd
+
+ARQUIVO_TRANSACOES = 'transacoes.npz'
+TIPOS = ('receita', 'despesa')
+
+
+def gravar_transacoes(arquivo, df):
+    #grava data, centavos e categoria (códigos + nomes) do dataframe de obter_dataframe em um .npz
+    categorias = pd.Categorical(df['Categoria'])
+    np.savez(arquivo,
+             data=df['Data'].to_numpy(dtype='datetime64[ns]').view(np.int64),
+             centavos=df['Centavos'].to_numpy(dtype=np.int64),
+             categoria=categorias.codes.astype(np.int16),
+             nomes_categorias=np.array([str(c) for c in categorias.categories], dtype=str))
+
+
+class _Faixas:
+    """transações em uma ordem fixa com somas de prefixo (int64, em centavos) de receitas, despesas e contagens.
+
+    a soma de qualquer intervalo [inicio, fim) dessa ordem sai da diferença de dois prefixos;
+    `mes` (aaaamm) acompanha a ordem e, por ela estar ordenada por data dentro de cada trecho
+    consultado, a divisão por mês também é feita com busca binária.
+    """
+
+    def __init__(self, data, centavos, mes):
+        self.data = data
+        self.centavos = centavos
+        self.mes = mes
+        receita = centavos > 0
+        self.receita = _prefixo(np.where(receita, centavos, 0))
+        self.despesa = _prefixo(np.where(receita, 0, centavos))
+        self.n_receitas = _prefixo(receita.astype(np.int64))
+
+    def intervalo(self, inicio, fim, datas):
+        #posições [a, b) de `inicio` a `fim` dentro do trecho ordenado por data; datas=(de, ate) em ns
+        de, ate = datas
+        trecho = self.data[inicio:fim]
+        return inicio + int(np.searchsorted(trecho, de, 'left')), inicio + int(np.searchsorted(trecho, ate, 'left'))
+
+    def totais(self, a, b):
+        n_receitas = int(self.n_receitas[b] - self.n_receitas[a])
+        return self.receita[b] - self.receita[a], self.despesa[b] - self.despesa[a], n_receitas, (b - a) - n_receitas
+
+    def por_mes(self, a, b, meses):
+        #receita e despesa de cada mês de `meses` (ordenado) dentro de [a, b)
+        limites = a + np.searchsorted(self.mes[a:b], meses, 'left')
+        limites = np.append(limites, b)
+        return np.diff(self.receita[limites]), np.diff(self.despesa[limites])
+
+
+class IndiceTransacoes:
+    """transações de um relatório indexadas para consultas filtradas em milissegundos.
+
+    guarda duas ordens das mesmas linhas: por data e por (categoria, data), cada uma com
+    somas de prefixo. um período vira duas buscas binárias e uma diferença de prefixos por
+    categoria, sem reler o csv nem passar pelas linhas; só o filtro de valor (que não segue
+    nenhuma das ordens) percorre as linhas do período selecionado.
+    """
+
+    def __init__(self, data, centavos, categoria, nomes_categorias):
+        nomes_categorias = [str(c) for c in nomes_categorias]
+        self.categorias = {nome: codigo for codigo, nome in enumerate(nomes_categorias)}
+        self.nomes_categorias = nomes_categorias
+        self.total_linhas = len(centavos)
+        datas = pd.DatetimeIndex(data.view('datetime64[ns]'))
+        mes = (datas.year * 100 + datas.month).to_numpy(dtype=np.int32)
+        self.meses = np.unique(mes)
+
+        por_data = np.argsort(data, kind='stable')
+        self.por_data = _Faixas(data[por_data], centavos[por_data], mes[por_data])
+        self.categoria_por_data = categoria[por_data]
+
+        por_categoria = np.lexsort((data, categoria))
+        self.por_categoria = _Faixas(data[por_categoria], centavos[por_categoria], mes[por_categoria])
+        #trecho [inicio_categoria[c], inicio_categoria[c + 1]) da ordem por categoria
+        self.inicio_categoria = np.searchsorted(categoria[por_categoria], np.arange(len(nomes_categorias) + 1), 'left')
+
+    @classmethod
+    def de_arquivo(cls, caminho):
+        with np.load(caminho, allow_pickle=False) as arquivo:
+            return cls(arquivo['data'], arquivo['centavos'], arquivo['categoria'], arquivo['nomes_categorias'].tolist())
+
+    def consultar(self, inicio=None, fim=None, categorias=None, tipo=None, valor_min=None, valor_max=None):
+        """kpis, resumo mensal e despesas por categoria das transações que passam nos filtros.
+
+        inicio/fim são datas inclusivas (aaaa-mm-dd, ou aaaa-mm/aaaa para o mês/ano inteiro);
+        categorias é uma lista de nomes; tipo é 'receita' ou 'despesa'; valor_min/valor_max limitam
+        o valor absoluto da transação. o formato da resposta é o mesmo do /analisar.
+        """
+        if tipo is not None and tipo not in TIPOS:
+            raise ValueError(f"Tipo inválido: {tipo}. Use 'receita' ou 'despesa'.")
+        datas = (_limite(inicio, fim=False), _limite(fim, fim=True))
+        if categorias:
+            desconhecidas = [c for c in categorias if c not in self.categorias]
+            if desconhecidas:
+                raise ValueError(f"Categoria desconhecida: {', '.join(desconhecidas)}")
+            codigos = sorted({self.categorias[c] for c in categorias})
+        else:
+            codigos = None
+
+        if valor_min is not None or valor_max is not None:
+            #limites em centavos inteiros: o mínimo arredonda para cima e o máximo para baixo
+            mensal, por_categoria = self._consultar_linhas(datas, codigos, _centavos_limite(valor_min, ROUND_CEILING),
+                                                           _centavos_limite(valor_max, ROUND_FLOOR))
+        else:
+            mensal, por_categoria = self._consultar_prefixos(datas, codigos)
+
+        receitas, despesas, n_receitas, n_despesas = mensal
+        if tipo == 'receita':
+            despesas, n_despesas, por_categoria = np.zeros_like(despesas), 0, {}
+        elif tipo == 'despesa':
+            receitas, n_receitas = np.zeros_like(receitas), 0
+        presentes = (receitas != 0) | (despesas != 0)
+        receita_total, despesa_total = int(receitas.sum()), int(despesas.sum())
+        saldo_final = receita_total + despesa_total
+        return {
+            "transacoes": int(n_receitas + n_despesas),
+            "kpis": {
+                "receita_total": receita_total / 100,
+                "despesa_total": despesa_total / 100,
+                "saldo_final": saldo_final / 100,
+                "taxa_poupanca": (saldo_final / receita_total) * 100 if receita_total > 0 else 0,
+            },
+            "resumo_mensal": {
+                f"{m // 100:04d}-{m % 100:02d}": {"Despesa": d / 100, "Receita": r / 100}
+                for m, r, d in zip(self.meses[presentes].tolist(), receitas[presentes].tolist(), despesas[presentes].tolist())
+            },
+            "despesas_por_categoria": dict(sorted(por_categoria.items(), key=lambda item: item[1], reverse=True)),
+        }
+
+    def _consultar_prefixos(self, datas, codigos):
+        #sem filtro de valor: tudo sai das somas de prefixo
+        por_categoria = {}
+        faixas = self.por_categoria
+        for codigo in range(len(self.nomes_categorias)) if codigos is None else codigos:
+            a, b = faixas.intervalo(self.inicio_categoria[codigo], self.inicio_categoria[codigo + 1], datas)
+            _, despesa, _, n_despesas = faixas.totais(a, b)
+            if n_despesas:
+                por_categoria[self.nomes_categorias[codigo]] = abs(int(despesa)) / 100
+        if codigos is None:
+            faixas = self.por_data
+            a, b = faixas.intervalo(0, self.total_linhas, datas)
+            receitas, despesas = faixas.por_mes(a, b, self.meses)
+            _, _, n_receitas, n_despesas = faixas.totais(a, b)
+            return (receitas, despesas, n_receitas, n_despesas), por_categoria
+
+        receitas, despesas = np.zeros(len(self.meses), np.int64), np.zeros(len(self.meses), np.int64)
+        n_receitas = n_despesas = 0
+        for codigo in codigos:
+            a, b = faixas.intervalo(self.inicio_categoria[codigo], self.inicio_categoria[codigo + 1], datas)
+            r, d = faixas.por_mes(a, b, self.meses)
+            receitas += r
+            despesas += d
+            _, _, nr, nd = faixas.totais(a, b)
+            n_receitas += nr
+            n_despesas += nd
+        return (receitas, despesas, n_receitas, n_despesas), por_categoria
+
+    def _consultar_linhas(self, datas, codigos, centavos_min, centavos_max):
+        #com filtro de valor: o período ainda sai da busca binária, mas as linhas dele são filtradas uma a uma
+        faixas = self.por_data
+        a, b = faixas.intervalo(0, self.total_linhas, datas)
+        centavos = faixas.centavos[a:b]
+        categoria = self.categoria_por_data[a:b]
+        selecionadas = np.ones(b - a, dtype=bool)
+        if codigos is not None:
+            selecionadas &= np.isin(categoria, codigos)
+        if centavos_min is not None:
+            selecionadas &= np.abs(centavos) >= centavos_min
+        if centavos_max is not None:
+            selecionadas &= np.abs(centavos) <= centavos_max
+        centavos, categoria = centavos[selecionadas], categoria[selecionadas]
+        posicao_mes = np.searchsorted(self.meses, faixas.mes[a:b][selecionadas])
+        receita = centavos > 0
+        receitas = _somar_por(posicao_mes, np.where(receita, centavos, 0), len(self.meses))
+        despesas = _somar_por(posicao_mes, np.where(receita, 0, centavos), len(self.meses))
+        por_codigo = _somar_por(categoria[~receita], centavos[~receita], len(self.nomes_categorias))
+        presentes = np.bincount(categoria[~receita], minlength=len(self.nomes_categorias)) > 0
+        por_categoria = {self.nomes_categorias[c]: abs(int(por_codigo[c])) / 100 for c in np.flatnonzero(presentes)}
+        n_receitas = int(receita.sum())
+        return (receitas, despesas, n_receitas, len(centavos) - n_receitas), por_categoria
+
+
+class CacheIndices:
+    """índices já montados, por id de relatório, mantendo só os `maximo` usados mais recentemente.
+
+    o índice é montado a partir do transacoes.npz da pasta do relatório no primeiro uso;
+    relatórios removidos da pasta deixam de ser respondidos mesmo que o índice esteja na memória.
+    """
+
+    def __init__(self, pasta_saida: str, maximo: int = 8):
+        self.pasta_saida = pasta_saida
+        self.maximo = maximo
+        self._indices = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, id_relatorio: str):
+        #devolve o IndiceTransacoes do relatório ou None se ele não tiver transações gravadas
+        caminho = os.path.join(self.pasta_saida, id_relatorio, ARQUIVO_TRANSACOES)
+        if not os.path.exists(caminho):
+            with self._lock:
+                self._indices.pop(id_relatorio, None)
+            return None
+        with self._lock:
+            indice = self._indices.get(id_relatorio)
+            if indice is not None:
+                self._indices.move_to_end(id_relatorio)
+                return indice
+        try:
+            indice = IndiceTransacoes.de_arquivo(caminho)
+        except (OSError, ValueError, KeyError):
+            return None
+        with self._lock:
+            self._indices[id_relatorio] = indice
+            while len(self._indices) > self.maximo:
+                self._indices.popitem(last=False)
+        return indice
+
+
+def _prefixo(valores):
+    #prefixo[i] = soma de valores[:i]
+    return np.concatenate(([0], np.cumsum(valores)))
+
+
+def _somar_por(grupos, centavos, tamanho):
+    #soma por grupo; o bincount soma em float64, exato para totais até 2**53 centavos
+    return np.rint(np.bincount(grupos, weights=centavos, minlength=tamanho)).astype(np.int64)
+
+
+def _centavos_limite(valor, arredondamento):
+    #valor em reais (número ou texto) para centavos inteiros, sem passar por float * 100
+    if valor is None:
+        return None
+    try:
+        reais = Decimal(str(valor))
+    except InvalidOperation:
+        raise ValueError(f"Valor inválido: {valor}")
+    if not reais.is_finite():
+        raise ValueError(f"Valor inválido: {valor}")
+    return int((reais * 100).to_integral_value(rounding=arredondamento))
+
+
+def _limite(texto, fim):
+    #data da consulta em ns; aaaa-mm e aaaa valem pelo mês/ano inteiro e o fim é inclusivo (vira o início do período seguinte)
+    if not texto:
+        return np.iinfo(np.int64).max if fim else np.iinfo(np.int64).min
+    try:
+        data = pd.Timestamp(texto)
+    except ValueError:
+        raise ValueError(f"Data inválida: {texto}. Use AAAA-MM-DD, AAAA-MM ou AAAA.")
+    if fim:
+        tamanho = len(texto.strip())
+        data = data + (pd.offsets.YearBegin(1) if tamanho <= 4 else pd.offsets.MonthBegin(1) if tamanho <= 7 else pd.Timedelta(days=1))
+    return data.value
@@ -0,0 +1,87 @@
+# detecção de separador, codificação, linha de cabeçalho e separador decimal a partir do início do arquivo
+import codecs
+import csv
+import re
+
+SEPARADORES = [',', ';', '\t', '|']
+NOMES_DATA = ['data', 'date']
+NOMES_VALOR = ['valor', 'value', 'montante']
+DECIMAL_VIRGULA = re.compile(r'^[-+]?(\d{1,3}(\.\d{3})+|\d+),\d{1,2}$')
+DECIMAL_PONTO = re.compile(r'^[-+]?(\d{1,3}(,\d{3})+|\d+)\.\d{1,2}$')
+
+
+def normalizar_nome_coluna(col_name):
+    s = str(col_name).lower().strip()
+    s = re.sub(r'[áàãâä]', 'a', s); s = re.sub(r'[éèêë]', 'e', s); s = re.sub(r'[íìîï]', 'i', s); s = re.sub(r'[óòõôö]', 'o', s); s = re.sub(r'[úùûü]', 'u', s); s = re.sub(r'[ç]', 'c', s)
+    s = re.sub(r'[^a-z0-9_ ]', '', s).replace(' ', '_')
+    return s
+
+
+def _decodificar(amostra: bytes):
+    #utf-8 quando a amostra é válida (ignorando um caractere cortado no final), senão latin1
+    if amostra.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig', amostra[len(codecs.BOM_UTF8):].decode('utf-8', errors='ignore')
+    try:
+        return 'utf-8', codecs.getincrementaldecoder('utf-8')().decode(amostra, final=False)
+    except UnicodeDecodeError:
+        return 'latin1', amostra.decode('latin1')
+
+
+def _linha_cabecalho(linhas, sep):
+    #primeira linha que tem uma coluna de data; None se nenhuma tiver
+    for indice, campos in enumerate(csv.reader(linhas, delimiter=sep, skipinitialspace=True)):
+        if any(normalizar_nome_coluna(c) in NOMES_DATA for c in campos):
+            return indice, campos
+    return None, None
+
+
+def _detectar_decimal(linhas, sep, indice_valor):
+    votos = {',': 0, '.': 0}
+    for campos in csv.reader(linhas, delimiter=sep, skipinitialspace=True):
+        if indice_valor >= len(campos):
+            continue
+        valor = campos[indice_valor].strip().replace('R$', '').replace(' ', '')
+        if DECIMAL_VIRGULA.match(valor):
+            votos[','] += 1
+        elif DECIMAL_PONTO.match(valor):
+            votos['.'] += 1
+    if votos['.'] > votos[',']:
+        return '.'
+    return ','
+
+
+def detectar_formato(caminho_do_arquivo, tamanho_amostra=64 * 1024):
+    """lê só os primeiros bytes do arquivo e decide como fazer uma única leitura completa.
+
+    devolve um dict com separador, codificacao, linha_cabecalho (linhas a pular antes do
+    cabeçalho), decimal (',' para 1.234,56 ou '.' para 1234.56) e coluna_valor (nome da
+    coluna de valores no cabeçalho, ou None).
+    """
+    with open(caminho_do_arquivo, 'rb') as f:
+        amostra = f.read(tamanho_amostra)
+    codificacao, texto = _decodificar(amostra)
+    linhas = texto.splitlines()
+    if len(amostra) == tamanho_amostra and len(linhas) > 1:
+        linhas = linhas[:-1] #a última linha pode ter sido cortada
+    linhas = linhas[:200]
+
+    melhor = None
+    for sep in SEPARADORES:
+        indice, cabecalho = _linha_cabecalho(linhas, sep)
+        if indice is None or len(cabecalho) < 2:
+            continue
+        contagens = [len(c) for c in csv.reader(linhas[indice + 1:], delimiter=sep) if c]
+        consistentes = sum(1 for n in contagens if n == len(cabecalho))
+        pontuacao = (consistentes, len(cabecalho))
+        if melhor is None or pontuacao > melhor[0]:
+            melhor = (pontuacao, sep, indice, cabecalho)
+
+    if melhor is None:
+        return {'separador': ',', 'codificacao': codificacao, 'linha_cabecalho': 0, 'decimal': ',', 'coluna_valor': None}
+
+    _, sep, indice, cabecalho = melhor
+    nomes = [normalizar_nome_coluna(c) for c in cabecalho]
+    indice_valor = next((nomes.index(n) for n in NOMES_VALOR if n in nomes), None)
+    decimal = _detectar_decimal(linhas[indice + 1:], sep, indice_valor) if indice_valor is not None else ','
+    return {'separador': sep, 'codificacao': codificacao, 'linha_cabecalho': indice, 'decimal': decimal,
+            'coluna_valor': cabecalho[indice_valor] if indice_valor is not None else None}
@@ -0,0 +1,68 @@
+# valores monetários em centavos (int64): leitura dos formatos 1.234,56 e 1,234.56 e conversões
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+import numpy as np
+import pandas as pd
+
+#acima disto (em reais) a conversão por float pode perder centavos e é feita com Decimal
+LIMITE_FLOAT = 1e9
+
+
+def centavos_de_serie(serie, decimal=','):
+    #coluna de texto do csv -> (centavos int64, máscara das válidas), meio centavo para longe do zero;
+    #lida como float e só as linhas perto de meio centavo ou muito grandes são refeitas com Decimal
+    if pd.api.types.is_numeric_dtype(serie.dtype):
+        textos = None
+        reais = serie.to_numpy(dtype=np.float64, na_value=np.nan)
+    else:
+        textos = serie
+        if decimal == '.':
+            reais = pd.to_numeric(serie, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan, copy=True)
+            pendentes = np.isnan(reais) & serie.notna().to_numpy()
+        else:
+            reais = np.full(len(serie), np.nan)
+            pendentes = np.ones(len(serie), dtype=bool)
+        if pendentes.any():
+            normalizados = _normalizar(serie[pendentes], decimal)
+            reais[pendentes] = pd.to_numeric(normalizados, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+
+    validas = np.isfinite(reais)
+    escalado = np.where(validas, reais, 0.0) * 100
+    centavos = (np.sign(escalado) * np.floor(np.abs(escalado) + 0.5)).astype(np.int64)
+    fracao = np.abs(escalado) % 1
+    duvidosas = validas & ((np.abs(fracao - 0.5) < 1e-3) | (np.abs(reais) >= LIMITE_FLOAT))
+    for i in np.flatnonzero(duvidosas):
+        texto = _normalizar(textos.iloc[i:i + 1], decimal).iat[0] if textos is not None else repr(float(reais[i]))
+        centavos[i] = centavos_de_decimal(Decimal(texto))
+    return centavos, validas
+
+
+def centavos_de_texto(texto, decimal=','):
+    #versão para um único valor; ValueError se não for um número
+    texto = str(texto).strip().replace('R$', '').replace('\xa0', '').replace(' ', '')
+    texto = texto.replace('.' if decimal == ',' else ',', '')
+    try:
+        valor = Decimal(texto.replace(',', '.'))
+    except InvalidOperation:
+        raise ValueError(f"Valor inválido: {texto!r}")
+    if not valor.is_finite():
+        raise ValueError(f"Valor inválido: {texto!r}")
+    return centavos_de_decimal(valor)
+
+
+def centavos_de_decimal(valor: Decimal) -> int:
+    return int((valor * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def centavos_de_reais(valores):
+    #reais em float (já com no máximo duas casas) para centavos
+    return np.rint(np.asarray(valores, dtype=np.float64) * 100).astype(np.int64)
+
+
+def _normalizar(serie, decimal):
+    #tira espaços, 'R$' e o separador de milhar e deixa o ponto como separador decimal
+    textos = serie.astype(object).where(serie.notna(), '').astype(str).str.strip()
+    textos = textos.str.replace('R$', '', regex=False).str.replace('\xa0', '', regex=False).str.replace(' ', '', regex=False)
+    if decimal == ',':
+        return textos.str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+    return textos.str.replace(',', '', regex=False)
@@ -0,0 +1,110 @@
+# fila de jobs de geração de relatório executados em um pool de processos
+import logging
+import multiprocessing
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+NA_FILA = 'na_fila'
+EXECUTANDO = 'executando'
+CONCLUIDO = 'concluido'
+ERRO = 'erro'
+
+logger = logging.getLogger(__name__)
+
+
+class FilaJobs:
+    """envia funções para um pool de processos limitado e guarda o estado de cada job.
+
+    usa processos (e não threads) porque o matplotlib não é thread-safe; o pool só é criado
+    no primeiro job. jobs terminados ficam disponíveis para consulta por `retencao_segundos`.
+    """
+
+    def __init__(self, max_workers: int = 2, retencao_segundos: float = 3600):
+        self.max_workers = max_workers
+        self.retencao_segundos = retencao_segundos
+        self._pool = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _obter_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def submeter(self, funcao, *args, ao_concluir=None, ao_finalizar=None):
+        #agenda funcao(*args) e devolve o id do job; ao_concluir(resultado) roda no processo principal
+        #quando o job dá certo e ao_finalizar() sempre que ele termina, com sucesso ou erro
+        self._limpar_antigos()
+        id_job = uuid.uuid4().hex
+        job = {'estado': NA_FILA, 'criado_em': time.time(), 'resultado': None, 'erro': None, 'codigo_erro': None}
+        with self._lock:
+            self._jobs[id_job] = job
+        futuro = self._obter_pool().submit(funcao, *args)
+        job['futuro'] = futuro
+
+        def concluir(f):
+            try:
+                resultado = f.result()
+                #uma falha aqui (ex.: gravar no cache) não apaga o resultado de uma análise que deu certo
+                if ao_concluir is not None:
+                    try:
+                        ao_concluir(resultado)
+                    except Exception:
+                        logger.exception("erro no ao_concluir do job %s", id_job)
+                job['resultado'] = resultado
+                job['estado'] = CONCLUIDO
+            except ValueError as e:
+                job['erro'], job['codigo_erro'], job['estado'] = str(e), 400, ERRO
+            except Exception as e:
+                job['erro'], job['codigo_erro'], job['estado'] = f"Ocorreu um erro interno inesperado: {e}", 500, ERRO
+            job['concluido_em'] = time.time()
+            if ao_finalizar is not None:
+                ao_finalizar()
+
+        futuro.add_done_callback(concluir)
+        return id_job
+
+    def registrar_concluido(self, resultado):
+        #job que já nasce concluído (ex.: resposta do cache), para o cliente seguir o mesmo fluxo de /jobs/<id>
+        self._limpar_antigos()
+        id_job = uuid.uuid4().hex
+        agora = time.time()
+        with self._lock:
+            self._jobs[id_job] = {'estado': CONCLUIDO, 'criado_em': agora, 'concluido_em': agora,
+                                  'resultado': resultado, 'erro': None, 'codigo_erro': None}
+        return id_job
+
+    def status(self, id_job):
+        with self._lock:
+            job = self._jobs.get(id_job)
+        if job is None:
+            return None
+        estado = job['estado']
+        if estado == NA_FILA and job.get('futuro') is not None and job['futuro'].running():
+            estado = EXECUTANDO
+        return {'id': id_job, 'estado': estado, 'erro': job['erro']}
+
+    def resultado(self, id_job):
+        with self._lock:
+            job = self._jobs.get(id_job)
+        return job
+
+    def ativos(self):
+        #jobs na fila ou em execução
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job['estado'] == NA_FILA)
+
+    def _limpar_antigos(self):
+        limite = time.time() - self.retencao_segundos
+        with self._lock:
+            for id_job in [i for i, j in self._jobs.items() if j.get('concluido_em', limite + 1) < limite]:
+                del self._jobs[id_job]
+
+    def encerrar(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
@@ -0,0 +1,76 @@
+# desenho dos gráficos do relatório com a api orientada a objetos do matplotlib (sem pyplot)
+# as funções recebem listas simples e podem rodar em processos separados
+import io
+import threading
+import time
+
+import matplotlib
+from matplotlib import style
+from matplotlib.figure import Figure
+
+ESTILO = 'seaborn-v0_8-whitegrid'
+CORES_TIPO = {'Despesa': '#d9534f', 'Receita': '#5cb85c'}
+
+#cada chamada cria a sua própria Figure, mas style.context altera o rcParams global do processo;
+#a trava só pesa quando gráficos são desenhados em threads (GRAFICOS_PARALELOS=0), não no pool
+_TRAVA_ESTILO = threading.Lock()
+
+
+def desenhar_balanco_mensal(meses, colunas, valores_por_coluna, caminho):
+    #barras lado a lado por mês, uma série por tipo (mesmo layout do DataFrame.plot(kind='bar'))
+    inicio = time.perf_counter()
+    with _TRAVA_ESTILO, style.context(ESTILO):
+        fig = Figure(figsize=(10, 6))
+        ax = fig.subplots()
+        largura = 0.5 / max(len(colunas), 1)
+        posicoes = range(len(meses))
+        for i, (coluna, valores) in enumerate(zip(colunas, valores_por_coluna)):
+            deslocamento = (i - (len(colunas) - 1) / 2) * largura
+            ax.bar([p + deslocamento for p in posicoes], valores, width=largura, label=coluna, color=CORES_TIPO.get(coluna))
+        ax.set_xlim(-0.5, len(meses) - 0.5)
+        ax.set_xticks(list(posicoes))
+        ax.set_xticklabels(meses, rotation=45, ha="right")
+        ax.legend(title='Tipo')
+        ax.set_title('Receitas vs Despesas por Mês', fontsize=16)
+        ax.set_ylabel('Valor (R$)', fontsize=12)
+        ax.set_xlabel('Mês', fontsize=12)
+        fig.tight_layout()
+        fig.savefig(caminho)
+    return time.perf_counter() - inicio
+
+
+def desenhar_distribuicao_tipos(rotulos, valores, caminho):
+    inicio = time.perf_counter()
+    with _TRAVA_ESTILO, style.context(ESTILO):
+        fig = Figure(figsize=(8, 8))
+        ax = fig.subplots()
+        ax.pie(valores, labels=rotulos, autopct='%1.1f%%', colors=['#d9534f', '#5cb85c'], startangle=90)
+        ax.set_title('Distribuição de Receitas e Despesas', fontsize=16)
+        fig.savefig(caminho)
+    return time.perf_counter() - inicio
+
+
+def desenhar_categorias(rotulos, valores, caminho):
+    inicio = time.perf_counter()
+    with _TRAVA_ESTILO, style.context(ESTILO):
+        fig = Figure(figsize=(10, 7))
+        ax = fig.subplots()
+        cores = matplotlib.colormaps['Paired'](range(len(valores)))
+        wedges, texts, autotexts = ax.pie(
+            valores, autopct='%1.1f%%', startangle=90, colors=cores,
+            wedgeprops={'edgecolor': 'white', 'linewidth': 1}
+        )
+        ax.legend(wedges, rotulos, title="Categorias", loc="center left", bbox_to_anchor=(1, 0, 0.5, 1))
+        for autotext in autotexts:
+            autotext.set(size=10, weight="bold", color="white")
+        ax.set_title('Despesas por Categoria', fontsize=16)
+        fig.savefig(caminho, bbox_inches='tight')
+    return time.perf_counter() - inicio
+
+
+def aquecer():
+    #desenha uma figura mínima em memória para carregar o backend agg, o estilo e as fontes
+    with _TRAVA_ESTILO, style.context(ESTILO):
+        fig = Figure(figsize=(1, 1))
+        fig.subplots().set_title('aquecimento')
+        fig.savefig(io.BytesIO(), format='png')
@@ -0,0 +1,198 @@
+# livro-razão persistente por conta: transações em arrays binários só de acréscimo + agregados incrementais
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from agregacao import AgregadosFinanceiros
+
+try:
+    import fcntl
+except ImportError: #windows: sem trava entre processos (só um processo por conta)
+    fcntl = None
+
+ARQUIVO_ESTADO = 'estado.json'
+ARQUIVO_TRAVA = 'livro.lock'
+# colunas numéricas guardadas como arrays brutos (um arquivo por coluna), lidos com memmap
+COLUNAS_BINARIAS = {'data': np.int64, 'centavos': np.int64, 'descricao': np.int32, 'categoria': np.int16, 'chave': np.uint64}
+
+
+def chaves_transacoes(df):
+    #hash de 64 bits por linha: o Identificador do Nubank quando existe, senão (data, descrição, valor)
+    if 'Identificador' in df.columns and df['Identificador'].notna().all():
+        return pd.util.hash_pandas_object(df['Identificador'].astype(str), index=False).to_numpy(np.uint64)
+    base = pd.DataFrame({'Data': df['Data'].astype('datetime64[ns]').astype('int64'), 'Descrição': df['Descrição'], 'Valor': df['Valor'].round(2)})
+    return pd.util.hash_pandas_object(base, index=False).to_numpy(np.uint64)
+
+
+class LivroRazao:
+    """histórico de uma conta guardado em `pasta`, acumulando extratos importados.
+
+    cada coluna é um arquivo binário onde novas transações só são acrescentadas no final;
+    descrições e categorias viram códigos inteiros com o dicionário ao lado. o estado.json
+    (gravado por último, com troca atômica) diz quantas linhas são válidas e guarda os
+    agregados, então importar um mês custa proporcional ao mês e não ao histórico.
+
+    vários processos (ex.: workers do gunicorn) podem abrir a mesma conta: toda leitura e
+    escrita acontece com o livro.lock travado (flock) e começa relendo o estado.json, então
+    cada processo vê as linhas que os outros acrescentaram antes de deduplicar e gravar.
+    """
+
+    def __init__(self, pasta):
+        self.pasta = pasta
+        os.makedirs(pasta, exist_ok=True)
+        self._lock = threading.Lock()
+        self.total_linhas = 0
+        self.agregados = AgregadosFinanceiros()
+        self.categorias = []
+        self._codigo_categoria = {}
+        self.descricoes = []
+        self._codigo_descricao = {}
+        self._bytes_descricoes = 0 #quanto do descricoes.jsonl já foi lido
+        self._chaves = set()
+        with self._travado():
+            self._recarregar()
+
+    @contextmanager
+    def _travado(self):
+        #trava entre threads (self._lock) e entre processos (flock no livro.lock)
+        with self._lock, open(self._caminho(ARQUIVO_TRAVA), 'a') as trava:
+            if fcntl is not None:
+                fcntl.flock(trava, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(trava, fcntl.LOCK_UN)
+
+    def _recarregar(self):
+        #traz para a memória o que outros processos gravaram desde a última leitura; chamado com a trava
+        estado = self._ler_json(ARQUIVO_ESTADO, None)
+        total_linhas = estado['total_linhas'] if estado else 0
+        if total_linhas != self.total_linhas:
+            anterior = self.total_linhas if total_linhas > self.total_linhas else 0
+            if anterior == 0:
+                self._chaves = set()
+            self.total_linhas = total_linhas
+            self.agregados = AgregadosFinanceiros.de_dict(estado['agregados'])
+            self.categorias = estado['categorias']
+            self._codigo_categoria = {c: i for i, c in enumerate(self.categorias)}
+            self._chaves.update(self._coluna('chave')[anterior:].tolist())
+        #descrições novas de outros processos (inclusive de importações interrompidas, que só ficam sem uso)
+        for descricao in self._ler_descricoes():
+            self._codigo_descricao[descricao] = len(self.descricoes)
+            self.descricoes.append(descricao)
+        self._truncar_colunas()
+
+    def recarregar(self):
+        #atualiza total_linhas e agregados com o que outros processos gravaram
+        with self._travado():
+            self._recarregar()
+
+    def _caminho(self, nome):
+        return os.path.join(self.pasta, nome)
+
+    def _ler_json(self, nome, padrao):
+        try:
+            with open(self._caminho(nome), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return padrao
+
+    def _ler_descricoes(self):
+        #só as linhas completas acrescentadas ao descricoes.jsonl desde a última leitura
+        try:
+            with open(self._caminho('descricoes.jsonl'), 'rb') as f:
+                f.seek(self._bytes_descricoes)
+                novo = f.read()
+        except FileNotFoundError:
+            return []
+        completo = novo[:novo.rfind(b'\n') + 1]
+        self._bytes_descricoes += len(completo)
+        return [json.loads(linha) for linha in completo.decode('utf-8').splitlines()]
+
+    def _truncar_colunas(self):
+        #descarta o que foi escrito depois do último estado confirmado (ex.: queda no meio de uma importação)
+        for nome, dtype in COLUNAS_BINARIAS.items():
+            caminho = self._caminho(f'{nome}.bin')
+            tamanho = self.total_linhas * np.dtype(dtype).itemsize
+            if os.path.exists(caminho) and os.path.getsize(caminho) > tamanho:
+                with open(caminho, 'r+b') as f:
+                    f.truncate(tamanho)
+        with open(self._caminho('descricoes.jsonl'), 'a', encoding='utf-8'):
+            pass
+
+    def _coluna(self, nome):
+        caminho = self._caminho(f'{nome}.bin')
+        dtype = COLUNAS_BINARIAS[nome]
+        if self.total_linhas == 0 or not os.path.exists(caminho):
+            return np.empty(0, dtype=dtype)
+        return np.memmap(caminho, dtype=dtype, mode='r', shape=(self.total_linhas,))
+
+    def _codificar(self, valores, codigos, lista, arquivo=None):
+        novos = [v for v in dict.fromkeys(valores) if v not in codigos]
+        for valor in novos:
+            codigos[valor] = len(lista)
+            lista.append(valor)
+        if arquivo and novos:
+            with open(self._caminho(arquivo), 'ab') as f:
+                f.write(''.join(json.dumps(v, ensure_ascii=False) + '\n' for v in novos).encode('utf-8'))
+                self._bytes_descricoes = f.tell() #as próprias linhas não são relidas no próximo _recarregar
+        return np.array([codigos[v] for v in valores])
+
+    def adicionar(self, df):
+        """acrescenta as transações de `df` (formato de obter_dataframe) que ainda não estão no livro.
+
+        duplicatas são detectadas contra o que já foi gravado; devolve a contagem de novas e repetidas.
+        """
+        chaves = chaves_transacoes(df)
+        with self._travado():
+            self._recarregar()
+            novas = np.fromiter((c not in self._chaves for c in chaves.tolist()), dtype=bool, count=len(chaves))
+            df_novas = df[novas]
+            if df_novas.empty:
+                return {'novas': 0, 'duplicadas': int(len(df))}
+
+            colunas = {
+                'data': df_novas['Data'].astype('datetime64[ns]').astype('int64').to_numpy(),
+                'centavos': df_novas['Centavos'].to_numpy(np.int64),
+                'descricao': self._codificar(df_novas['Descrição'].tolist(), self._codigo_descricao, self.descricoes, 'descricoes.jsonl'),
+                'categoria': self._codificar(df_novas['Categoria'].tolist(), self._codigo_categoria, self.categorias),
+                'chave': chaves[novas],
+            }
+            for nome, valores in colunas.items():
+                with open(self._caminho(f'{nome}.bin'), 'ab') as f:
+                    f.write(np.ascontiguousarray(valores, dtype=COLUNAS_BINARIAS[nome]).tobytes())
+
+            self.agregados.atualizar(df_novas)
+            self.total_linhas += len(df_novas)
+            self._chaves.update(colunas['chave'].tolist())
+            self._salvar_estado()
+            return {'novas': int(len(df_novas)), 'duplicadas': int(len(df) - len(df_novas))}
+
+    def _salvar_estado(self):
+        estado = {'total_linhas': self.total_linhas, 'categorias': self.categorias, 'agregados': self.agregados.para_dict()}
+        temporario = self._caminho(ARQUIVO_ESTADO + '.tmp')
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(estado, f, ensure_ascii=False)
+        os.replace(temporario, self._caminho(ARQUIVO_ESTADO))
+
+    def obter_dataframe(self):
+        #histórico completo no formato de CarteiraFinanceira.obter_dataframe
+        with self._travado():
+            self._recarregar()
+            centavos = np.array(self._coluna('centavos'))
+            valores = centavos / 100
+            descricoes = np.array(self.descricoes, dtype=object)
+            categorias = np.array(self.categorias, dtype=object)
+            return pd.DataFrame({
+                'Data': pd.to_datetime(np.array(self._coluna('data'))),
+                'Descrição': descricoes[np.array(self._coluna('descricao'))] if len(descricoes) else np.empty(0, dtype=object),
+                'Valor': valores,
+                'Tipo': np.where(valores > 0, 'Receita', 'Despesa').astype(object),
+                'Categoria': categorias[np.array(self._coluna('categoria'))] if len(categorias) else np.empty(0, dtype=object),
+                'Centavos': centavos,
+            })
@@ -0,0 +1,94 @@
+# contadores e histogramas de latência expostos no formato de texto do prometheus
+import threading
+import time
+from contextlib import contextmanager
+
+#limites superiores (segundos) dos baldes dos histogramas
+BALDES_PADRAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+@contextmanager
+def cronometrar(tempos, etapa):
+    #soma a duração do bloco em tempos[etapa]; etapas repetidas (ex.: blocos do streaming) acumulam
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        tempos[etapa] = tempos.get(etapa, 0.0) + time.perf_counter() - inicio
+
+
+class RegistroMetricas:
+    """contadores e histogramas com rótulos, guardados em memória no processo do servidor.
+
+    as etapas que rodam em outros processos (fila de jobs, lote, pool de gráficos) devolvem os
+    tempos junto com o resultado e são registradas aqui quando o resultado chega.
+    """
+
+    def __init__(self, prefixo: str = 'analisador', baldes=BALDES_PADRAO):
+        self.prefixo = prefixo
+        self.baldes = tuple(baldes)
+        self._descricoes = {}
+        self._contadores = {}  #(nome, rótulos) -> valor
+        self._histogramas = {}  #(nome, rótulos) -> [contagem por balde..., soma, total]
+        self._lock = threading.Lock()
+
+    def descrever(self, nome: str, tipo: str, descricao: str):
+        self._descricoes[nome] = (tipo, descricao)
+
+    def incrementar(self, nome: str, valor: float = 1, **rotulos):
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0) + valor
+
+    def observar(self, nome: str, segundos: float, **rotulos):
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self._lock:
+            serie = self._histogramas.get(chave)
+            if serie is None:
+                serie = self._histogramas[chave] = [0] * len(self.baldes) + [0.0, 0]
+            for i, limite in enumerate(self.baldes):
+                if segundos <= limite:
+                    serie[i] += 1
+            serie[-2] += segundos
+            serie[-1] += 1
+
+    def exportar(self, medidores=None) -> str:
+        #texto no formato de exposição do prometheus; medidores são valores instantâneos {nome: valor}
+        linhas = []
+        with self._lock:
+            contadores = sorted(self._contadores.items())
+            histogramas = sorted((chave, list(serie)) for chave, serie in self._histogramas.items())
+
+        cabecalhos = set()
+        def cabecalho(nome, tipo_padrao):
+            if nome not in cabecalhos:
+                cabecalhos.add(nome)
+                tipo, descricao = self._descricoes.get(nome, (tipo_padrao, nome))
+                linhas.append(f"# HELP {self.prefixo}_{nome} {descricao}")
+                linhas.append(f"# TYPE {self.prefixo}_{nome} {tipo}")
+
+        for (nome, rotulos), valor in contadores:
+            cabecalho(nome, 'counter')
+            linhas.append(f"{self.prefixo}_{nome}{_rotulos(rotulos)} {valor}")
+        for (nome, rotulos), serie in histogramas:
+            cabecalho(nome, 'histogram')
+            for limite, contagem in zip(self.baldes, serie):
+                linhas.append(f"{self.prefixo}_{nome}_bucket{_rotulos(rotulos + (('le', repr(limite)),))} {contagem}")
+            linhas.append(f"{self.prefixo}_{nome}_bucket{_rotulos(rotulos + (('le', '+Inf'),))} {serie[-1]}")
+            linhas.append(f"{self.prefixo}_{nome}_sum{_rotulos(rotulos)} {serie[-2]}")
+            linhas.append(f"{self.prefixo}_{nome}_count{_rotulos(rotulos)} {serie[-1]}")
+        for nome, valor in sorted((medidores or {}).items()):
+            cabecalho(nome, 'gauge')
+            linhas.append(f"{self.prefixo}_{nome} {valor}")
+        return '\n'.join(linhas) + '\n'
+
+
+def _rotulos(rotulos):
+    if not rotulos:
+        return ''
+    texto = ','.join(f'{nome}="{_escapar(valor)}"' for nome, valor in rotulos)
+    return '{' + texto + '}'
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
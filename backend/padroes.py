@@ -0,0 +1,185 @@
+# detecção de cobranças recorrentes e de gastos atípicos sobre o dataframe de transações
+import numpy as np
+import pandas as pd
+
+#periodicidade -> (intervalo em dias, tolerância em dias)
+PERIODOS = {
+    'semanal': (7, 2),
+    'quinzenal': (14, 3),
+    'mensal': (30.4, 5),
+    'bimestral': (61, 7),
+    'trimestral': (91, 10),
+    'semestral': (182, 15),
+    'anual': (365, 20),
+}
+MIN_OCORRENCIAS = 3
+MIN_REGULARIDADE = 0.75  #fração dos intervalos dentro da tolerância da periodicidade
+MAX_VARIACAO_VALOR = 0.3  #coeficiente de variação máximo dos valores de uma recorrência
+JANELA_TRANSACOES = 50  #transações anteriores da categoria usadas na média/desvio móveis
+MIN_HISTORICO = 10
+LIMIAR_Z = 3.5
+JANELA_MESES = 6
+LIMITE_ITENS = {'recorrentes': 50, 'transacoes_atipicas': 20, 'picos_categoria': 20}
+
+
+def impressoes_digitais(descricoes):
+    """agrupa descrições que só diferem em números, pontuação, acentos ou caixa.
+
+    devolve (código por linha, texto de cada código). a normalização roda só sobre as
+    descrições distintas, então o custo é uma fatoração das linhas mais o das descrições únicas.
+    """
+    codigos, unicas = pd.factorize(pd.Series(descricoes, dtype=object), use_na_sentinel=False)
+    normalizadas = (pd.Series(unicas, dtype=object).astype(str).str.lower()
+                    .str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii')
+                    .str.replace(r'[^a-z]+', ' ', regex=True).str.split().str.join(' '))
+    codigos_unicas, textos = pd.factorize(normalizadas)
+    return codigos_unicas[codigos], np.asarray(textos, dtype=object)
+
+
+def detectar_padroes(df):
+    """cobranças recorrentes, transações atípicas e picos mensais por categoria de `df` (formato de obter_dataframe).
+
+    tudo é feito com ordenações, diferenças e estatísticas móveis agrupadas sobre colunas
+    inteiras (sem laço por linha), então o tempo cresce quase linearmente com o histórico.
+    """
+    if df.empty:
+        return {'transacoes_analisadas': 0, 'recorrentes': [], 'despesa_recorrente_mensal': 0.0,
+                'transacoes_atipicas': [], 'picos_categoria': []}
+    centavos = df['Centavos'].to_numpy(dtype=np.int64)
+    dias = df['Data'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+    descricoes = df['Descrição'].to_numpy(dtype=object)
+    categorias = pd.Categorical(df['Categoria'])
+
+    recorrentes = _recorrencias(centavos, dias, descricoes, categorias)
+    return {
+        'transacoes_analisadas': int(len(df)),
+        'recorrentes': recorrentes[:LIMITE_ITENS['recorrentes']],
+        'despesa_recorrente_mensal': round(sum((r['custo_mensal'] for r in recorrentes if r['ativa'] and r['tipo'] == 'Despesa'), 0.0), 2),
+        'transacoes_atipicas': _transacoes_atipicas(centavos, dias, descricoes, categorias)[:LIMITE_ITENS['transacoes_atipicas']],
+        'picos_categoria': _picos_categoria(centavos, dias, categorias)[:LIMITE_ITENS['picos_categoria']],
+    }
+
+
+def _recorrencias(centavos, dias, descricoes, categorias):
+    #grupo = (impressão digital, entrada ou saída); dentro de cada grupo, ordenado por data
+    digitais, _ = impressoes_digitais(descricoes)
+    grupo = digitais.astype(np.int64) * 2 + (centavos > 0)
+    ordem = np.lexsort((dias, grupo))
+    grupo, dias_ord, valores = grupo[ordem], dias[ordem], np.abs(centavos[ordem])
+    inicio_grupo = np.r_[True, grupo[1:] != grupo[:-1]]
+    intervalo = np.diff(dias_ord, prepend=dias_ord[0]).astype(np.float64)
+    intervalo[inicio_grupo] = np.nan
+
+    linhas = pd.DataFrame({'grupo': grupo, 'intervalo': intervalo, 'valor': valores, 'dia': dias_ord})
+    por_grupo = linhas.groupby('grupo', sort=False)
+    estatisticas = por_grupo.agg(ocorrencias=('valor', 'size'), mediana_intervalo=('intervalo', 'median'),
+                                 media_valor=('valor', 'mean'), desvio_valor=('valor', 'std'),
+                                 primeira=('dia', 'min'), ultima=('dia', 'max'))
+    candidatos = estatisticas[(estatisticas['ocorrencias'] >= MIN_OCORRENCIAS)
+                              & (estatisticas['desvio_valor'].fillna(0) <= MAX_VARIACAO_VALOR * estatisticas['media_valor'])]
+    if candidatos.empty:
+        return []
+
+    #periodicidade mais próxima da mediana dos intervalos, se estiver dentro da tolerância dela
+    nomes = list(PERIODOS)
+    periodos = np.array([PERIODOS[n][0] for n in nomes])
+    tolerancias = np.array([PERIODOS[n][1] for n in nomes])
+    distancia = np.abs(candidatos['mediana_intervalo'].to_numpy()[:, None] - periodos[None, :])
+    melhor = distancia.argmin(axis=1)
+    dentro = distancia[np.arange(len(melhor)), melhor] <= tolerancias[melhor]
+    candidatos = candidatos[dentro].assign(periodo=periodos[melhor[dentro]], tolerancia=tolerancias[melhor[dentro]],
+                                           periodicidade=np.array(nomes, dtype=object)[melhor[dentro]])
+    if candidatos.empty:
+        return []
+
+    #regularidade: fração dos intervalos do grupo que cabem na periodicidade escolhida
+    no_candidato = linhas['grupo'].isin(candidatos.index).to_numpy() & ~inicio_grupo
+    trecho = linhas[no_candidato]
+    regular = (np.abs(trecho['intervalo'] - trecho['grupo'].map(candidatos['periodo']))
+               <= trecho['grupo'].map(candidatos['tolerancia']))
+    candidatos = candidatos.assign(regularidade=regular.groupby(trecho['grupo']).mean())
+    candidatos = candidatos[candidatos['regularidade'] >= MIN_REGULARIDADE]
+    if candidatos.empty:
+        return []
+
+    #descrição e categoria exibidas: as da ocorrência mais recente de cada grupo
+    ultima_linha = pd.Series(np.arange(len(grupo))).groupby(grupo).max()
+    fim_historico = int(dias.max())
+    resultado = []
+    for chave, linha in candidatos.iterrows():
+        indice_original = ordem[ultima_linha[chave]]
+        entrada = bool(chave % 2)
+        valor_medio = (linha['media_valor'] / 100) * (1 if entrada else -1)
+        resultado.append({
+            'descricao': str(descricoes[indice_original]),
+            'categoria': str(categorias[indice_original]),
+            'tipo': 'Receita' if entrada else 'Despesa',
+            'periodicidade': linha['periodicidade'],
+            'intervalo_medio_dias': float(linha['mediana_intervalo']),
+            'ocorrencias': int(linha['ocorrencias']),
+            'valor_medio': round(valor_medio, 2),
+            'custo_mensal': round(valor_medio * PERIODOS['mensal'][0] / linha['periodo'], 2),
+            'primeira': _data(linha['primeira']),
+            'ultima': _data(linha['ultima']),
+            'proxima_prevista': _data(linha['ultima'] + round(linha['periodo'])),
+            'ativa': bool(fim_historico - linha['ultima'] <= 1.5 * linha['periodo']),
+            'regularidade': round(float(linha['regularidade']), 3),
+        })
+    resultado.sort(key=lambda r: abs(r['custo_mensal']), reverse=True)
+    return resultado
+
+
+def _transacoes_atipicas(centavos, dias, descricoes, categorias):
+    #despesas muito acima da média móvel das JANELA_TRANSACOES despesas anteriores da mesma categoria
+    despesas = np.flatnonzero(centavos < 0)
+    if len(despesas) == 0:
+        return []
+    codigos = categorias.codes[despesas]
+    ordem = despesas[np.lexsort((dias[despesas], codigos))]
+    grupos = pd.Series(categorias.codes[ordem])
+    valores = pd.Series(-centavos[ordem] / 100)
+    anteriores = valores.groupby(grupos).shift()
+    janelas = anteriores.groupby(grupos).rolling(JANELA_TRANSACOES, min_periods=MIN_HISTORICO)
+    media = janelas.mean().reset_index(level=0, drop=True).sort_index()
+    desvio = janelas.std().reset_index(level=0, drop=True).sort_index()
+    z = (valores - media) / desvio.where(desvio > 0)
+    atipicas = z[(z >= LIMIAR_Z) & (valores >= 2 * media)].sort_values(ascending=False)
+    return [{
+        'data': _data(dias[ordem[i]]),
+        'descricao': str(descricoes[ordem[i]]),
+        'categoria': str(categorias[ordem[i]]),
+        'valor': -round(float(valores[i]), 2),
+        'media_categoria': round(float(media[i]), 2),
+        'desvios': round(float(z[i]), 1),
+    } for i in atipicas.index[:LIMITE_ITENS['transacoes_atipicas']]]
+
+
+def _picos_categoria(centavos, dias, categorias):
+    #meses em que o gasto de uma categoria passou da média + 2 desvios dos JANELA_MESES meses anteriores
+    despesas = centavos < 0
+    if not despesas.any():
+        return []
+    mes = pd.DatetimeIndex(dias[despesas].astype('datetime64[D]')).to_period('M')
+    gastos = pd.Series(-centavos[despesas] / 100).groupby([mes, categorias[despesas]], observed=True).sum().unstack(fill_value=0.0)
+    #meses sem nenhuma despesa contam como zero na média móvel
+    gastos = gastos.reindex(pd.period_range(gastos.index.min(), gastos.index.max(), freq='M'), fill_value=0.0)
+    anteriores = gastos.shift()
+    media = anteriores.rolling(JANELA_MESES, min_periods=3).mean()
+    desvio = anteriores.rolling(JANELA_MESES, min_periods=3).std()
+    #categoria sem gasto nos meses anteriores não tem base de comparação (primeiro gasto não é pico)
+    picos = (gastos > media + 2 * desvio) & (gastos > 1.5 * media) & (media > 0)
+    resultado = []
+    for (mes_pico, categoria), _ in picos.stack().loc[lambda s: s].items():
+        resultado.append({
+            'mes': str(mes_pico),
+            'categoria': str(categoria),
+            'total': round(float(gastos.at[mes_pico, categoria]), 2),
+            'media_anterior': round(float(media.at[mes_pico, categoria]), 2),
+            'aumento_percentual': round(float(100 * (gastos.at[mes_pico, categoria] / media.at[mes_pico, categoria] - 1)), 1),
+        })
+    resultado.sort(key=lambda p: p['aumento_percentual'], reverse=True)
+    return resultado
+
+
+def _data(dia):
+    return str(np.datetime64(int(dia), 'D'))
@@ -0,0 +1,235 @@
+# pdf do relatório montado só com texto, tabelas e gráficos vetoriais do próprio fpdf
+# não usa matplotlib nem imagens: nada é gravado em disco e o resultado sai como bytes
+import math
+
+from fpdf import FPDF
+
+COR_RECEITA = (92, 184, 92)
+COR_DESPESA = (217, 83, 79)
+COR_CABECALHO = (227, 242, 253)
+COR_EIXO = (160, 160, 160)
+LARGURA_UTIL = 190 #a4 com margens de 10mm
+
+
+def gerar_pdf_rapido(agregados, titulo="Relatório Financeiro Completo", padroes=None):
+    """devolve os bytes de um pdf com os kpis, o balanço mensal e as despesas por categoria.
+
+    as três figuras do relatório completo viram desenhos vetoriais (retângulos e linhas),
+    o que deixa o arquivo menor e evita rasterizar e reler pngs. com `padroes` (saída de
+    padroes.detectar_padroes) o pdf ganha as seções de recorrências e gastos atípicos.
+    """
+    pdf = FPDF()
+    pdf.set_auto_page_break(True, margin=15)
+    pdf.add_page()
+    pdf.set_font("Arial", size=16, style='B')
+    pdf.cell(0, 10, txt=titulo, ln=True, align='C')
+    pdf.ln(5)
+
+    resumo = agregados.resumo_mensal()
+    meses = list(resumo.index)
+    receitas = resumo['Receita'].tolist()
+    despesas = resumo['Despesa'].abs().tolist()
+    categorias = agregados.resumo_categorias()
+
+    _kpis(pdf, agregados.kpis())
+    _secao(pdf, "Distribuição de Receitas e Despesas", 22)
+    _barra_distribuicao(pdf, agregados.kpis())
+    _secao(pdf, "Receitas vs Despesas por Mês", 75)
+    _barras_mensais(pdf, meses, receitas, despesas)
+    _secao(pdf, "Despesas por Categoria", 8 * (len(categorias) + 1))
+    _barras_categorias(pdf, categorias)
+    _secao(pdf, "Balanço Mensal", 16)
+    _tabela_mensal(pdf, meses, receitas, despesas)
+    if padroes:
+        secao_padroes(pdf, padroes)
+
+    conteudo = pdf.output(dest='S') #str latin-1 no pyfpdf 1.x, bytearray no fpdf2
+    return conteudo.encode('latin-1') if isinstance(conteudo, str) else bytes(conteudo)
+
+
+def secao_padroes(pdf, padroes):
+    #tabelas de cobranças recorrentes, transações atípicas e picos por categoria; usada também pelo pdf completo
+    recorrentes = padroes.get('recorrentes', [])
+    _secao(pdf, "Cobranças e Receitas Recorrentes", 6 * (len(recorrentes) + 2))
+    if recorrentes:
+        _tabela(pdf, ("Descrição", "Periodicidade", "Valor Médio", "Por Mês", "Próxima"), (70, 28, 32, 30, 30),
+                [(r['descricao'] + ("" if r['ativa'] else " (encerrada)"), r['periodicidade'],
+                  f"R$ {r['valor_medio']:,.2f}", f"R$ {r['custo_mensal']:,.2f}", r['proxima_prevista'] if r['ativa'] else "-")
+                 for r in recorrentes])
+        pdf.set_font("Arial", size=9, style='B')
+        pdf.cell(0, 7, txt=f"Despesa mensal com recorrências ativas: R$ {abs(padroes['despesa_recorrente_mensal']):,.2f}", ln=True)
+    else:
+        pdf.cell(0, 6, txt="Nenhuma recorrência encontrada.", ln=True)
+
+    atipicas = padroes.get('transacoes_atipicas', [])
+    _secao(pdf, "Transações Atípicas", 6 * (len(atipicas) + 2))
+    if atipicas:
+        _tabela(pdf, ("Data", "Descrição", "Categoria", "Valor", "Média Cat."), (24, 76, 30, 30, 30),
+                [(a['data'], a['descricao'], a['categoria'], f"R$ {abs(a['valor']):,.2f}", f"R$ {a['media_categoria']:,.2f}")
+                 for a in atipicas])
+    else:
+        pdf.cell(0, 6, txt="Nenhuma transação atípica encontrada.", ln=True)
+
+    picos = padroes.get('picos_categoria', [])
+    _secao(pdf, "Picos de Gasto por Categoria", 6 * (len(picos) + 2))
+    if picos:
+        _tabela(pdf, ("Mês", "Categoria", "Total", "Média Anterior", "Aumento"), (30, 50, 40, 40, 30),
+                [(p['mes'], p['categoria'], f"R$ {p['total']:,.2f}", f"R$ {p['media_anterior']:,.2f}",
+                  f"{p['aumento_percentual']:.0f}%") for p in picos])
+    else:
+        pdf.cell(0, 6, txt="Nenhum pico de gasto encontrado.", ln=True)
+
+
+def _tabela(pdf, titulos, larguras, linhas):
+    #tabela simples com cabeçalho repetido a cada página; textos longos são cortados na largura da coluna
+    def cabecalho():
+        pdf.set_font("Arial", size=8, style='B')
+        pdf.set_fill_color(*COR_CABECALHO)
+        for titulo, largura in zip(titulos, larguras):
+            pdf.cell(largura, 6, txt=titulo, border=1, align='C', fill=True)
+        pdf.ln()
+        pdf.set_font("Arial", size=8)
+
+    cabecalho()
+    for linha in linhas:
+        if pdf.get_y() + 6 > pdf.h - 15:
+            pdf.add_page()
+            cabecalho()
+        for texto, largura in zip(linha, larguras):
+            pdf.cell(largura, 6, txt=_cortar(pdf, _latin1(texto), largura - 2), border=1)
+        pdf.ln()
+
+
+def _latin1(texto):
+    #o pyfpdf 1.x só escreve latin-1; descrições vindas do extrato podem ter outros caracteres
+    return str(texto).encode('latin-1', 'replace').decode('latin-1')
+
+
+def _cortar(pdf, texto, largura):
+    if pdf.get_string_width(texto) <= largura:
+        return texto
+    while texto and pdf.get_string_width(texto + "...") > largura:
+        texto = texto[:-1]
+    return texto + "..."
+
+
+def _secao(pdf, titulo, altura_conteudo):
+    #título de seção; começa outra página se o título e o conteúdo não couberem juntos
+    if pdf.get_y() + 12 + min(altura_conteudo, 60) > pdf.h - 15:
+        pdf.add_page()
+    pdf.ln(4)
+    pdf.set_font("Arial", size=12, style='B')
+    pdf.cell(0, 8, txt=titulo, ln=True, align='L')
+    pdf.set_font("Arial", size=9)
+
+
+def _kpis(pdf, kpis):
+    itens = [
+        ("Receita Total", f"R$ {kpis['receita_total']:,.2f}"),
+        ("Despesa Total", f"R$ {abs(kpis['despesa_total']):,.2f}"),
+        ("Saldo Final", f"R$ {kpis['saldo_final']:,.2f}"),
+        ("Taxa de Poupança", f"{kpis['taxa_poupanca']:.1f}%"),
+    ]
+    largura = LARGURA_UTIL / len(itens)
+    pdf.set_font("Arial", size=9, style='B')
+    pdf.set_fill_color(*COR_CABECALHO)
+    for rotulo, _ in itens:
+        pdf.cell(largura, 7, txt=rotulo, border=1, align='C', fill=True)
+    pdf.ln()
+    pdf.set_font("Arial", size=11)
+    for _, valor in itens:
+        pdf.cell(largura, 9, txt=valor, border=1, align='C')
+    pdf.ln()
+
+
+def _barra_distribuicao(pdf, kpis):
+    #barra única dividida na proporção de receitas e despesas (equivalente ao gráfico de pizza)
+    receita, despesa = max(kpis['receita_total'], 0), abs(kpis['despesa_total'])
+    total = receita + despesa
+    x, y = pdf.l_margin, pdf.get_y() + 1
+    if total > 0:
+        largura_receita = LARGURA_UTIL * receita / total
+        pdf.set_fill_color(*COR_RECEITA)
+        pdf.rect(x, y, largura_receita, 8, 'F')
+        pdf.set_fill_color(*COR_DESPESA)
+        pdf.rect(x + largura_receita, y, LARGURA_UTIL - largura_receita, 8, 'F')
+        pdf.set_xy(x, y + 9)
+        pdf.cell(LARGURA_UTIL / 2, 5, txt=f"Receita: {100 * receita / total:.1f}%", align='L')
+        pdf.cell(LARGURA_UTIL / 2, 5, txt=f"Despesa: {100 * despesa / total:.1f}%", align='R')
+    pdf.set_xy(x, y + 15)
+
+
+def _barras_mensais(pdf, meses, receitas, despesas):
+    altura = 55
+    x0, y0 = pdf.l_margin + 18, pdf.get_y() + 2
+    largura = LARGURA_UTIL - 18
+    maximo = max(receitas + despesas + [0]) or 1
+    #eixo y com três marcas
+    pdf.set_draw_color(*COR_EIXO)
+    pdf.set_font("Arial", size=7)
+    for fracao in (0, 0.5, 1):
+        y = y0 + altura * (1 - fracao)
+        pdf.line(x0, y, x0 + largura, y)
+        pdf.text(pdf.l_margin, y + 1, f"{maximo * fracao:,.0f}")
+    if meses:
+        passo = largura / len(meses)
+        barra = passo * 0.4
+        for i, (receita, despesa) in enumerate(zip(receitas, despesas)):
+            x = x0 + i * passo + passo * 0.1
+            for deslocamento, valor, cor in ((0, receita, COR_RECEITA), (barra, despesa, COR_DESPESA)):
+                h = altura * valor / maximo
+                if h > 0:
+                    pdf.set_fill_color(*cor)
+                    pdf.rect(x + deslocamento, y0 + altura - h, barra, h, 'F')
+        #rótulos dos meses sem sobreposição: pula meses quando não há espaço
+        a_cada = max(1, math.ceil(pdf.get_string_width("0000-00") * 1.3 / passo))
+        for i in range(0, len(meses), a_cada):
+            pdf.text(x0 + i * passo, y0 + altura + 4, str(meses[i]))
+    _legenda(pdf, x0, y0 + altura + 7, [("Receita", COR_RECEITA), ("Despesa", COR_DESPESA)])
+    pdf.set_xy(pdf.l_margin, y0 + altura + 12)
+
+
+def _barras_categorias(pdf, categorias):
+    #uma barra horizontal por categoria, da maior para a menor
+    maximo = max(categorias.values(), default=0) or 1
+    largura_rotulo, largura_valor = 40, 30
+    largura = LARGURA_UTIL - largura_rotulo - largura_valor
+    total = sum(categorias.values()) or 1
+    pdf.set_fill_color(*COR_DESPESA)
+    for categoria, valor in categorias.items():
+        x, y = pdf.l_margin, pdf.get_y()
+        pdf.cell(largura_rotulo, 6, txt=str(categoria))
+        pdf.rect(x + largura_rotulo, y + 1, max(largura * valor / maximo, 0.2), 4, 'F')
+        pdf.set_x(x + largura_rotulo + largura)
+        pdf.cell(largura_valor, 6, txt=f"R$ {valor:,.2f} ({100 * valor / total:.0f}%)", align='R', ln=True)
+
+
+def _tabela_mensal(pdf, meses, receitas, despesas):
+    larguras = [LARGURA_UTIL / 4] * 4
+
+    def cabecalho():
+        pdf.set_font("Arial", size=9, style='B')
+        pdf.set_fill_color(*COR_CABECALHO)
+        for titulo, largura in zip(("Mês", "Receita", "Despesa", "Saldo"), larguras):
+            pdf.cell(largura, 6, txt=titulo, border=1, align='C', fill=True)
+        pdf.ln()
+        pdf.set_font("Arial", size=9)
+
+    cabecalho()
+    for mes, receita, despesa in zip(meses, receitas, despesas):
+        if pdf.get_y() + 6 > pdf.h - 15: #repete o cabeçalho em cada página
+            pdf.add_page()
+            cabecalho()
+        pdf.cell(larguras[0], 6, txt=str(mes), border=1, align='C')
+        pdf.cell(larguras[1], 6, txt=f"R$ {receita:,.2f}", border=1, align='R')
+        pdf.cell(larguras[2], 6, txt=f"R$ {despesa:,.2f}", border=1, align='R')
+        pdf.cell(larguras[3], 6, txt=f"R$ {receita - despesa:,.2f}", border=1, align='R')
+        pdf.ln()
+
+
+def _legenda(pdf, x, y, itens):
+    for rotulo, cor in itens:
+        pdf.set_fill_color(*cor)
+        pdf.rect(x, y, 3, 3, 'F')
+        pdf.text(x + 4, y + 2.6, rotulo)
+        x += 25
@@ -0,0 +1,96 @@
+# mede a categorização (MotorCategorizacao) com cada vez mais palavras-chave nas regras, comparando o
+# autômato de Aho-Corasick com o regex único de alternativas usado antes, e confere o resultado contra
+# a busca linear categoria por categoria (a primeira categoria com uma palavra contida na descrição)
+# uso: python benchmarks/bench_categorizacao.py [--palavras 30 300 3000 10000] [--descricoes 20000] [--categorias 20]
+import argparse
+import json
+import os
+import random
+import re
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from categorizacao import CATEGORIA_PADRAO, MotorCategorizacao  # noqa: E402
+
+
+def gerar_regras(rnd, palavras, categorias):
+    #palavras aleatórias de 3 a 10 letras espalhadas pelas categorias, mais as regras reais no início
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'regras_categorias.json'),
+              encoding='utf-8') as f:
+        regras = {categoria: list(lista) for categoria, lista in json.load(f).items()}
+    extras = [f"Categoria {i}" for i in range(categorias)]
+    for categoria in extras:
+        regras[categoria] = []
+    total = sum(len(lista) for lista in regras.values())
+    while total < palavras:
+        palavra = ''.join(rnd.choice(string.ascii_lowercase) for _ in range(rnd.randint(3, 10)))
+        regras[rnd.choice(extras)].append(palavra)
+        total += 1
+    return regras
+
+
+def gerar_descricoes(rnd, regras, quantidade):
+    #descrições distintas como nos extratos; metade contém alguma palavra-chave
+    palavras = [p for lista in regras.values() for p in lista]
+    descricoes = set()
+    while len(descricoes) < quantidade:
+        partes = [rnd.choice(['pix', 'compra', 'pagamento', 'debito', 'transferencia']), str(rnd.randrange(10**6))]
+        if rnd.random() < 0.5:
+            partes.insert(rnd.randint(0, 2), rnd.choice(palavras))
+        partes.append(''.join(rnd.choice(string.ascii_lowercase + ' ') for _ in range(rnd.randint(5, 25))))
+        descricoes.add(' '.join(partes))
+    return list(descricoes)
+
+
+def categoria_linear(regras, descricao):
+    for categoria, palavras in regras.items():
+        if any(palavra.lower() in descricao for palavra in palavras):
+            return categoria
+    return CATEGORIA_PADRAO
+
+
+def regex_antigo(regras):
+    #o regex combinado de antes: lookahead com todas as palavras em ordem de prioridade
+    prioridade = {}
+    for i, palavras in enumerate(regras.values()):
+        for palavra in palavras:
+            prioridade.setdefault(palavra.lower(), i)
+    ordenadas = sorted(prioridade, key=lambda p: (prioridade[p], -len(p)))
+    regex = re.compile('(?=(' + '|'.join(map(re.escape, ordenadas)) + '))')
+    return lambda descricao: min((prioridade[m.group(1)] for m in regex.finditer(descricao)), default=None)
+
+
+def medir(funcao, descricoes):
+    inicio = time.perf_counter()
+    for descricao in descricoes:
+        funcao(descricao)
+    return (time.perf_counter() - inicio) / len(descricoes) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--palavras', type=int, nargs='+', default=[30, 300, 3_000, 10_000])
+    parser.add_argument('--descricoes', type=int, default=20_000, help='descrições distintas por medida')
+    parser.add_argument('--categorias', type=int, default=20)
+    parser.add_argument('--conferir', type=int, default=2_000, help='descrições conferidas contra a busca linear')
+    parser.add_argument('--semente', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'palavras':>9} {'aho-corasick (µs)':>18} {'regex antigo (µs)':>18} {'divergências':>13}")
+    for quantidade in args.palavras:
+        rnd = random.Random(args.semente)
+        regras = gerar_regras(rnd, quantidade, args.categorias)
+        descricoes = gerar_descricoes(rnd, regras, args.descricoes)
+        motor = MotorCategorizacao(regras)
+        #sem o cache por descrição: cada descrição é distinta e passa pelo autômato
+        automato = medir(motor._categorizar_normalizada, descricoes)
+        antigo = medir(regex_antigo(regras), descricoes[:max(200, args.descricoes // 20)])
+        divergencias = sum(1 for d in descricoes[:args.conferir] if motor.categorizar(d) != categoria_linear(regras, d))
+        print(f"{quantidade:>9} {automato:>18.2f} {antigo:>18.2f} {divergencias:>13}")
+
+
+if __name__ == '__main__':
+    main()
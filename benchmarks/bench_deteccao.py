@@ -0,0 +1,62 @@
+# compara a leitura por tentativas (separador x codificação) com a detecção pela amostra + uma leitura
+# uso: python benchmarks/bench_deteccao.py [--linhas 200000]
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from deteccao_csv import detectar_formato  # noqa: E402
+from gerador_extratos import gerar_extrato  # noqa: E402
+
+
+def ler_por_tentativas(caminho):
+    #leitura antiga: uma leitura completa por combinação até achar a coluna de data
+    tentativas = 0
+    for sep in [',', ';']:
+        for encoding in ['utf-8', 'latin1', 'iso-8859-1']:
+            tentativas += 1
+            try:
+                df = pd.read_csv(caminho, sep=sep, encoding=encoding, skipinitialspace=True)
+            except Exception:
+                continue
+            if 'data' in df.columns:
+                return df, tentativas
+    raise ValueError('nenhuma combinação funcionou')
+
+
+def ler_detectando(caminho):
+    formato = detectar_formato(caminho)
+    df = pd.read_csv(caminho, sep=formato['separador'], encoding=formato['codificacao'],
+                     skiprows=formato['linha_cabecalho'], skipinitialspace=True)
+    return df, 1
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--linhas', type=int, default=200_000)
+    args = parser.parse_args()
+
+    print(f"{'arquivo':<22} {'tentativas':>10} {'antigo (s)':>11} {'detecção (s)':>13}")
+    with tempfile.TemporaryDirectory() as pasta:
+        for separador in [',', ';']:
+            for codificacao in ['utf-8', 'latin1']:
+                nome = f"{'virgula' if separador == ',' else 'ponto_virgula'}_{codificacao}"
+                caminho = gerar_extrato(os.path.join(pasta, nome + '.csv'), args.linhas,
+                                        separador=separador, codificacao=codificacao)
+                inicio = time.perf_counter()
+                df_antigo, tentativas = ler_por_tentativas(caminho)
+                tempo_antigo = time.perf_counter() - inicio
+                inicio = time.perf_counter()
+                df_novo, _ = ler_detectando(caminho)
+                tempo_novo = time.perf_counter() - inicio
+                assert df_antigo.shape == df_novo.shape
+                print(f"{nome:<22} {tentativas:>10} {tempo_antigo:>11.3f} {tempo_novo:>13.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+# compara linhas/s da importação linha a linha com a importação colunar
+# uso: python benchmarks/bench_importacao.py [--tamanhos 10000 100000 1000000] [--max-linhas-legado 100000]
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from app import CarteiraFinanceira  # noqa: E402
+from gerador_extratos import gerar_extrato  # noqa: E402
+
+
+def medir(caminho, modo):
+    carteira = CarteiraFinanceira()
+    inicio = time.perf_counter()
+    carteira.importar_csv(caminho, modo=modo)
+    duracao = time.perf_counter() - inicio
+    return len(carteira.obter_dataframe()), duracao
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--max-linhas-legado', type=int, default=100_000,
+                        help='acima deste tamanho o modo linha a linha não é medido')
+    args = parser.parse_args()
+
+    print(f"{'linhas':>10} {'linhas (s)':>12} {'linhas/s':>12} {'colunar (s)':>12} {'linhas/s':>12} {'ganho':>8}")
+    with tempfile.TemporaryDirectory() as pasta:
+        for tamanho in args.tamanhos:
+            caminho = gerar_extrato(os.path.join(pasta, f'extrato_{tamanho}.csv'), tamanho)
+            linhas_col, tempo_col = medir(caminho, 'colunar')
+            if tamanho <= args.max_linhas_legado:
+                linhas_leg, tempo_leg = medir(caminho, 'linhas')
+                assert linhas_leg == linhas_col
+                legado = f"{tempo_leg:>12.3f} {linhas_leg / tempo_leg:>12,.0f}"
+                ganho = f"{tempo_leg / tempo_col:>7.1f}x"
+            else:
+                legado = f"{'-':>12} {'-':>12}"
+                ganho = f"{'-':>8}"
+            print(f"{tamanho:>10,} {legado} {tempo_col:>12.3f} {linhas_col / tempo_col:>12,.0f} {ganho}")
+
+
+if __name__ == '__main__':
+    main()
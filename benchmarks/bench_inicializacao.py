@@ -0,0 +1,78 @@
+# mede quanto tempo um processo novo leva para importar o app, com e sem pré-aquecimento,
+# e quanto custa o primeiro gráfico depois disso, desenhado no próprio processo (GRAFICOS_PARALELOS=0,
+# onde o PREAQUECER vale) e no pool spawn de gráficos (aquecido pelo initializer de cada processo);
+# mostra também os módulos mais lentos de importar
+# uso: python benchmarks/bench_inicializacao.py [--repeticoes 5] [--modulos 10]
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PASTA_BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+
+#do pedido ao gráfico pronto pelo executor que o app usa: no próprio processo conta a importação do
+#matplotlib (adiada até o primeiro gráfico), no pool conta também subir o processo e o initializer;
+#o segundo gráfico no pool mostra o custo com o processo já aquecido
+GRAFICOS = (
+    "import os, tempfile, time, app\n"
+    "if __name__ == '__main__':\n"
+    "    for _ in range(2):\n"
+    "        inicio = time.perf_counter(); import graficos\n"
+    "        app._executor_graficos().submit(graficos.desenhar_distribuicao_tipos, ['Receita', 'Despesa'], [1, 1],\n"
+    "                                        os.path.join(tempfile.mkdtemp(), 'g.png')).result()\n"
+    "        print(time.perf_counter() - inicio)\n"
+)
+
+
+def executar(codigo, ambiente=None, opcoes=()):
+    env = dict(os.environ, **(ambiente or {}))
+    inicio = time.perf_counter()
+    processo = subprocess.run([sys.executable, *opcoes, '-c', codigo], cwd=PASTA_BACKEND, env=env,
+                              capture_output=True, text=True, check=True)
+    return time.perf_counter() - inicio, processo
+
+
+def mais_lentos(quantidade):
+    #saída de -X importtime: "import time: própria | acumulado | módulo"; o recuo do nome indica
+    #a profundidade e aqui ficam só os módulos importados diretamente pelo app
+    _, processo = executar('import app', opcoes=('-X', 'importtime'))
+    modulos = []
+    for linha in processo.stderr.splitlines():
+        partes = linha.split('|')
+        if len(partes) == 3 and partes[1].strip().isdigit() and partes[2].startswith('   ') and not partes[2].startswith('     '):
+            modulos.append((int(partes[1]), partes[2].strip()))
+    return sorted(modulos, reverse=True)[:quantidade]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--modulos', type=int, default=10)
+    args = parser.parse_args()
+
+    cenarios = [
+        ('import app', 'import app', None),
+        ('import app (PREAQUECER=1)', 'import app', {'PREAQUECER': '1'}),
+    ]
+    print(f"{'cenário':<34} {'mediana (s)':>12} {'mín (s)':>9}")
+    for nome, codigo, ambiente in cenarios:
+        tempos = [executar(codigo, ambiente)[0] for _ in range(args.repeticoes)]
+        print(f"{nome:<34} {statistics.median(tempos):>12.3f} {min(tempos):>9.3f}")
+
+    sequencial = {'GRAFICOS_PARALELOS': '0'}
+    for nome, ambiente, posicao in (('primeiro gráfico', sequencial, 0),
+                                    ('primeiro gráfico (PREAQUECER=1)', dict(sequencial, PREAQUECER='1'), 0),
+                                    ('primeiro gráfico no pool', None, 0),
+                                    ('segundo gráfico no pool', None, 1)):
+        tempos = [float(executar(GRAFICOS, ambiente)[1].stdout.split()[posicao]) for _ in range(args.repeticoes)]
+        print(f"{nome:<34} {statistics.median(tempos):>12.3f} {min(tempos):>9.3f}")
+
+    print("\nimportações diretas do app mais lentas (acumulado):")
+    for microssegundos, modulo in mais_lentos(args.modulos):
+        print(f"  {microssegundos / 1e6:>7.3f}s  {modulo}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# mede arquivos/s do lote (importar_csv + RelatorioFinanceiro) conforme o número de processos
+# uso: python benchmarks/bench_lote.py [--arquivos 16] [--linhas 20000] [--workers 1 2 4 8]
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from app import OUTPUT_FOLDER, analisar_lote  # noqa: E402
+from gerador_extratos import gerar_extrato  # noqa: E402
+
+
+def _aquecer(_):
+    return os.getpid()
+
+
+def medir(arquivos, workers):
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        #sobe os processos (e importa o app neles) antes de começar a contar
+        list(executor.map(_aquecer, range(workers)))
+        inicio = time.perf_counter()
+        eventos = list(analisar_lote(arquivos, executor))
+        duracao = time.perf_counter() - inicio
+    erros = eventos[-1]['consolidado']['erros']
+    assert erros == 0, f"{erros} arquivos falharam"
+    return duracao
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--arquivos', type=int, default=16)
+    parser.add_argument('--linhas', type=int, default=20_000)
+    parser.add_argument('--workers', type=int, nargs='+', default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    print(f"{args.arquivos} arquivos de {args.linhas:,} linhas, {os.cpu_count()} núcleos")
+    print(f"{'workers':>8} {'tempo (s)':>10} {'arquivos/s':>11} {'ganho':>7}")
+    with tempfile.TemporaryDirectory() as pasta:
+        caminhos = [gerar_extrato(os.path.join(pasta, f'extrato_{i}.csv'), args.linhas, semente=i)
+                    for i in range(args.arquivos)]
+        base = None
+        for workers in args.workers:
+            arquivos = [{'nome': os.path.basename(c), 'caminho': c, 'id': f'bench-lote-{workers}-{i}', 'chave': None}
+                        for i, c in enumerate(caminhos)]
+            duracao = medir(arquivos, workers)
+            for arquivo in arquivos:
+                shutil.rmtree(os.path.join(OUTPUT_FOLDER, arquivo['id']), ignore_errors=True)
+            base = base or duracao
+            print(f"{workers:>8} {duracao:>10.2f} {args.arquivos / duracao:>11.2f} {base / duracao:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# compara a memória de uma lista de objetos Transacao com o armazenamento colunar
+# uso: python benchmarks/bench_memoria.py [--linhas 1000000]
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from app import CarteiraFinanceira, Receita, Despesa  # noqa: E402
+from gerador_extratos import gerar_extrato  # noqa: E402
+
+
+def medir(construir):
+    gc.collect()
+    tracemalloc.start()
+    resultado = construir()
+    atual, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultado, atual
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--linhas', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = gerar_extrato(os.path.join(pasta, 'extrato.csv'), args.linhas)
+        carteira = CarteiraFinanceira()
+        carteira.importar_csv(caminho)
+        df = carteira.obter_dataframe()
+        linhas = list(zip(df['Data'], df['Descrição'], df['Valor'], df['Categoria']))
+        del carteira
+
+    def objetos():
+        return [Receita(d, t, v, c) if v > 0 else Despesa(d, t, v, c) for d, t, v, c in linhas]
+
+    def colunar():
+        carteira = CarteiraFinanceira()
+        carteira.transacoes.adicionar_bloco(df)
+        carteira.obter_dataframe()
+        return carteira
+
+    _, bytes_objetos = medir(objetos)
+    _, bytes_colunar = medir(colunar)
+    print(f"linhas: {args.linhas:,}")
+    print(f"lista de Transacao: {bytes_objetos / 2**20:10.1f} MiB ({bytes_objetos / args.linhas:.0f} B/linha)")
+    print(f"TransacoesColunares: {bytes_colunar / 2**20:9.1f} MiB ({bytes_colunar / args.linhas:.0f} B/linha)")
+    print(f"redução: {bytes_objetos / bytes_colunar:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
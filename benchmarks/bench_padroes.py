@@ -0,0 +1,61 @@
+# mede a detecção de recorrências e gastos atípicos (padroes.detectar_padroes) em históricos sintéticos
+# grandes e confere se as cobranças periódicas injetadas pelo gerador (RECORRENTES) são encontradas
+# uso: python benchmarks/bench_padroes.py [--linhas 100000 1000000] [--formato simples|nubank] [--dias 1095] [--repeticoes 3]
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from gerador_extratos import FORMATOS, RECORRENTES, gerar_extrato  # noqa: E402
+
+PERIODICIDADES = {7: 'semanal', 30: 'mensal', 365: 'anual'}
+
+
+def medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos), resultado
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--linhas', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--formato', choices=FORMATOS, default='simples')
+    parser.add_argument('--dias', type=int, default=1095, help='extensão do histórico (o anual precisa de 3 anos)')
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    from app import CarteiraFinanceira
+    from padroes import detectar_padroes
+
+    with tempfile.TemporaryDirectory() as pasta:
+        for linhas in args.linhas:
+            caminho = gerar_extrato(os.path.join(pasta, f'{linhas}.csv'), linhas, dias=args.dias,
+                                    formato=args.formato, recorrentes=True)
+            carteira = CarteiraFinanceira()
+            inicio = time.perf_counter()
+            carteira.importar_csv(caminho)
+            tempo_importacao = time.perf_counter() - inicio
+            df = carteira.obter_dataframe()
+            tempo, padroes = medir(lambda: detectar_padroes(df), args.repeticoes)
+
+            encontradas = {(r['descricao'], r['periodicidade']) for r in padroes['recorrentes']}
+            faltando = [descricao for descricao, _, intervalo in RECORRENTES
+                        if (descricao, PERIODICIDADES[intervalo]) not in encontradas]
+            print(f"{len(df):>9} transações: importar_csv {tempo_importacao:7.2f}s | detectar_padroes {tempo:6.3f}s "
+                  f"({1e6 * tempo / len(df):.2f} µs/transação)")
+            print(f"  recorrências injetadas encontradas: {len(RECORRENTES) - len(faltando)}/{len(RECORRENTES)}"
+                  + (f" (faltando: {', '.join(faltando)})" if faltando else ""))
+            print(f"  recorrências detectadas: {len(padroes['recorrentes'])} | atípicas: {len(padroes['transacoes_atipicas'])}"
+                  f" | picos por categoria: {len(padroes['picos_categoria'])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# compara o pdf completo (pngs do matplotlib gravados e relidos) com o pdf rápido (vetorial, em memória)
+# mede o tempo de montagem e o tamanho do arquivo para extratos com cada vez mais meses
+# uso: python benchmarks/bench_pdf.py [--anos 1 5 20] [--linhas 50000]
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from app import OUTPUT_FOLDER, CarteiraFinanceira, RelatorioFinanceiro  # noqa: E402
+from gerador_extratos import gerar_extrato  # noqa: E402
+
+
+def medir_completo(carteira, id_relatorio):
+    #mesmo caminho do /analisar: gráficos em png e pdf que os relê do disco
+    relatorio = RelatorioFinanceiro(carteira, id_relatorio)
+    inicio = time.perf_counter()
+    relatorio.iniciar_graficos()
+    relatorio.exportar_pdf()
+    duracao = time.perf_counter() - inicio
+    tamanho = os.path.getsize(os.path.join(relatorio.pasta_saida, 'relatorio_completo.pdf'))
+    shutil.rmtree(relatorio.pasta_saida, ignore_errors=True)
+    return duracao, tamanho
+
+
+def medir_rapido(carteira, id_relatorio):
+    relatorio = RelatorioFinanceiro(carteira, id_relatorio)
+    inicio = time.perf_counter()
+    conteudo = relatorio.exportar_pdf_rapido()
+    duracao = time.perf_counter() - inicio
+    shutil.rmtree(relatorio.pasta_saida, ignore_errors=True)
+    return duracao, len(conteudo)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--anos', type=int, nargs='+', default=[1, 5, 20])
+    parser.add_argument('--linhas', type=int, default=50_000)
+    args = parser.parse_args()
+
+    print(f"{'anos':>5} {'meses':>6} {'completo (s)':>13} {'KB':>8} {'rápido (s)':>11} {'KB':>8} {'ganho':>7}")
+    with tempfile.TemporaryDirectory() as pasta:
+        for anos in args.anos:
+            caminho = gerar_extrato(os.path.join(pasta, f'extrato_{anos}.csv'), args.linhas, dias=365 * anos)
+            carteira = CarteiraFinanceira()
+            carteira.importar_csv(caminho)
+            meses = len(RelatorioFinanceiro(carteira, f'bench-pdf-{anos}').gerar_relatorio_mensal())
+            shutil.rmtree(os.path.join(OUTPUT_FOLDER, f'bench-pdf-{anos}'), ignore_errors=True)
+
+            if anos == args.anos[0]:
+                medir_completo(carteira, f'bench-pdf-{anos}') #sobe o pool de gráficos antes de medir
+            tempo_completo, tamanho_completo = medir_completo(carteira, f'bench-pdf-{anos}')
+            tempo_rapido, tamanho_rapido = medir_rapido(carteira, f'bench-pdf-{anos}')
+            print(f"{anos:>5} {meses:>6} {tempo_completo:>13.3f} {tamanho_completo / 1024:>8.1f} "
+                  f"{tempo_rapido:>11.3f} {tamanho_rapido / 1024:>8.1f} {tempo_completo / tempo_rapido:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
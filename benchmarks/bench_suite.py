@@ -0,0 +1,217 @@
+# suíte de benchmarks reprodutível: gera extratos sintéticos (formato simples e do nubank) e mede
+# importar_csv, _categorizar_transacao, cada método do RelatorioFinanceiro e o /analisar completo
+# pelo test client do Flask. os resultados vão para benchmarks/resultados/<data>-<commit>.json e
+# duas execuções (ex.: de commits diferentes) podem ser comparadas com --comparar
+# uso: python benchmarks/bench_suite.py [--formatos simples nubank] [--tamanhos 10000 100000]
+#          [--codificacoes utf-8 latin1] [--separadores , ;] [--repeticoes 3] [--sem-artefatos]
+#      python benchmarks/bench_suite.py --comparar resultados/base.json [resultados/novo.json] [--tolerancia 0.10] [--minimo-ms 1]
+import argparse
+import io
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+PASTA_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+PASTA_RESULTADOS = os.path.join(PASTA_BENCHMARKS, 'resultados')
+sys.path.insert(0, os.path.join(PASTA_BENCHMARKS, '..', 'backend'))
+
+from gerador_extratos import FORMATOS, gerar_extrato  # noqa: E402
+
+
+def cronometrar(funcao, repeticoes, preparar=None):
+    #executa a função `repeticoes` vezes; `preparar` monta o argumento fora do tempo medido
+    tempos = []
+    for _ in range(repeticoes):
+        argumento = preparar() if preparar else None
+        inicio = time.perf_counter()
+        funcao(argumento) if preparar else funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return {'mediana': statistics.median(tempos), 'minimo': min(tempos), 'repeticoes': repeticoes}
+
+
+def commit_atual():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PASTA_BENCHMARKS,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        sujo = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=PASTA_BENCHMARKS,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconhecido'
+    return commit + ('-modificado' if sujo else '')
+
+
+def medir_cenario(servidor, caminho, repeticoes, artefatos, gerar_variante):
+    medidas = {}
+    tamanho = os.path.getsize(caminho)
+
+    def importar(_=None):
+        carteira = servidor.CarteiraFinanceira()
+        carteira.importar_csv(caminho)
+        return carteira
+
+    medidas['importar_csv'] = cronometrar(importar, repeticoes)
+    carteira = importar()
+    linhas = len(carteira.transacoes)
+    for etapa, segundos in carteira.tempos_etapas.items():
+        medidas[f'importar_csv.{etapa}'] = {'mediana': segundos, 'minimo': segundos, 'repeticoes': 1}
+
+    #categorização chamada linha a linha: com o cache vazio (motor novo) e já aquecido
+    descricoes = carteira.obter_dataframe()['Descrição'].tolist()
+    def categorizar_todas(carteira_medida):
+        for descricao in descricoes:
+            carteira_medida._categorizar_transacao(descricao)
+    motor_novo = lambda: servidor.CarteiraFinanceira(servidor.MotorCategorizacao.de_arquivo(servidor.ARQUIVO_REGRAS))
+    medidas['_categorizar_transacao.frio'] = cronometrar(categorizar_todas, repeticoes, preparar=motor_novo)
+    aquecida = motor_novo()
+    categorizar_todas(aquecida)
+    medidas['_categorizar_transacao.quente'] = cronometrar(categorizar_todas, repeticoes, preparar=lambda: aquecida)
+
+    #métodos do relatório; cada repetição usa um relatório novo (os resumos são memorizados)
+    ids = []
+    def novo_relatorio():
+        ids.append(f"bench-suite-{servidor.novo_id_relatorio()}")
+        return servidor.RelatorioFinanceiro(carteira, ids[-1])
+
+    medidas['RelatorioFinanceiro.__init__'] = cronometrar(lambda _: novo_relatorio(), repeticoes, preparar=lambda: None)
+    for metodo in ('gerar_relatorio_mensal', 'gerar_resumo_categorias', 'gerar_kpis', 'gerar_padroes',
+                   'salvar_agregados', 'salvar_transacoes', 'exportar_pdf_rapido'):
+        medidas[f'RelatorioFinanceiro.{metodo}'] = cronometrar(lambda r, m=metodo: getattr(r, m)(), repeticoes, preparar=novo_relatorio)
+    if artefatos:
+        servidor.RelatorioFinanceiro(carteira, novo_relatorio().id_relatorio).gerar_graficos() #sobe o pool de gráficos fora da medida
+        for metodo in ('gerar_graficos', 'exportar_pdf'):
+            medidas[f'RelatorioFinanceiro.{metodo}'] = cronometrar(lambda r, m=metodo: getattr(r, m)(), repeticoes, preparar=novo_relatorio)
+    for id_relatorio in ids:
+        shutil.rmtree(os.path.join(servidor.OUTPUT_FOLDER, id_relatorio), ignore_errors=True)
+
+    #/analisar completo pelo test client: cada repetição envia um extrato diferente do mesmo tamanho,
+    #para não sair do cache de resultados; a última resposta é reenviada para medir o acerto no cache
+    cliente = servidor.app.test_client()
+    enviados = []
+    def enviar(conteudo, consulta=None):
+        resposta = cliente.post('/analisar', query_string=consulta or {},
+                                data={'planilha': (io.BytesIO(conteudo), 'extrato.csv')}, content_type='multipart/form-data')
+        if resposta.status_code != 200:
+            raise RuntimeError(f"/analisar respondeu {resposta.status_code}: {resposta.get_data(as_text=True)[:200]}")
+        enviados.append(resposta.get_json()['urls']['pdf_completo'].split('/')[2])
+
+    variantes = iter(range(1, 10_000))
+    def ler_variante():
+        with open(gerar_variante(next(variantes)), 'rb') as f:
+            return f.read()
+
+    medidas['/analisar'] = cronometrar(enviar, repeticoes, preparar=ler_variante)
+    if artefatos:
+        medidas['/analisar?artefatos=1'] = cronometrar(lambda c: enviar(c, {'artefatos': 1}), repeticoes, preparar=ler_variante)
+    with open(caminho, 'rb') as f:
+        conteudo = f.read()
+    enviar(conteudo)
+    medidas['/analisar.cache'] = cronometrar(enviar, repeticoes, preparar=lambda: conteudo)
+
+    for id_relatorio in set(enviados):
+        shutil.rmtree(os.path.join(servidor.OUTPUT_FOLDER, id_relatorio), ignore_errors=True)
+    return {'linhas': linhas, 'bytes': tamanho, 'medidas': medidas}
+
+
+def executar(args):
+    import app as servidor
+    resultados = {}
+    uploads_antes = set(os.listdir(servidor.UPLOAD_FOLDER))
+    with tempfile.TemporaryDirectory() as pasta:
+        for formato, tamanho, codificacao, separador in itertools.product(args.formatos, args.tamanhos, args.codificacoes, args.separadores):
+            nome = f"{formato}-{tamanho}-{codificacao}-{'virgula' if separador == ',' else 'ponto_virgula' if separador == ';' else repr(separador)}"
+            def gerar(semente, nome=nome, formato=formato, tamanho=tamanho, codificacao=codificacao, separador=separador):
+                return gerar_extrato(os.path.join(pasta, f'{nome}-{semente}.csv'), tamanho, semente=args.semente + semente,
+                                     separador=separador, codificacao=codificacao, formato=formato)
+            inicio = time.perf_counter()
+            resultados[nome] = medir_cenario(servidor, gerar(0), args.repeticoes, not args.sem_artefatos, gerar)
+            print(f"{nome}: {time.perf_counter() - inicio:.1f}s")
+            for medida, valores in resultados[nome]['medidas'].items():
+                print(f"  {medida:<46} {valores['mediana'] * 1000:>11.2f} ms")
+    #uploads gravados pelo /analisar durante a suíte
+    for arquivo in set(os.listdir(servidor.UPLOAD_FOLDER)) - uploads_antes:
+        os.remove(os.path.join(servidor.UPLOAD_FOLDER, arquivo))
+
+    execucao = {
+        'commit': commit_atual(),
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'processador': platform.processor() or platform.machine(),
+        'nucleos': os.cpu_count(),
+        'parametros': {k: v for k, v in vars(args).items() if k not in ('comparar', 'saida')},
+        'cenarios': resultados,
+    }
+    saida = args.saida or os.path.join(PASTA_RESULTADOS, f"{datetime.now():%Y%m%d-%H%M%S}-{execucao['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, 'w', encoding='utf-8') as f:
+        json.dump(execucao, f, ensure_ascii=False, indent=2)
+    print(f"resultados gravados em {saida}")
+    return saida
+
+
+def comparar(caminho_base, caminho_novo, tolerancia, minimo_ms=1.0):
+    #compara as medianas cenário a cenário; devolve quantas medidas ficaram mais lentas que a tolerância
+    #diferenças abaixo de minimo_ms são ruído de medição e não contam como regressão nem melhora
+    with open(caminho_base, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(caminho_novo, encoding='utf-8') as f:
+        novo = json.load(f)
+    print(f"base: {base['commit']} ({base['data']})  novo: {novo['commit']} ({novo['data']})")
+    if (base['plataforma'], base['nucleos']) != (novo['plataforma'], novo['nucleos']):
+        print("aviso: as execuções foram feitas em máquinas diferentes")
+    regressoes = 0
+    for cenario in sorted(set(base['cenarios']) & set(novo['cenarios'])):
+        print(cenario)
+        medidas_base = base['cenarios'][cenario]['medidas']
+        medidas_novo = novo['cenarios'][cenario]['medidas']
+        for medida in medidas_base:
+            if medida not in medidas_novo:
+                continue
+            antes, depois = medidas_base[medida]['mediana'], medidas_novo[medida]['mediana']
+            razao = depois / antes if antes > 0 else float('inf')
+            marca = ''
+            if abs(depois - antes) * 1000 < minimo_ms:
+                pass
+            elif razao > 1 + tolerancia:
+                marca = '  <- regressão'
+                regressoes += 1
+            elif razao < 1 - tolerancia:
+                marca = '  <- melhora'
+            print(f"  {medida:<46} {antes * 1000:>11.2f} ms {depois * 1000:>11.2f} ms {razao:>7.2f}x{marca}")
+    print(f"{regressoes} medida(s) mais lentas que a tolerância de {tolerancia:.0%}")
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--formatos', nargs='+', choices=FORMATOS, default=list(FORMATOS))
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--codificacoes', nargs='+', default=['utf-8'])
+    parser.add_argument('--separadores', nargs='+', default=[','])
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--sem-artefatos', action='store_true', help='não mede gráficos e pdf completo (bem mais rápido)')
+    parser.add_argument('--saida', help='arquivo json dos resultados (padrão: benchmarks/resultados/<data>-<commit>.json)')
+    parser.add_argument('--comparar', nargs='+', metavar='JSON',
+                        help='compara dois resultados; com um só, roda a suíte e compara a execução nova com ele')
+    parser.add_argument('--tolerancia', type=float, default=0.10, help='aumento relativo da mediana considerado regressão')
+    parser.add_argument('--minimo-ms', type=float, default=1.0, help='diferença absoluta mínima para contar como regressão')
+    args = parser.parse_args()
+
+    if args.comparar and len(args.comparar) >= 2:
+        sys.exit(1 if comparar(args.comparar[0], args.comparar[1], args.tolerancia, args.minimo_ms) else 0)
+    saida = executar(args)
+    if args.comparar:
+        sys.exit(1 if comparar(args.comparar[0], saida, args.tolerancia, args.minimo_ms) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+# dispara N chamadas simultâneas ao /analisar pelo test client do Flask e confere cada relatório:
+# ids distintos, kpis iguais aos de uma importação sequencial do mesmo csv e artefatos íntegros (png/pdf)
+# uso: python benchmarks/carga_analisar.py [--requisicoes 16] [--linhas 2000] [--artefatos]
+import argparse
+import hashlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+import app as servidor  # noqa: E402
+from gerador_extratos import gerar_extrato  # noqa: E402
+
+ASSINATURAS = {'.png': b'\x89PNG\r\n\x1a\n', '.pdf': b'%PDF'}
+
+
+def kpis_esperados(caminho):
+    #referência calculada fora da carga, no próprio processo e sem concorrência
+    carteira = servidor.CarteiraFinanceira()
+    carteira.importar_csv(caminho)
+    kpis = servidor.AgregadosFinanceiros.de_dataframe(carteira.obter_dataframe()).kpis()
+    return kpis['receita_total'], kpis['despesa_total']
+
+
+def conferir(cliente, resposta, esperado):
+    #devolve a lista de problemas encontrados no relatório
+    problemas = []
+    receita, despesa = esperado
+    kpis = resposta['kpis']
+    if abs(kpis['receita_total'] - receita) > 0.01 or abs(kpis['despesa_total'] - despesa) > 0.01:
+        problemas.append(f"kpis divergentes: {kpis['receita_total']:.2f}/{kpis['despesa_total']:.2f} != {receita:.2f}/{despesa:.2f}")
+    for nome, url in resposta['urls'].items():
+        artefato = cliente.get(url)
+        conteudo = artefato.get_data()
+        extensao = os.path.splitext(url)[1]
+        if artefato.status_code != 200:
+            problemas.append(f"{nome}: status {artefato.status_code}")
+        elif not conteudo.startswith(ASSINATURAS[extensao]):
+            problemas.append(f"{nome}: conteúdo não é {extensao}")
+        elif extensao == '.pdf' and b'%%EOF' not in conteudo[-1024:]:
+            problemas.append(f"{nome}: pdf truncado")
+    return problemas
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requisicoes', type=int, default=16)
+    parser.add_argument('--linhas', type=int, default=2_000)
+    parser.add_argument('--artefatos', action='store_true', help='gera gráficos e pdf durante a análise (?artefatos=1)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        #sementes distintas: conteúdos diferentes, para nenhuma requisição sair do cache
+        semente_base = time.time_ns() % 1_000_000
+        caminhos = [gerar_extrato(os.path.join(pasta, f'extrato_{i}.csv'), args.linhas, semente=semente_base + i)
+                    for i in range(args.requisicoes)]
+        esperados = [kpis_esperados(c) for c in caminhos]
+        hashes = [hashlib.sha256(open(c, 'rb').read()).hexdigest() for c in caminhos]
+
+        barreira = threading.Barrier(args.requisicoes)
+        respostas = [None] * args.requisicoes
+
+        def enviar(indice):
+            cliente = servidor.app.test_client()
+            with open(caminhos[indice], 'rb') as f:
+                dados = f.read()
+            barreira.wait() #todas as requisições começam juntas
+            inicio = time.perf_counter()
+            resposta = cliente.post('/analisar', query_string={'artefatos': int(args.artefatos)},
+                                    data={'planilha': (io.BytesIO(dados), f'extrato_{indice}.csv')},
+                                    content_type='multipart/form-data')
+            respostas[indice] = (resposta.status_code, resposta.get_json(), time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        threads = [threading.Thread(target=enviar, args=(i,)) for i in range(args.requisicoes)]
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+        duracao = time.perf_counter() - inicio
+
+    cliente = servidor.app.test_client()
+    ids = set()
+    falhas = 0
+    for indice, (status, corpo, tempo) in enumerate(respostas):
+        if status != 200:
+            print(f"[{indice}] status {status}: {corpo}")
+            falhas += 1
+            continue
+        id_relatorio = corpo['urls']['pdf_completo'].split('/')[2]
+        problemas = conferir(cliente, corpo, esperados[indice])
+        if id_relatorio in ids:
+            problemas.append(f"id repetido: {id_relatorio}")
+        ids.add(id_relatorio)
+        if problemas:
+            falhas += 1
+            print(f"[{indice}] {id_relatorio}: " + '; '.join(problemas))
+
+    for id_relatorio in ids:
+        shutil.rmtree(os.path.join(servidor.OUTPUT_FOLDER, id_relatorio), ignore_errors=True)
+    for hash_conteudo in hashes:
+        if os.path.exists(servidor.ARMAZENAMENTO.caminho_upload(hash_conteudo)):
+            os.remove(servidor.ARMAZENAMENTO.caminho_upload(hash_conteudo))
+    tempos = sorted(t for _, _, t in respostas)
+    print(f"{args.requisicoes} requisições simultâneas em {duracao:.2f}s "
+          f"(mediana {tempos[len(tempos) // 2]:.2f}s, máx {tempos[-1]:.2f}s); relatórios com problema: {falhas}")
+    sys.exit(1 if falhas else 0)
+
+
+if __name__ == '__main__':
+    main()
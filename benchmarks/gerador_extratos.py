@@ -0,0 +1,73 @@
+# gera extratos bancários sintéticos para os benchmarks
+import random
+import uuid
+from datetime import date, timedelta
+
+DESCRICOES = [
+    ('Salário Mensal', 5000.0), ('ifood almoço', -45.3), ('Uber viagem', -23.9), ('Supermercado', -350.5),
+    ('Aluguel', -1500.0), ('Conta de luz', -180.2), ('Netflix', -39.9), ('Spotify', -21.9),
+    ('Farmacia São Paulo', -62.4), ('Posto Shell', -200.0), ('Venda de item usado', 150.0),
+    ('Cinema', -48.0), ('Padaria do bairro', -12.5), ('Transferência recebida', 300.0), ('Compra online', -89.9),
+]
+
+#descrições no estilo da exportação da conta do nubank (Data,Valor,Identificador,Descrição)
+DESCRICOES_NUBANK = [
+    ('Transferência recebida pelo Pix - {nome} - CAIXA ECONOMICA FEDERAL (0104) Agência: {agencia} Conta: {conta}', 250.0),
+    ('Transferência enviada pelo Pix - {nome} - NU PAGAMENTOS - IP (0260) Agência: 1 Conta: {conta}', -80.0),
+    ('Compra no débito - Pgo*{loja}', -32.5), ('Compra no débito - Ifood *{loja}', -54.9),
+    ('Compra no débito - Uber *Trip', -19.8), ('Compra no débito - Posto {loja}', -150.0),
+    ('Compra no débito - Supermercado {loja}', -210.3), ('Pagamento de boleto efetuado - {loja}', -120.0),
+    ('Pagamento da fatura - Cartão Nubank', -900.0), ('Resgate RDB', 400.0), ('Aplicação RDB', -400.0),
+    ('Transferência Recebida - {nome}', 3200.0),
+]
+NOMES = ['MARIA DA SILVA', 'JOAO SANTOS', 'ANA PAULA SOUZA', 'CARLOS OLIVEIRA', 'FERNANDA LIMA', 'PEDRO ALVES']
+LOJAS = ['Mercado Bom Preco', 'Shell Ondina', 'Padaria Central', 'Farmacia Pague Menos', 'Restaurante Sabor', 'Coelba']
+
+#cobranças e entradas periódicas misturadas ao extrato com recorrentes=True: (descrição, valor, dias entre ocorrências)
+RECORRENTES = [
+    ('Salário Empresa Exemplo LTDA', 5200.0, 30), ('Aluguel Apartamento 302', -1650.0, 30),
+    ('Assinatura Netflix.com', -55.9, 30), ('Spotify Premium', -21.9, 30), ('Academia Smart Fit', -109.9, 30),
+    ('Diarista Dona Maria', -180.0, 7), ('IPVA Parcela Anual', -1850.0, 365), ('Plano de Saúde Unimed', -480.0, 30),
+]
+
+FORMATOS = ('simples', 'nubank')
+
+
+def gerar_extrato(caminho, linhas, semente=42, separador=',', codificacao='utf-8', dias=730, formato='simples', recorrentes=False):
+    #escreve um csv no formato data,descricao,valor (formato='simples') ou no da exportação do
+    #nubank (formato='nubank'), sempre com datas dia/mês/ano
+    #com separador ';' os valores usam vírgula decimal, como nos extratos brasileiros
+    #as datas ficam espalhadas pelos `dias` seguintes a 01/01/2023
+    #com recorrentes=True as linhas de RECORRENTES são acrescentadas nos seus intervalos (com ±1 dia de folga)
+    if formato not in FORMATOS:
+        raise ValueError(f"formato desconhecido: {formato}")
+    rnd = random.Random(semente)
+    inicio = date(2023, 1, 1)
+    with open(caminho, 'w', encoding=codificacao, newline='') as f:
+        if formato == 'nubank':
+            f.write(separador.join(['Data', 'Valor', 'Identificador', 'Descrição']) + '\n')
+        else:
+            f.write(separador.join(['data', 'descricao', 'valor']) + '\n')
+        periodicas = [(descricao, base, d) for descricao, base, intervalo in (RECORRENTES if recorrentes else [])
+                      for d in range(rnd.randrange(intervalo), dias, intervalo)]
+        for i in range(linhas + len(periodicas)):
+            dia = inicio + timedelta(days=rnd.randrange(dias))
+            if i >= linhas:
+                descricao, base, d = periodicas[i - linhas]
+                dia = inicio + timedelta(days=min(max(d + rnd.randint(-1, 1), 0), dias - 1))
+            elif formato == 'nubank':
+                modelo, base = rnd.choice(DESCRICOES_NUBANK)
+                descricao = modelo.format(nome=rnd.choice(NOMES), loja=rnd.choice(LOJAS),
+                                          agencia=rnd.randrange(1000, 9999), conta=f"{rnd.randrange(10**8):08d}-{rnd.randrange(10)}")
+            else:
+                descricao, base = rnd.choice(DESCRICOES)
+            valor = f"{round(base * (rnd.uniform(0.5, 1.5) if i < linhas else 1), 2):.2f}"
+            if separador == ';':
+                valor = valor.replace('.', ',')
+            if formato == 'nubank':
+                identificador = str(uuid.UUID(int=rnd.getrandbits(128), version=4))
+                campos = [f"{dia:%d/%m/%Y}", valor, identificador, descricao]
+            else:
+                campos = [f"{dia:%d/%m/%Y}", descricao, valor]
+            f.write(separador.join(campos) + '\n')
+    return caminho
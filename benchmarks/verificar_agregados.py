@@ -0,0 +1,126 @@
+# confere que os resumos do relatório (AgregadosFinanceiros: balanço mensal, categorias, kpis e as séries
+# dos gráficos) são os mesmos do cálculo antigo, feito método a método sobre o dataframe, e que os três
+# caminhos de importação (modo='colunar', modo='linhas' e streaming) chegam aos mesmos agregados
+# roda sobre os extratos de exemplo do repositório e sobre extratos sintéticos nos dois formatos e
+# separadores; termina com código 1 se alguma conferência falhar
+# uso: python benchmarks/verificar_agregados.py [--linhas 20000] [--semente 42]
+import argparse
+import glob
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+PASTA_RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(PASTA_RAIZ, 'backend'))
+
+from gerador_extratos import FORMATOS, gerar_extrato  # noqa: E402
+
+
+def resumos_antigos(df):
+    #cálculo de antes do AgregadosFinanceiros único: um filtro/groupby por método do relatório
+    df_copy = df.copy()
+    df_copy['Mês'] = df_copy['Data'].dt.to_period('M').astype(str)
+    mensal = df_copy.groupby(['Mês', 'Tipo'])['Valor'].sum().unstack().fillna(0)
+    if 'Receita' not in mensal: mensal['Receita'] = 0
+    if 'Despesa' not in mensal: mensal['Despesa'] = 0
+    despesas = df[df['Tipo'] == 'Despesa']
+    categorias = despesas.groupby('Categoria', observed=True)['Valor'].sum().abs().sort_values(ascending=False).to_dict()
+    receita_total = df[df['Tipo'] == 'Receita']['Valor'].sum()
+    despesa_total = df[df['Tipo'] == 'Despesa']['Valor'].sum()
+    saldo_final = receita_total + despesa_total
+    return {
+        'resumo_mensal': mensal,
+        'resumo_categorias': categorias,
+        'kpis': {'receita_total': receita_total, 'despesa_total': despesa_total, 'saldo_final': saldo_final,
+                 'taxa_poupanca': (saldo_final / receita_total) * 100 if receita_total > 0 else 0},
+        'totais_por_tipo': df.groupby('Tipo')['Valor'].sum().abs(),
+        'despesas_por_categoria': despesas.groupby('Categoria', observed=True)['Valor'].sum().abs().sort_values(),
+    }
+
+
+def resumos_novos(agregados):
+    return {
+        'resumo_mensal': agregados.resumo_mensal(),
+        'resumo_categorias': agregados.resumo_categorias(),
+        'kpis': agregados.kpis(),
+        'totais_por_tipo': agregados.totais_por_tipo(),
+        'despesas_por_categoria': agregados.despesas_por_categoria(),
+    }
+
+
+def diferencas(esperado, obtido, exato):
+    #nomes dos resumos que diferem; sem `exato` aceita só a diferença de ordem de soma dos floats
+    def iguais(a, b):
+        if isinstance(a, pd.DataFrame):
+            b = b.reindex(columns=a.columns)
+            return list(a.index) == list(b.index) and iguais(a.to_numpy().ravel().tolist(), b.to_numpy().ravel().tolist())
+        if isinstance(a, pd.Series):
+            return list(a.index) == list(b.index) and iguais(a.tolist(), b.tolist())
+        if isinstance(a, dict):
+            return list(a) == list(b) and iguais(list(a.values()), list(b.values()))
+        a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+        return a.shape == b.shape and (np.array_equal(a, b) if exato else np.allclose(a, b, rtol=1e-12, atol=1e-6))
+    return [nome for nome in esperado if not iguais(esperado[nome], obtido[nome])]
+
+
+def conferir(caminho, descricao):
+    from agregacao import AgregadosFinanceiros
+    from app import CarteiraFinanceira
+    por_modo = {}
+    for modo in ('colunar', 'linhas'):
+        carteira = CarteiraFinanceira()
+        carteira.importar_csv(caminho, modo=modo)
+        por_modo[modo] = carteira.obter_dataframe()
+    novos = resumos_novos(AgregadosFinanceiros.de_dataframe(por_modo['colunar']))
+
+    falhas = []
+    for nome in diferencas(resumos_antigos(por_modo['colunar']), novos, exato=False):
+        falhas.append(f"{nome}: agregados diferentes do cálculo antigo")
+    for nome in diferencas(novos, resumos_novos(AgregadosFinanceiros.de_dataframe(por_modo['linhas'])), exato=True):
+        falhas.append(f"{nome}: modo='linhas' diferente de modo='colunar'")
+    streaming = CarteiraFinanceira().importar_csv_streaming(caminho, linhas_por_bloco=7_000)
+    for nome in diferencas(novos, resumos_novos(streaming), exato=True):
+        falhas.append(f"{nome}: streaming diferente de modo='colunar'")
+    print(f"{descricao} ({len(por_modo['colunar'])} transações): {'ok' if not falhas else ''}")
+    for falha in falhas:
+        print(f"  {falha}")
+    return len(falhas)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--linhas', type=int, default=20_000, help='linhas dos extratos sintéticos')
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    falhas = 0
+    exemplos = sorted(glob.glob(os.path.join(PASTA_RAIZ, 'exemplos', '*.csv')))
+    exemplos.append(os.path.join(PASTA_RAIZ, 'transacoes_com_receitas.csv'))
+    vistos = set()
+    for caminho in exemplos:
+        with open(caminho, 'rb') as f:
+            conteudo = f.read()
+        if conteudo in vistos: #os extratos de exemplo se repetem
+            continue
+        vistos.add(conteudo)
+        falhas += conferir(caminho, os.path.basename(caminho))
+    with tempfile.TemporaryDirectory() as pasta:
+        for formato in FORMATOS:
+            for separador in (',', ';'):
+                caminho = gerar_extrato(os.path.join(pasta, 'extrato.csv'), args.linhas, semente=args.semente,
+                                        separador=separador, formato=formato)
+                falhas += conferir(caminho, f"sintético {formato} separador {separador!r}")
+        #vírgula decimal sem nenhum valor com casas: o ponto é milhar e o pandas sozinho leria 1.500 como 1,5
+        caminho = os.path.join(pasta, 'milhar.csv')
+        with open(caminho, 'w', encoding='utf-8') as f:
+            f.write('data;descricao;valor\n01/02/2024;Salario;1.500\n02/02/2024;Mercado;-200\n03/02/2024;Aluguel;-1.250\n')
+        falhas += conferir(caminho, "vírgula decimal com milhar sem casas")
+    print("ok" if falhas == 0 else f"{falhas} falha(s)")
+    sys.exit(1 if falhas else 0)
+
+
+if __name__ == '__main__':
+    main()
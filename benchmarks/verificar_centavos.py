@@ -0,0 +1,145 @@
+# confere a aritmética em centavos contra Decimal: conversão de textos aleatórios (dinheiro.py), totais
+# de extratos sintéticos nos três caminhos de importação (colunar, linhas e streaming) e os limites de
+# valor das consultas filtradas; inclui os casos que já quebraram (1.500 em arquivo de vírgula decimal,
+# valor_max=0.29). termina com código 1 se alguma conferência falhar
+# uso: python benchmarks/verificar_centavos.py [--amostras 200000] [--linhas 20000] [--semente 7]
+import argparse
+import os
+import random
+import sys
+import tempfile
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from gerador_extratos import gerar_extrato  # noqa: E402
+
+
+def texto_aleatorio(rnd, decimal):
+    #valores como aparecem em extratos: sinal, milhar, R$, de 0 a 20 casas, meios centavos e lixo
+    sinal = rnd.choice(['', '-', '+'])
+    inteiro = rnd.choice([0, rnd.randrange(10), rnd.randrange(1000), rnd.randrange(10**7), rnd.randrange(10**13)])
+    casas = rnd.choice([0, 1, 2, 2, 2, 3, 5, 20])
+    fracao = ''.join(rnd.choice('0123456789') for _ in range(casas))
+    if casas >= 3 and rnd.random() < 0.2:
+        fracao = fracao[:2] + '5' + '0' * rnd.randrange(3) #exatamente meio centavo
+    milhar = '.' if decimal == ',' else ','
+    parte_inteira = f"{inteiro:,}".replace(',', milhar) if rnd.random() < 0.5 else str(inteiro)
+    texto = sinal + parte_inteira + (decimal + fracao if casas else '')
+    if rnd.random() < 0.1:
+        texto = 'R$ ' + texto
+    if rnd.random() < 0.05:
+        texto = rnd.choice(['abc', '', '1,2,3x', '--1', 'nan', 'inf'])
+    return texto
+
+
+def centavos_referencia(texto, decimal):
+    #Decimal direto do texto, meio centavo para longe do zero; None se não for um número
+    texto = texto.replace('R$', '').replace(' ', '').replace('.' if decimal == ',' else ',', '').replace(',', '.')
+    try:
+        valor = Decimal(texto)
+    except InvalidOperation:
+        return None
+    if not valor.is_finite():
+        return None
+    return int((valor * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def conferir_conversao(amostras, semente):
+    from dinheiro import centavos_de_serie, centavos_de_texto
+    rnd = random.Random(semente)
+    falhas = 0
+    for decimal in (',', '.'):
+        textos = [texto_aleatorio(rnd, decimal) for _ in range(amostras)]
+        centavos, validas = centavos_de_serie(pd.Series(textos, dtype=object), decimal)
+        for texto, obtido, valido in zip(textos, centavos.tolist(), validas.tolist()):
+            esperado = centavos_referencia(texto, decimal)
+            escalar = None
+            if esperado is not None:
+                escalar = centavos_de_texto(texto, decimal)
+            if (esperado is None) == valido or (esperado is not None and (obtido != esperado or escalar != esperado)):
+                falhas += 1
+                if falhas <= 10:
+                    print(f"  {texto!r} (decimal {decimal!r}): esperado {esperado}, série {obtido if valido else None}, texto {escalar}")
+    print(f"conversão de {2 * amostras} textos: {falhas} falha(s)")
+    return falhas
+
+
+def totais_importados(caminho, modo):
+    from agregacao import AgregadosFinanceiros
+    from app import CarteiraFinanceira
+    carteira = CarteiraFinanceira()
+    if modo == 'streaming':
+        return carteira.importar_csv_streaming(caminho, linhas_por_bloco=7_000).kpis()
+    carteira.importar_csv(caminho, modo=modo)
+    return AgregadosFinanceiros.de_dataframe(carteira.obter_dataframe()).kpis()
+
+
+def conferir_arquivo(caminho, separador, decimal, descricao):
+    #receita e despesa de cada caminho de importação contra a soma em Decimal do texto bruto
+    brutos = pd.read_csv(caminho, sep=separador, dtype=str)['valor'].tolist()
+    centavos = [centavos_referencia(v, decimal) for v in brutos]
+    receita = Decimal(sum(c for c in centavos if c > 0)) / 100
+    despesa = Decimal(sum(c for c in centavos if c <= 0)) / 100
+    falhas = 0
+    for modo in ('colunar', 'linhas', 'streaming'):
+        kpis = totais_importados(caminho, modo)
+        if (kpis['receita_total'], kpis['despesa_total']) != (float(receita), float(despesa)):
+            falhas += 1
+            print(f"  {descricao} ({modo}): receita {kpis['receita_total']} despesa {kpis['despesa_total']}, "
+                  f"esperado {receita} / {despesa}")
+    print(f"{descricao}: {falhas} falha(s)")
+    return falhas
+
+
+def conferir_consultas(semente):
+    #valor_min/valor_max em reais contra o filtro feito em Decimal sobre as mesmas transações
+    from consulta_transacoes import IndiceTransacoes
+    rnd = np.random.default_rng(semente)
+    n = 5_000
+    datas = (np.datetime64('2024-01-01', 'ns') + rnd.integers(0, 365, n).astype('timedelta64[D]')).view(np.int64)
+    centavos = rnd.integers(-500, 500, n)
+    indice = IndiceTransacoes(datas, centavos, rnd.integers(0, 3, n).astype(np.int16), ['A', 'B', 'C'])
+    absolutos = [Decimal(abs(int(c))) / 100 for c in centavos]
+    limites = [('0.29', '0.29'), (None, '0.29'), ('0.29', None), ('1.005', '2.995'), ('0', '0')]
+    limites += [(f"{rnd.integers(0, 500) / 100}", f"{rnd.integers(0, 500) / 100 + 0.005:.3f}") for _ in range(50)]
+    falhas = 0
+    for minimo, maximo in limites:
+        esperado = sum(1 for a in absolutos if (minimo is None or a >= Decimal(minimo)) and (maximo is None or a <= Decimal(maximo)))
+        obtido = indice.consultar(valor_min=None if minimo is None else float(minimo),
+                                  valor_max=None if maximo is None else float(maximo))['transacoes']
+        if obtido != esperado:
+            falhas += 1
+            print(f"  valor_min={minimo} valor_max={maximo}: {obtido} transações, esperado {esperado}")
+    print(f"limites de valor das consultas ({len(limites)} combinações): {falhas} falha(s)")
+    return falhas
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--amostras', type=int, default=200_000, help='textos aleatórios por separador decimal')
+    parser.add_argument('--linhas', type=int, default=20_000, help='linhas dos extratos sintéticos')
+    parser.add_argument('--semente', type=int, default=7)
+    args = parser.parse_args()
+
+    falhas = conferir_conversao(args.amostras, args.semente)
+    with tempfile.TemporaryDirectory() as pasta:
+        for separador, decimal in ((',', '.'), (';', ',')):
+            caminho = gerar_extrato(os.path.join(pasta, 'extrato.csv'), args.linhas, semente=args.semente, separador=separador)
+            falhas += conferir_arquivo(caminho, separador, decimal, f"extrato sintético separador {separador!r}")
+        #separador ';' (vírgula decimal) e nenhum valor com casas: o ponto é separador de milhar
+        #(1.500 = mil e quinhentos), e o pandas sozinho leria a coluna como float 1,5
+        caminho = os.path.join(pasta, 'milhar.csv')
+        with open(caminho, 'w', encoding='utf-8') as f:
+            f.write('data;descricao;valor\n01/02/2024;Salario;1.500\n02/02/2024;Mercado;-200\n03/02/2024;Aluguel;-1.250\n')
+        falhas += conferir_arquivo(caminho, ';', ',', "vírgula decimal com milhar sem casas")
+    falhas += conferir_consultas(args.semente)
+    print("ok" if falhas == 0 else f"{falhas} falha(s)")
+    sys.exit(1 if falhas else 0)
+
+
+if __name__ == '__main__':
+    main()
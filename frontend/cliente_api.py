@@ -0,0 +1,167 @@
+# acesso à API pelo app: uma sessão http compartilhada, upload da planilha em blocos e o cache
+# local dos resultados e artefatos (gráficos e pdf) de cada relatório
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+API_URL = "http://127.0.0.1:5000"  #url do api
+PASTA_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache_relatorios")
+TAMANHO_BLOCO = 1024 * 1024
+
+
+def criar_sessao(conexoes=8):
+    #uma sessão para o app inteiro: as conexões com a API ficam abertas e são reaproveitadas
+    sessao = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=conexoes)
+    sessao.mount("http://", adaptador)
+    sessao.mount("https://", adaptador)
+    return sessao
+
+
+SESSAO = criar_sessao()
+
+
+class CorpoMultipart:
+    """corpo multipart/form-data com um único arquivo, lido do disco em blocos durante o envio.
+
+    com `files=` o requests monta o corpo inteiro na memória; aqui o tamanho é calculado antes
+    (vira o Content-Length) e o arquivo só fica aberto enquanto é enviado.
+    """
+
+    def __init__(self, campo, caminho, nome_arquivo, tipo="text/csv"):
+        self.caminho = caminho
+        fronteira = uuid.uuid4().hex
+        nome_arquivo = nome_arquivo.replace('"', "'").replace("\r", "").replace("\n", "")
+        self._inicio = (f'--{fronteira}\r\nContent-Disposition: form-data; name="{campo}"; filename="{nome_arquivo}"\r\n'
+                        f'Content-Type: {tipo}\r\n\r\n').encode("utf-8")
+        self._fim = f"\r\n--{fronteira}--\r\n".encode("ascii")
+        self.content_type = f"multipart/form-data; boundary={fronteira}"
+
+    def __len__(self):
+        return len(self._inicio) + os.path.getsize(self.caminho) + len(self._fim)
+
+    def __iter__(self):
+        yield self._inicio
+        with open(self.caminho, "rb") as arquivo:
+            for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO), b""):
+                yield bloco
+        yield self._fim
+
+
+def enviar_planilha(caminho, nome_arquivo, sessao=SESSAO):
+    """envia a planilha ao /analisar no modo eventos e devolve a resposta aberta (usar com `with`).
+
+    as linhas da resposta (uma por etapa) são lidas conforme chegam com iter_lines().
+    """
+    corpo = CorpoMultipart("planilha", caminho, nome_arquivo)
+    return sessao.post(f"{API_URL}/analisar", params={"eventos": 1}, data=corpo,
+                       headers={"Content-Type": corpo.content_type}, stream=True, timeout=(10, 600))
+
+
+class CacheRelatorios:
+    """resultados e artefatos das análises guardados em disco, uma pasta por id de relatório.
+
+    os artefatos de um relatório não mudam depois de gerados, então um arquivo que já está no
+    disco nunca é baixado de novo; os que faltam são baixados em paralelo pela sessão compartilhada.
+    só os gráficos, que aparecem na tela, são buscados antes; o pdf é baixado quando pedido.
+    """
+    ARQUIVO_RESULTADO = "resultado.json"
+    ARTEFATOS = {"grafico_barras": "balanco_mensal.png", "grafico_pizza": "distribuicao_tipos.png",
+                 "pdf_completo": "relatorio_completo.pdf"}
+    PREBUSCADOS = ("grafico_barras", "grafico_pizza")
+
+    def __init__(self, pasta=PASTA_CACHE, sessao=SESSAO, downloads_simultaneos=3):
+        self.pasta = pasta
+        self.sessao = sessao
+        self._executor = ThreadPoolExecutor(max_workers=downloads_simultaneos, thread_name_prefix="download")
+        self._em_andamento = {} #caminho local -> future do download
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def id_relatorio(urls):
+        #as urls da API têm a forma /relatorios/<id>/<arquivo>
+        return urls["pdf_completo"].split("/")[2]
+
+    def guardar_resultado(self, resultado, nome_arquivo):
+        id_relatorio = self.id_relatorio(resultado["urls"])
+        pasta = os.path.join(self.pasta, id_relatorio)
+        os.makedirs(pasta, exist_ok=True)
+        caminho = os.path.join(pasta, self.ARQUIVO_RESULTADO)
+        parcial = f"{caminho}.{uuid.uuid4().hex}.parcial"
+        with open(parcial, "w", encoding="utf-8") as f:
+            json.dump({"arquivo": nome_arquivo, "salvo_em": datetime.now().isoformat(timespec="seconds"),
+                       "resultado": resultado}, f, ensure_ascii=False)
+        os.replace(parcial, caminho)
+        return id_relatorio
+
+    def carregar_resultado(self, id_relatorio):
+        #resultado guardado de uma análise anterior (None se não existir)
+        try:
+            with open(os.path.join(self.pasta, id_relatorio, self.ARQUIVO_RESULTADO), encoding="utf-8") as f:
+                return json.load(f)["resultado"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def analises(self):
+        #(id, nome do arquivo, data) das análises guardadas, da mais recente para a mais antiga
+        encontradas = []
+        for id_relatorio in os.listdir(self.pasta) if os.path.isdir(self.pasta) else []:
+            try:
+                with open(os.path.join(self.pasta, id_relatorio, self.ARQUIVO_RESULTADO), encoding="utf-8") as f:
+                    dados = json.load(f)
+            except (OSError, ValueError):
+                continue
+            encontradas.append((id_relatorio, dados.get("arquivo", id_relatorio), dados.get("salvo_em", "")))
+        return sorted(encontradas, key=lambda analise: analise[2], reverse=True)
+
+    def caminho(self, id_relatorio, chave):
+        return os.path.join(self.pasta, id_relatorio, self.ARTEFATOS[chave])
+
+    def obter(self, urls, chave):
+        """future com o caminho local do artefato `chave` (grafico_barras, grafico_pizza ou pdf_completo).
+
+        já resolvido se o arquivo está no cache; senão o download entra na fila (uma vez só,
+        mesmo que o artefato seja pedido de novo enquanto baixa).
+        """
+        caminho = self.caminho(self.id_relatorio(urls), chave)
+        with self._lock:
+            futuro = self._em_andamento.get(caminho)
+            if futuro is not None:
+                return futuro
+            if os.path.exists(caminho):
+                futuro = Future()
+                futuro.set_result(caminho)
+                return futuro
+            futuro = self._executor.submit(self._baixar, f"{API_URL}{urls[chave]}", caminho)
+            self._em_andamento[caminho] = futuro
+        futuro.add_done_callback(lambda _: self._concluir(caminho))
+        return futuro
+
+    def prebuscar(self, urls):
+        #começa a baixar os gráficos do relatório ao mesmo tempo
+        return {chave: self.obter(urls, chave) for chave in self.PREBUSCADOS}
+
+    def _concluir(self, caminho):
+        with self._lock:
+            self._em_andamento.pop(caminho, None)
+
+    def _baixar(self, url, caminho):
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        parcial = f"{caminho}.{uuid.uuid4().hex}.parcial"
+        try:
+            with self.sessao.get(url, stream=True, timeout=(10, 600)) as resposta:
+                resposta.raise_for_status()
+                with open(parcial, "wb") as f:
+                    for bloco in resposta.iter_content(TAMANHO_BLOCO):
+                        f.write(bloco)
+            os.replace(parcial, caminho)
+        finally:
+            if os.path.exists(parcial):
+                os.remove(parcial)
+        return caminho
@@ -1,8 +1,10 @@
 import flet as ft
+import json
+import pathlib
 import requests
-import time
+import threading
 
-API_URL = "http://127.0.0.1:5000"  #url do api
+from cliente_api import API_URL, CacheRelatorios, enviar_planilha
 
 class AnalisadorApp:
     """interface principal do aplicativo de análise financeira com Flet."""
@@ -10,6 +12,9 @@ class AnalisadorApp:
     def __init__(self, page: ft.Page):
         self.page = page
         self.selected_files = ft.Ref()  
+        self.cache = CacheRelatorios()
+        self._relatorio_exibido = None #id do relatório na tela; downloads de outro relatório são ignorados
+        self._urls_exibidas = None #urls dos artefatos desse relatório (só chegam no fim da análise)
         self._inicializar_componentes()  
         self._construir_layout()        
 
@@ -44,6 +49,10 @@ class AnalisadorApp:
         self.status_text = ft.Text(size=16)
         self.progress_bar = ft.ProgressBar(visible=False, color="#90CAF9", bgcolor="#EEEEEE")
 
+        #análises anteriores, reabertas do cache local sem chamar a API
+        self.dropdown_anteriores = ft.Dropdown(label="Análises anteriores", width=420, on_change=self._abrir_anterior)
+        self._atualizar_anteriores()
+
         #upload de arquivo e botão de análise
         self.card_upload = ft.Card(
             content=ft.Container(
@@ -52,7 +61,8 @@ class AnalisadorApp:
                     ft.Divider(height=10, color="transparent"),
                     self.botao_analisar,
                     self.progress_bar,
-                    self.status_text
+                    self.status_text,
+                    self.dropdown_anteriores
                 ], horizontal_alignment=ft.CrossAxisAlignment.CENTER, spacing=10),
                 padding=25
             ),
@@ -103,11 +113,11 @@ class AnalisadorApp:
             sections=[], sections_space=2, center_space_radius=50,
             on_chart_event=self._on_chart_event, expand=True
         )
-        self.grafico_barras = ft.Image(src="", border_radius=ft.border_radius.all(8))
-        self.grafico_pizza = ft.Image(src="", border_radius=ft.border_radius.all(8))
+        self.grafico_barras = ft.Image(src="", border_radius=ft.border_radius.all(8), visible=False)
+        self.grafico_pizza = ft.Image(src="", border_radius=ft.border_radius.all(8), visible=False)
 
         #link para baixar o relatório PDF
-        self.link_pdf = ft.FilledButton("Baixar Relatório PDF Completo", url="", icon="picture_as_pdf", style=ft.ButtonStyle(shape=ft.RoundedRectangleBorder(radius=8)))
+        self.link_pdf = ft.FilledButton("Baixar Relatório PDF Completo", on_click=self._abrir_pdf, icon="picture_as_pdf", style=ft.ButtonStyle(shape=ft.RoundedRectangleBorder(radius=8)))
          #resultados da análise
         self.card_resultados = ft.Card(
             visible=False,  # Inicialmente invisível até a análise ser concluída
@@ -183,92 +193,200 @@ class AnalisadorApp:
             return
 
         #progresso e botão
+        self._etapas_concluidas = 0
+        self.progress_bar.value = 0
         self.progress_bar.visible = True
         self.botao_analisar.disabled = True
         self.status_text.value = ""
         self.tabela_resumo.rows.clear()
         self.grafico_categorias.sections.clear()
         self.card_resultados.visible = False
+        self._urls_exibidas = None
         self.page.update()
 
-        #prepara o arquivo para envio
-        caminho_arquivo = self.selected_files.current[0].path
-        nome_arquivo = self.selected_files.current[0].name
-        files = {'planilha': (nome_arquivo, open(caminho_arquivo, 'rb'), 'text/csv')}
+        #o envio e a leitura dos eventos rodam em outra thread: o handler volta na hora e a interface segue respondendo
+        arquivo = self.selected_files.current[0]
+        threading.Thread(target=self._enviar_planilha, args=(arquivo.path, arquivo.name), daemon=True).start()
 
+    def _enviar_planilha(self, caminho_arquivo, nome_arquivo):
         try:
-            response = requests.post(f"{API_URL}/analisar", files=files, timeout=300)
-            response.raise_for_status()
-            resultado = response.json()
+            #modo eventos: a API envia uma linha json por etapa e a interface mostra cada parte assim que chega
+            with enviar_planilha(caminho_arquivo, nome_arquivo) as response:
+                if response.status_code != 200:
+                    resultado = response.json()
+                else:
+                    resultado = {"erro": "A análise terminou sem resultado."}
+                    for linha in response.iter_lines():
+                        if linha:
+                            resultado = self._processar_evento(json.loads(linha)) or resultado
 
             if resultado.get("sucesso"):
                 self.status_text.value = "Análise concluída com sucesso!"
                 self.status_text.color = "#388E3C"
-
-                #KPIS
-                kpis = resultado.get("kpis", {})
-                receita_total = kpis.get("receita_total", 0)
-                despesa_total = kpis.get("despesa_total", 0)
-                saldo_final = kpis.get("saldo_final", 0)
-                taxa_poupanca = kpis.get("taxa_poupanca", 0)
-                self.kpi_receita_valor.value = f"R$ {receita_total:,.2f}"
-                self.kpi_despesa_valor.value = f"R$ {abs(despesa_total):,.2f}"
-                self.kpi_saldo_valor.value = f"R$ {saldo_final:,.2f}"
-                self.kpi_poupanca_valor.value = f"{taxa_poupanca:.1f}%"
-
-                #tabela de resumo mensal
-                for mes, valores in resultado.get("resumo_mensal", {}).items():
-                    receita = valores.get('Receita', 0)
-                    despesa = valores.get('Despesa', 0)
-                    saldo = receita + despesa
-                    self.tabela_resumo.rows.append(ft.DataRow(cells=[
-                        ft.DataCell(ft.Text(mes, weight=ft.FontWeight.BOLD)),
-                        ft.DataCell(ft.Text(f"R$ {receita:,.2f}", color="#2E7D32")),
-                        ft.DataCell(ft.Text(f"R$ {despesa:,.2f}", color="#C62828")),
-                        ft.DataCell(ft.Text(f"R$ {saldo:,.2f}", weight=ft.FontWeight.BOLD, color="#37474F" if saldo >= 0 else "#C62828")),
-                    ]))
-
-                #gráfico de categorias
-                categorias_data = resultado.get("despesas_por_categoria", {})
-                cores = ["#42A5F5", "#EF5350", "#66BB6A", "#FFA726", "#AB47BC", "#8D6E63", "#EC407A", "#26A69A"]
-                total_despesas = sum(categorias_data.values()) or 1
-                for i, (categoria, valor) in enumerate(categorias_data.items()):
-                    porcentagem = (valor / total_despesas) * 100
-                    self.grafico_categorias.sections.append(
-                        ft.PieChartSection(
-                            value=valor,
-                            title=f"{porcentagem:.1f}%",
-                            title_style=ft.TextStyle(size=12, weight=ft.FontWeight.BOLD, color="white"),
-                            color=cores[i % len(cores)],
-                            radius=80,
-                            badge=ft.Container(
-                                padding=ft.padding.all(5),
-                                border_radius=ft.border_radius.all(4),
-                                bgcolor="white70",
-                                content=ft.Text(f"{categoria}\nR$ {valor:,.2f}", size=12, text_align=ft.TextAlign.CENTER)
-                            ),
-                            badge_position=1,
-                        )
-                    )
-
-             
-                timestamp = f"?t={time.time()}"
-                self.grafico_barras.src = f"{API_URL}{resultado['urls']['grafico_barras']}{timestamp}"
-                self.grafico_pizza.src = f"{API_URL}{resultado['urls']['grafico_pizza']}{timestamp}"
-                self.link_pdf.url = f"{API_URL}{resultado['urls']['pdf_completo']}"
-                self.card_resultados.visible = True
+                self._exibir_resultado(resultado)
+                self.cache.guardar_resultado(resultado, nome_arquivo)
+                self._atualizar_anteriores()
             else:
                 self.status_text.value = f"Erro na API: {resultado.get('erro', 'Erro desconhecido.')}"
                 self.status_text.color = "#D32F2F"
 
-        except requests.exceptions.RequestException as ex:
+        except (requests.exceptions.RequestException, ValueError, OSError) as ex:
             self.status_text.value = f"Erro de conexão com a API: {ex}"
             self.status_text.color = "#D32F2F"
         finally:
             self.progress_bar.visible = False
+            self.progress_bar.value = None
             self.botao_analisar.disabled = False
             self.page.update()
 
+    def _atualizar_anteriores(self):
+        analises = self.cache.analises()
+        self.dropdown_anteriores.options = [ft.dropdown.Option(key=id_relatorio, text=f"{arquivo} ({salvo_em.replace('T', ' ')})")
+                                            for id_relatorio, arquivo, salvo_em in analises]
+        self.dropdown_anteriores.visible = bool(analises)
+
+    def _abrir_anterior(self, e):
+        resultado = self.cache.carregar_resultado(self.dropdown_anteriores.value)
+        if resultado is None:
+            self.status_text.value = "Análise não encontrada no cache local."
+            self.status_text.color = "#D32F2F"
+        else:
+            self.status_text.value = ""
+            self._exibir_resultado(resultado)
+        self.page.update()
+
+    #etapas enviadas pela API, na ordem; a barra de progresso avança a cada uma
+    #(gráficos e pdf não entram: a API só os desenha quando pedidos, e o app os baixa depois, em paralelo)
+    ETAPAS = ("importacao", "agregados", "padroes")
+
+    def _processar_evento(self, evento):
+        #atualiza a interface com uma etapa da análise; devolve o resultado final (ou o erro) quando chega
+        etapa = evento.get("etapa")
+        self._etapas_concluidas += 1
+        self.progress_bar.value = min(self._etapas_concluidas / len(self.ETAPAS), 1.0)
+        self.status_text.color = "#757575"
+        if etapa == "importacao":
+            self.status_text.value = f"{evento['transacoes']} transações lidas. Calculando resumos..."
+        elif etapa == "agregados":
+            self._exibir_resumo(evento)
+            self.card_resultados.visible = True
+            self.status_text.value = "Resumo pronto. Procurando recorrências..."
+        elif etapa == "padroes":
+            recorrentes = len(evento["padroes"]["recorrentes"])
+            self.status_text.value = f"{recorrentes} recorrências encontradas. Finalizando..."
+        elif etapa == "grafico":
+            imagem = {"balanco_mensal": self.grafico_barras, "distribuicao_tipos": self.grafico_pizza}.get(evento["nome"])
+            if imagem is not None:
+                imagem.src = f"{API_URL}{evento['url']}"
+                imagem.visible = True
+        elif etapa == "pdf":
+            self.status_text.value = "Finalizando..."
+        elif etapa == "concluido":
+            return evento["resultado"]
+        elif etapa == "erro":
+            return evento
+        self.page.update()
+        return None
+
+    def _exibir_resultado(self, resultado):
+        self._exibir_resumo(resultado)
+        self._exibir_graficos(resultado["urls"])
+        self.card_resultados.visible = True
+
+    def _exibir_resumo(self, resultado):
+        #KPIS
+        kpis = resultado.get("kpis", {})
+        receita_total = kpis.get("receita_total", 0)
+        despesa_total = kpis.get("despesa_total", 0)
+        saldo_final = kpis.get("saldo_final", 0)
+        taxa_poupanca = kpis.get("taxa_poupanca", 0)
+        self.kpi_receita_valor.value = f"R$ {receita_total:,.2f}"
+        self.kpi_despesa_valor.value = f"R$ {abs(despesa_total):,.2f}"
+        self.kpi_saldo_valor.value = f"R$ {saldo_final:,.2f}"
+        self.kpi_poupanca_valor.value = f"{taxa_poupanca:.1f}%"
+
+        #tabela de resumo mensal
+        self.tabela_resumo.rows.clear()
+        for mes, valores in resultado.get("resumo_mensal", {}).items():
+            receita = valores.get('Receita', 0)
+            despesa = valores.get('Despesa', 0)
+            saldo = receita + despesa
+            self.tabela_resumo.rows.append(ft.DataRow(cells=[
+                ft.DataCell(ft.Text(mes, weight=ft.FontWeight.BOLD)),
+                ft.DataCell(ft.Text(f"R$ {receita:,.2f}", color="#2E7D32")),
+                ft.DataCell(ft.Text(f"R$ {despesa:,.2f}", color="#C62828")),
+                ft.DataCell(ft.Text(f"R$ {saldo:,.2f}", weight=ft.FontWeight.BOLD, color="#37474F" if saldo >= 0 else "#C62828")),
+            ]))
+
+        #gráfico de categorias
+        categorias_data = resultado.get("despesas_por_categoria", {})
+        cores = ["#42A5F5", "#EF5350", "#66BB6A", "#FFA726", "#AB47BC", "#8D6E63", "#EC407A", "#26A69A"]
+        total_despesas = sum(categorias_data.values()) or 1
+        self.grafico_categorias.sections.clear()
+        for i, (categoria, valor) in enumerate(categorias_data.items()):
+            porcentagem = (valor / total_despesas) * 100
+            self.grafico_categorias.sections.append(
+                ft.PieChartSection(
+                    value=valor,
+                    title=f"{porcentagem:.1f}%",
+                    title_style=ft.TextStyle(size=12, weight=ft.FontWeight.BOLD, color="white"),
+                    color=cores[i % len(cores)],
+                    radius=80,
+                    badge=ft.Container(
+                        padding=ft.padding.all(5),
+                        border_radius=ft.border_radius.all(4),
+                        bgcolor="white70",
+                        content=ft.Text(f"{categoria}\nR$ {valor:,.2f}", size=12, text_align=ft.TextAlign.CENTER)
+                    ),
+                    badge_position=1,
+                )
+            )
+
+    def _exibir_graficos(self, urls):
+        #gráficos vêm do cache local; os que faltam são baixados em paralelo e entram na tela ao chegar
+        id_relatorio = CacheRelatorios.id_relatorio(urls)
+        self._relatorio_exibido = id_relatorio
+        self._urls_exibidas = urls
+        self.grafico_barras.visible = self.grafico_pizza.visible = False
+        controles = {"grafico_barras": self.grafico_barras, "grafico_pizza": self.grafico_pizza}
+        for chave, futuro in self.cache.prebuscar(urls).items():
+            futuro.add_done_callback(lambda f, controle=controles[chave]: self._artefato_pronto(id_relatorio, controle, f))
+
+    def _artefato_pronto(self, id_relatorio, controle, futuro):
+        if id_relatorio != self._relatorio_exibido: #outro relatório foi aberto enquanto este baixava
+            return
+        try:
+            caminho = futuro.result()
+        except (requests.exceptions.RequestException, OSError) as ex:
+            self.status_text.value = f"Erro ao baixar os gráficos do relatório: {ex}"
+            self.status_text.color = "#D32F2F"
+        else:
+            controle.src = caminho
+            controle.visible = True
+        self.page.update()
+
+    def _abrir_pdf(self, e):
+        #o pdf só é baixado no primeiro clique; depois abre direto do cache local
+        if self._urls_exibidas is None:
+            self.status_text.value = "O relatório PDF fica disponível ao fim da análise."
+            self.page.update()
+            return
+        self.status_text.value = "Baixando o relatório PDF..."
+        self.status_text.color = "#757575"
+        self.page.update()
+        self.cache.obter(self._urls_exibidas, "pdf_completo").add_done_callback(self._pdf_pronto)
+
+    def _pdf_pronto(self, futuro):
+        try:
+            caminho = futuro.result()
+        except (requests.exceptions.RequestException, OSError) as ex:
+            self.status_text.value = f"Erro ao baixar o relatório PDF: {ex}"
+            self.status_text.color = "#D32F2F"
+        else:
+            self.status_text.value = ""
+            self.page.launch_url(pathlib.Path(caminho).as_uri())
+        self.page.update()
+
 def main(page: ft.Page):
     #func para inicializar a aplicação Flet 
     page.horizontal_alignment = ft.CrossAxisAlignment.CENTER